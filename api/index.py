@@ -1,31 +1,113 @@
-from typing import List, Dict, Any, Optional, AsyncGenerator
+from typing import List, Dict, Any, Optional, AsyncGenerator, NamedTuple, Tuple, Union
+from contextlib import asynccontextmanager
+import asyncio
+import threading
+import time
 from dotenv import load_dotenv
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import StreamingResponse
+from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
 import json
 from .utils.messages import ClientMessage, convert_to_anthropic_messages
+from .utils.output_parser import MessageFieldExtractor
+from .utils.streaming import ChunkBatcher, annotation_part, data_part, message_text, text_part, unstreamed_remainder
 
-from .utils.curriculum import create_tictactoe_curriculum
-from .utils.state import TutorState, create_session, get_session, update_session, sessions
-from .utils.graph import build_graph
+from .utils.curriculum import curriculum_registry
+from .settings import WARM_UP_ON_STARTUP, WS_HEARTBEAT_INTERVAL, WS_IDLE_TIMEOUT, WS_MAX_QUEUED_MESSAGES
+from .utils.state import (
+    TutorState, create_session, session_store, state_transcript_key, thread_config, transcript_key, transcript_length,
+)
+from .utils.log import RequestContextMiddleware, get_logger, session_id_var
+from .utils.metrics import MetricsMiddleware, registry
+from .utils.turns import turn_coordinator
+from .utils.admission import AdmissionRejected, admission
 
 load_dotenv(".env.local")
 
-app = FastAPI()
+_graph = None
+_graph_lock = threading.Lock()
+
+def get_graph():
+    """The compiled tutoring graph, built on first use.
+
+    Importing LangGraph and LangChain and compiling the graph is most of a
+    cold start, and requests like /api/new-session answer without it (the
+    new session's checkpoint is written once it's loaded).
+    """
+    global _graph
+    if _graph is None:
+        with _graph_lock:
+            if _graph is None:
+                from .utils.checkpoint import get_checkpointer
+                from .utils.graph import build_graph
+
+                _graph = build_graph(get_checkpointer())
+    return _graph
+
+def warm_up() -> float:
+    """Load the graph and model clients now rather than on the first turn;
+    returns the seconds it took."""
+    started = time.perf_counter()
+    get_graph()
+    from .utils.graph import warm_up as warm_up_models
+
+    warm_up_models()
+    return time.perf_counter() - started
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if WARM_UP_ON_STARTUP:
+        # In a thread, so requests are served while the imports run
+        asyncio.get_running_loop().run_in_executor(None, warm_up)
+    yield
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(RequestContextMiddleware)
+
+logger = get_logger("api")
+
+@app.exception_handler(AdmissionRejected)
+async def admission_rejected(request, exc: AdmissionRejected):
+    return JSONResponse(
+        status_code=429,
+        content={"error": "overloaded", "detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
 
 class ChatRequest(BaseModel):
     messages: List[ClientMessage]
     session_id: Optional[str] = None
     sessionId: Optional[str] = None  # Alternative field name
+    # Delta mode: `messages` carries only the new user message and the server
+    # appends it to the stored history. `turn` is how many messages the client
+    # already holds; `history_hash` optionally pins their content.
+    delta: bool = False
+    turn: Optional[int] = None
+    history_hash: Optional[str] = None
+    curriculum_id: Optional[str] = None  # Course for a session created by this request
+
+class NewSessionRequest(BaseModel):
+    curriculum_id: Optional[str] = None
 
 class ChatResponse(BaseModel):
     content: str
     session_id: str
+    turn: Optional[int] = None
+    history_hash: Optional[str] = None
+    # Progress after the turn, and the milestones the turn itself completed
+    current_milestone: Optional[str] = None
+    milestones_completed: List[str] = []
+    completed: List[str] = []
 
-def initialize_session(session_id: str) -> TutorState:
+class TurnResult(NamedTuple):
+    """A finished turn: the stored state and the milestones it completed."""
+    state: TutorState
+    completed: List[str]
+
+def initialize_session(session_id: str, curriculum_id: Optional[str] = None) -> TutorState:
     """Initialize a new tutoring session with the given curriculum."""
-    tic_tac_toe_curriculum = create_tictactoe_curriculum()
+    curriculum = curriculum_registry.get(curriculum_id)
     
     student = {
         "background": "A high school student who is learning Python for the first time. They have some experience with Java. They have taken an introduction course to Computer Science so they understand the basics of programming like loops, conditionals, variables, and data structures."
@@ -36,27 +118,142 @@ def initialize_session(session_id: str) -> TutorState:
         'current_milestone': None,
         "student": student,
         "messages": [],
-        "curriculum": tic_tac_toe_curriculum.model_dump(),  
+        "curriculum_id": curriculum.id,
         "milestones_completed": [],
-        "current_input": ""
+        "current_input": "",
+        "usage": {},
+        "summary": "",
+        "history_offset": 0,
+        "code_blocks": [],
+        "route": "fast",
     }
 
-graph = build_graph()
+async def load_session(session_id: str) -> Optional[TutorState]:
+    """Get session state from its durable checkpoint, the source of truth
+    whichever worker handled the previous turn. This worker's store only
+    answers for sessions that haven't had a turn yet (or when persistence
+    is off), and is refreshed with whatever the checkpoint holds."""
+    graph = get_graph()
+    if not graph.checkpointer:
+        return session_store.get(session_id)
+    
+    snapshot = await graph.aget_state(thread_config(session_id))
+    if not snapshot.values:
+        return session_store.get(session_id)
+    state = snapshot.values
+    session_store.put(session_id, state)
+    return state
+
+async def turn_input(session_id: str, state: TutorState, client_history: bool = False) -> Dict[str, Any]:
+    """What the graph is invoked with for a turn on `state`.
+
+    Once a session has a checkpoint, the graph reads everything but the
+    turn's input from it, so only `current_input` (and the client's copy of
+    the history, when the request carried one) is passed in; a stale copy
+    of the state can't overwrite another worker's progress. A session's
+    first turn has no checkpoint yet and starts from the whole state.
+    """
+    checkpointer = get_graph().checkpointer
+    if not checkpointer or not await checkpointer.aget_tuple(thread_config(session_id)):
+        return state
+    fields = ("current_input", "messages", "summary", "history_offset") if client_history else ("current_input",)
+    return {field: state[field] for field in fields}
+
+def turn_key(session_id: str, messages: List[ClientMessage], delta: bool, turn: Optional[int]) -> tuple:
+    """Identity of a turn for coalescing: the session, the history the new
+    message builds on, and the message itself."""
+    if delta:
+        history = ("delta", turn)
+    else:
+        last_assistant = messages[-2].content if len(messages) > 1 and messages[-2].role == "assistant" else ""
+        history = transcript_key(len(messages) - 1, last_assistant)
+    return (session_id, history, messages[-1].content if messages else "")
+
+def apply_client_history(state: TutorState, history: List[Dict[str, str]]) -> None:
+    """Take the client's copy of the conversation as the session history.
+
+    The first `history_offset` messages were already folded into the
+    session summary, so only the tail after them is kept. A client history
+    shorter than that is a different conversation on the same session id,
+    which starts over without the summary.
+    """
+    offset = state.get("history_offset", 0)
+    if len(history) < offset:
+        state["summary"] = ""
+        state["history_offset"] = offset = 0
+    state["messages"] = history[offset:]
+
+def check_admission() -> None:
+    """Turn requests away before doing any work when the model queue is full."""
+    if admission.saturated():
+        raise admission.reject()
+
+def check_curriculum(curriculum_id: Optional[str]) -> None:
+    if curriculum_id and curriculum_id not in curriculum_registry:
+        raise HTTPException(status_code=404, detail=f"Unknown curriculum: {curriculum_id}")
+
+async def check_delta_request(
+    session_id: Optional[str], client_turn: Optional[int], client_history_hash: Optional[str] = None
+) -> Optional[JSONResponse]:
+    """Verify a delta request against the stored history.
+
+    Returns a 409 resync response carrying the server's view of the
+    conversation when the client has diverged, or None if it may proceed.
+    A session with no stored state (new, expired, or never seen by this
+    server) only accepts a delta for its first message; otherwise the
+    409 asks for the full transcript in a non-delta request, since there
+    is nothing to resync to.
+    """
+    if not session_id:
+        raise HTTPException(status_code=400, detail="Delta requests require a session id")
+    
+    state = await load_session(session_id)
+    if state is None:
+        if client_turn == 0:
+            return None
+        logger.info("Delta request for a session with no stored state at client turn %s", client_turn)
+        return JSONResponse(status_code=409, content={
+            "error": "full_history_required",
+            "session_id": session_id,
+            "turn": 0,
+        })
+    
+    turn = transcript_length(state)
+    history_hash = state_transcript_key(state)
+    if client_turn == turn and (client_history_hash is None or client_history_hash == history_hash):
+        return None
+    
+    logger.info("Delta request out of sync: client turn %s, server turn %s", client_turn, turn)
+    return JSONResponse(status_code=409, content={
+        "error": "resync_required",
+        "session_id": session_id,
+        "turn": turn,
+        "history_hash": history_hash,
+        "messages": state["messages"],
+        # Messages before this index were folded into the server-side summary
+        "history_offset": state.get("history_offset", 0),
+    })
 
 @app.post("/api/chat")
 async def handle_chat(request: ChatRequest):
     """Handle chat requests with streaming for Vercel AI SDK compatibility."""
-    print(f"\n[API] === STREAMING CHAT REQUEST ===", flush=True)
-    
     # Try both session_id fields
     session_id = request.session_id or request.sessionId
-    print(f"[API] Session ID (session_id): {request.session_id}", flush=True)
-    print(f"[API] Session ID (sessionId): {request.sessionId}", flush=True)
-    print(f"[API] Final session ID: {session_id}", flush=True)
-    print(f"[API] Message count: {len(request.messages)}", flush=True)
+    session_id_var.set(session_id)
+    logger.debug("Streaming chat request with %d messages", len(request.messages))
+    
+    check_curriculum(request.curriculum_id)
+    check_admission()
+    if request.delta:
+        resync = await check_delta_request(session_id, request.turn, request.history_hash)
+        if resync:
+            return resync
     
     response = StreamingResponse(
-        stream_chat_response(request.messages, session_id),
+        stream_chat_response(
+            request.messages, session_id, delta=request.delta, turn=request.turn,
+            history_hash=request.history_hash, curriculum_id=request.curriculum_id,
+        ),
         media_type="text/plain"
     )
     response.headers['x-vercel-ai-data-stream'] = 'v1'
@@ -65,111 +262,300 @@ async def handle_chat(request: ChatRequest):
 @app.post("/api/chat/json", response_model=ChatResponse)
 async def handle_chat_json(request: ChatRequest):
     """Handle chat requests with JSON response (non-streaming)."""
-    print(f"\n[API] === JSON CHAT REQUEST ===")
-    print(f"[API] Requested session_id: {request.session_id}")
-    print(f"[API] Message count: {len(request.messages)}")
+    session_id_var.set(request.session_id)
+    logger.debug("JSON chat request with %d messages", len(request.messages))
+    
+    check_curriculum(request.curriculum_id)
+    check_admission()
+    if request.delta and not request.session_id:
+        raise HTTPException(status_code=400, detail="Delta requests require a session id")
+    
+    # Convert messages and get current input
+    anthropic_messages = convert_to_anthropic_messages(request.messages)
+    if not anthropic_messages:
+        raise HTTPException(status_code=400, detail="No messages provided")
     
     try:
         # Get or create session
         session_id = request.session_id
         if not session_id:
             session_id = create_session()
-            print(f"[API] Created new session: {session_id}")
-        else:
-            print(f"[API] Using existing session: {session_id}")
-        
-        state = get_session(session_id)
-        if not state:
-            print(f"[API] No existing state found, initializing new session")
-            state = initialize_session(session_id)
-            update_session(session_id, state)
-        else:
-            print(f"[API] Retrieved existing state with {len(state.get('messages', []))} messages")
-        
-        # Convert messages and get current input
-        anthropic_messages = convert_to_anthropic_messages(request.messages)
-        if not anthropic_messages:
-            print(f"[API] ERROR: No messages provided")
-            raise HTTPException(status_code=400, detail="No messages provided")
+            session_id_var.set(session_id)
+            logger.info("Created new session")
         
-        current_input = anthropic_messages[-1]["content"]
-        print(f"[API] Current input: {current_input[:100]}{'...' if len(current_input) > 100 else ''}")
-        
-        # Update state with current input and message history
-        state["current_input"] = current_input
-        state["messages"] = anthropic_messages[:-1]  # All except current message
-        print(f"[API] Updated state with {len(state['messages'])} previous messages")
-        
-        # Process through graph
-        print(f"[API] Invoking LangGraph processing...")
-        result = await graph.ainvoke(state)
-        
-        # Update session state
-        update_session(session_id, result)
-        print(f"[API] Updated session state")
+        key = turn_key(session_id, request.messages, request.delta, request.turn)
+        pending = turn_coordinator.join(key) or turn_coordinator.start(key, run_turn(
+            session_id, anthropic_messages, delta=request.delta, turn=request.turn,
+            history_hash=request.history_hash, curriculum_id=request.curriculum_id,
+        ))
+        result = await turn_coordinator.wait(pending)
+        if isinstance(result, JSONResponse):
+            return result
+        state = result.state
         
         # Extract response content
-        if result["messages"]:
-            response_content = result["messages"][-1]["content"]
-            print(f"[API] Response content length: {len(response_content)} characters")
+        if state["messages"]:
+            response_content = state["messages"][-1]["content"]
         else:
             response_content = "I apologize, but I couldn't generate a response. Please try again."
-            print(f"[API] WARNING: No response messages generated, using fallback")
+            logger.warning("No response messages generated, using fallback")
         
-        print(f"[API] === CHAT REQUEST COMPLETE ===\n")
-        return ChatResponse(content=response_content, session_id=session_id)
+        return ChatResponse(
+            content=response_content,
+            session_id=session_id,
+            turn=transcript_length(state),
+            history_hash=state_transcript_key(state),
+            current_milestone=state.get("current_milestone"),
+            milestones_completed=state.get("milestones_completed", []),
+            completed=result.completed,
+        )
         
+    except AdmissionRejected:
+        raise
     except Exception as e:
-        print(f"[API] ERROR: Exception in handle_chat: {str(e)}")
-        import traceback
-        print(f"[API] ERROR: Traceback: {traceback.format_exc()}")
-        print(f"[API] === CHAT REQUEST FAILED ===\n")
+        logger.exception("JSON chat request failed")
         raise HTTPException(status_code=500, detail=f"Error processing request: {str(e)}")
 
-async def stream_chat_response(messages: List[ClientMessage], session_id: Optional[str] = None) -> AsyncGenerator[str, None]:
-    """Stream chat response in Vercel AI SDK format."""
+async def run_turn(
+    session_id: str,
+    messages: List[Dict[str, str]],
+    delta: bool = False,
+    turn: Optional[int] = None,
+    history_hash: Optional[str] = None,
+    curriculum_id: Optional[str] = None,
+    events: Optional[asyncio.Queue] = None,
+) -> Union[TurnResult, JSONResponse]:
+    """Run one turn to the end under the session lock and store it.
+
+    This is the task TurnCoordinator runs for a turn, shared by the POST
+    endpoints whichever of them started it. `messages` ends with the new
+    user message; in delta mode it holds nothing else. Returns the
+    resulting state and the milestones the turn completed, or the 409
+    resync response when a delta request no longer matches the stored
+    history.
+
+    With `events`, the session data (the ``2:`` part of the stream) and
+    then the turn's ``text`` and ``progress`` events (see stream_turn) are
+    put on it as they happen, and None once the turn is over.
+    """
+    try:
+        async with turn_coordinator.session_lock(session_id):
+            if delta:
+                # Checked under the lock so a concurrent turn can't slip in between
+                resync = await check_delta_request(session_id, turn, history_hash)
+                if resync:
+                    return resync
+            
+            state = await load_session(session_id)
+            if not state:
+                state = initialize_session(session_id, curriculum_id)
+                session_store.put(session_id, state)
+            
+            # Update state with current input and message history
+            state["current_input"] = messages[-1]["content"]
+            if not delta:
+                apply_client_history(state, messages[:-1])  # All except current message
+            
+            if events:
+                # Lets the client show where the student is before the
+                # model has produced anything
+                completed = state.get("milestones_completed", [])
+                curriculum = curriculum_registry.get(state.get("curriculum_id"))
+                events.put_nowait(("session", {
+                    "type": "session",
+                    "sessionId": session_id,
+                    "curriculumId": curriculum.id,
+                    "currentMilestone": state.get("current_milestone") or curriculum.first_open(completed),
+                    "milestonesCompleted": completed,
+                }))
+            
+            completed_before = set(state.get("milestones_completed", []))
+            result = state
+            async for kind, value in stream_turn(state, session_id, client_history=not delta):
+                if kind == "result":
+                    result = value
+                elif events:
+                    events.put_nowait((kind, value))
+            completed = [m for m in result.get("milestones_completed", []) if m not in completed_before]
+            return TurnResult(result, completed)
+    finally:
+        if events:
+            events.put_nowait(None)
+
+async def stream_turn(
+    state: TutorState, session_id: str, client_history: bool = False
+) -> AsyncGenerator[Tuple[str, Any], None]:
+    """Run one turn through the graph, streaming the tutor's message.
+
+    Yields ``("text", batch)`` as the model produces the message, including
+    whatever the graph added after it finished, ``("progress", event)`` as
+    soon as the turn has been assessed (see graph.report_progress), then
+    ``("result", state)`` once the turn is stored. The caller holds the
+    session lock; `client_history` is whether `state` carries the client's
+    copy of the history (see turn_input).
+    """
+    # Forward the tutor's message as the model streams it instead of
+    # waiting for the full reply
+    from .utils.graph import STREAMED_NODES, turn_node
+
+    graph = get_graph()
+    extractor = MessageFieldExtractor()
+    batcher = ChunkBatcher()
+    streamed = []
+    result = state
+    stream_mode = ["messages", "values", "custom"]
+    inputs = await turn_input(session_id, state, client_history)
+    async for mode, payload in graph.astream(inputs, thread_config(session_id), stream_mode=stream_mode):
+        if mode == "values":
+            result = payload
+            continue
+        if mode == "custom":
+            if payload.get("type") == "progress":
+                yield "progress", payload
+            continue
+        chunk, metadata = payload
+        if metadata.get("langgraph_node") not in STREAMED_NODES:
+            continue
+        text = extractor.feed(message_text(chunk))
+        if text:
+            streamed.append(text)
+            batch = batcher.add(text)
+            if batch:
+                yield "text", batch
+    batch = batcher.flush()
+    if batch:
+        yield "text", batch
+    
+    # Extract response content
+    if result["messages"]:
+        response_content = result["messages"][-1]["content"]
+    else:
+        response_content = "I apologize, but I couldn't generate a response. Please try again."
+    
+    # Send whatever the graph added after the model finished (final
+    # celebration, error fallback)
+    streamed_content = "".join(streamed)
+    remainder = unstreamed_remainder(streamed_content, response_content)
+    if remainder:
+        yield "text", remainder
+    if streamed_content and remainder and result["messages"]:
+        # Keep the stored history identical to what the client was shown
+        result["messages"][-1]["content"] = streamed_content + remainder
+        if graph.checkpointer:
+            await graph.aupdate_state(
+                thread_config(session_id), {"messages": result["messages"]}, as_node=turn_node(graph)
+            )
+    session_store.put(session_id, result)
+    schedule_summary(session_id, result)
+    yield "result", result
+
+_summaries: Dict[str, asyncio.Task] = {}
+
+def schedule_summary(session_id: str, state: TutorState) -> None:
+    """Start folding the session's history into its summary, in the
+    background, once enough turns have piled up.
+
+    The fold runs after the turn is stored, so the reply never waits for
+    the summary model, and neither does the session's next turn (see
+    summarize_session).
+    """
+    from .utils.graph import needs_summary
+
+    if session_id not in _summaries and needs_summary(state):
+        _summaries[session_id] = asyncio.create_task(summarize_session(session_id))
+
+async def summarize_session(session_id: str) -> None:
+    """Fold the session's history into its summary.
+
+    The summary model runs outside the session lock. The lock is only taken
+    to apply the result, and only if the summarized history is still how
+    the session's history starts: messages that turns appended meanwhile
+    are kept after the fold, anything else drops it until the next turn.
+    """
+    from .utils.graph import needs_summary, summarize_history, turn_node
+
+    try:
+        state = await load_session(session_id)
+        if not state or not needs_summary(state):
+            return
+        update = await summarize_history(state)
+        if not update:
+            return
+        async with turn_coordinator.session_lock(session_id):
+            current = await load_session(session_id)
+            summarized = state["messages"]
+            if (not current or current.get("summary") != state.get("summary")
+                    or current["messages"][:len(summarized)] != summarized):
+                logger.info("Session history changed while it was summarized; dropping the fold")
+                return
+            update["messages"] = update["messages"] + current["messages"][len(summarized):]
+            graph = get_graph()
+            if graph.checkpointer:
+                await graph.aupdate_state(thread_config(session_id), update, as_node=turn_node(graph))
+            session_store.put(session_id, {**current, **update})
+    except Exception:
+        logger.exception("Summarizing session history failed")
+    finally:
+        del _summaries[session_id]
+
+def progress_annotation(completed: List[str], current_milestone: Optional[str], milestones_completed: List[str]) -> str:
+    """The ``8:`` message annotation with the milestones a turn completed
+    and the progress after it."""
+    return annotation_part({
+        "type": "progress",
+        "completed": completed,
+        "currentMilestone": current_milestone,
+        "milestonesCompleted": milestones_completed,
+    })
+
+async def stream_chat_response(
+    messages: List[ClientMessage],
+    session_id: Optional[str] = None,
+    delta: bool = False,
+    turn: Optional[int] = None,
+    history_hash: Optional[str] = None,
+    curriculum_id: Optional[str] = None,
+) -> AsyncGenerator[str, None]:
+    """Stream chat response in Vercel AI SDK format.
+
+    In delta mode `messages` only holds the new user message, which is
+    appended to the stored history instead of replacing it.
+
+    Before any text, a data part (``2:``) carries the session id and the
+    milestone being worked on; once the turn is assessed, a message
+    annotation (``8:``) carries the milestones it completed and the
+    progress after it, usually while the reply is still streaming.
+
+    Turns on the same session run one at a time. A duplicate of a turn that
+    is still in flight waits for that turn's reply and sends it in one part.
+    The turn itself runs detached (see run_turn), so it is finished and
+    stored even if this client disconnects.
+    """
     try:
         # Enhanced session detection with fallback
         found_session_id = None
         
         if session_id:
-            print(f"[SESSION] Received session ID: {session_id}", flush=True)
             found_session_id = session_id
         else:
-            print(f"[SESSION] No session ID provided, using fallback detection...", flush=True)
-            
-            # FALLBACK 1: If there's only one session, use it (common case)
-            if len(sessions) == 1:
-                found_session_id = list(sessions.keys())[0]
-                print(f"[SESSION] Using single existing session: {found_session_id}", flush=True)
-            
-            # FALLBACK 2: Look for a session that matches conversation length
-            elif len(messages) > 1:
-                target_length = len(messages) - 1  # Expected message count in existing session
-                for existing_session_id, existing_state in sessions.items():
-                    existing_count = len(existing_state.get('messages', []))
-                    if existing_count == target_length:
-                        # Additional check: compare last message
-                        existing_messages = existing_state.get('messages', [])
-                        if (existing_messages and len(messages) > 1 and 
-                            existing_messages[-1].get('content', '') == messages[-2].content):
-                            found_session_id = existing_session_id
-                            print(f"[SESSION] Found session by message count and content: {found_session_id}", flush=True)
-                            break
+            if len(messages) > 1:
+                # Conversation in progress: look it up by its length and the
+                # last tutor reply the client saw
+                last_assistant = messages[-2].content if messages[-2].role == "assistant" else ""
+                found_session_id = session_store.find_by_transcript(len(messages) - 1, last_assistant)
+                if found_session_id:
+                    logger.info("Matched id-less request to session %s by transcript", found_session_id)
+            else:
+                # New conversation: take a session created via /api/new-session that hasn't been used yet
+                found_session_id = session_store.claim_unused_session()
+                if found_session_id:
+                    logger.info("Claimed unused session %s", found_session_id)
         
         # Create new session if none found
         if not found_session_id:
             found_session_id = create_session()
-            print(f"[SESSION] Created new session: {found_session_id}", flush=True)
-        
-        # Get or create state
-        state = get_session(found_session_id)
-        if not state:
-            print(f"[SESSION] Initializing new session: {found_session_id}", flush=True)
-            state = initialize_session(found_session_id)
-            update_session(found_session_id, state)
-        else:
-            print(f"[SESSION] Using existing session: {found_session_id} with {len(state.get('messages', []))} messages", flush=True)
+            logger.info("Created new session %s", found_session_id)
+        session_id_var.set(found_session_id)
         
         # Convert messages and process
         anthropic_messages = convert_to_anthropic_messages(messages)
@@ -177,47 +563,306 @@ async def stream_chat_response(messages: List[ClientMessage], session_id: Option
             yield f'0:{{\"type\":\"error\",\"error\":\"No messages provided\"}}\n'
             return
         
-        current_input = anthropic_messages[-1]["content"]
-        state["current_input"] = current_input
-        state["messages"] = anthropic_messages[:-1]
-        
-        # Process through graph
-        result = await graph.ainvoke(state)
-        update_session(found_session_id, result)
-        
-        # Extract response content
-        if result["messages"]:
-            response_content = result["messages"][-1]["content"]
+        key = turn_key(found_session_id, messages, delta, turn)
+        pending = turn_coordinator.join(key)
+        if pending:
+            result = await turn_coordinator.wait(pending)
+            if not isinstance(result, JSONResponse):
+                state = result.state
+                if state["messages"]:
+                    yield text_part(state["messages"][-1]["content"])
+                yield progress_annotation(result.completed, state.get("current_milestone"), state.get("milestones_completed", []))
         else:
-            response_content = "I apologize, but I couldn't generate a response. Please try again."
+            events: asyncio.Queue = asyncio.Queue()
+            pending = turn_coordinator.start(key, run_turn(
+                found_session_id, anthropic_messages, delta=delta, turn=turn,
+                history_hash=history_hash, curriculum_id=curriculum_id, events=events,
+            ))
+            while (event := await events.get()) is not None:
+                kind, value = event
+                if kind == "session":
+                    yield data_part(value)
+                elif kind == "text":
+                    yield text_part(value)
+                elif kind == "progress":
+                    yield progress_annotation(value["completed"], value["current_milestone"], value["milestones_completed"])
+            result = await turn_coordinator.wait(pending)
         
-        # Stream the response content word by word
-        words = response_content.split()
-        for i, word in enumerate(words):
-            chunk = word + (" " if i < len(words) - 1 else "")
-            yield f'0:{json.dumps(chunk)}\n'
+        if isinstance(result, JSONResponse):
+            # Another turn on this session finished after the request was
+            # checked; the client has to resync or resend the full history
+            error = json.loads(result.body)["error"]
+            yield f'0:{json.dumps({"type": "error", "error": error})}\n'
+            return
+        state = result.state
+        
+        if delta:
+            # Lets the client pin its next delta request to this history
+            yield data_part({"sessionId": found_session_id, "turn": transcript_length(state), "historyHash": state_transcript_key(state)})
         
         # Send completion signal
-        yield f'e:{{\"finishReason\":\"stop\",\"usage\":{{\"promptTokens\":0,\"completionTokens\":0}},\"isContinued\":false}}\n'
+        usage = state.get("usage") or {}
+        yield f'e:{json.dumps({"finishReason": "stop", "usage": {"promptTokens": usage.get("input_tokens", 0), "completionTokens": usage.get("output_tokens", 0)}, "isContinued": False})}\n'
         
-    except Exception as e:
-        print(f"[STREAMING] ERROR: {str(e)}", flush=True)
+    except AdmissionRejected:
+        # Headers are already sent, so this can't become a 429 any more
+        yield f'0:{{\"type\":\"error\",\"error\":\"overloaded\"}}\n'
+    except Exception:
+        logger.exception("Streaming chat response failed")
         yield f'0:{{\"type\":\"error\",\"error\":\"Error processing request\"}}\n'
 
 
+class ChatSocket:
+    """One /api/ws connection and the session bound to it.
+
+    The session's state is loaded once, when the socket opens, and carried
+    from turn to turn; it is only reloaded if another request (a POST, or a
+    second socket) changed the session in between. Frames are JSON objects.
+    The client sends ``{"type": "message", "content": ...}`` for each turn,
+    and ``ping``/``pong``. The server sends:
+
+    - ``session`` on connect: ids, progress, and any messages the client
+      missed (those after `turn`, when it reconnects with one)
+    - ``delta`` frames with the tutor's message as it streams
+    - ``milestone`` as soon as the turn is assessed, if it completed a
+      milestone (usually before the reply has finished streaming)
+    - ``done`` with the full message, the new turn count and history hash
+    - ``error``, ``ping`` and ``pong``
+
+    A turn the client disconnects from still runs to the end and is stored,
+    so reconnecting with the session id and turn count picks up the reply.
+    """
+
+    def __init__(self, websocket: WebSocket, state: TutorState):
+        self.websocket = websocket
+        self.state = state
+        self.session_id = state["session_id"]
+        self.inbox: asyncio.Queue = asyncio.Queue(maxsize=WS_MAX_QUEUED_MESSAGES)
+        self.last_seen = time.monotonic()
+        self.closed = False
+        self.busy = False
+        self._send_lock = asyncio.Lock()
+
+    async def send(self, frame: Dict[str, Any]) -> None:
+        if self.closed:
+            return
+        try:
+            async with self._send_lock:
+                await self.websocket.send_json(frame)
+        except (WebSocketDisconnect, RuntimeError):
+            self.closed = True
+
+    async def send_session(self, resumed: bool, turn: Optional[int]) -> None:
+        state = self.state
+        offset = state.get("history_offset", 0)
+        await self.send({
+            "type": "session",
+            "session_id": self.session_id,
+            "resumed": resumed,
+            "turn": transcript_length(state),
+            "history_hash": state_transcript_key(state),
+            "current_milestone": state.get("current_milestone"),
+            "milestones_completed": state.get("milestones_completed", []),
+            # Messages before this index were folded into the server-side summary
+            "history_offset": offset,
+            "messages": state["messages"][max(0, turn - offset):] if turn is not None else [],
+        })
+
+    async def run(self) -> None:
+        receiver = asyncio.create_task(self.receive())
+        heartbeat = asyncio.create_task(self.heartbeat())
+        turns = asyncio.create_task(self.turns())
+        try:
+            await asyncio.wait({receiver, heartbeat}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            self.closed = True
+            receiver.cancel()
+            heartbeat.cancel()
+            if not self.busy and self.inbox.empty():
+                turns.cancel()
+            # Let turns in progress finish so their replies are stored for a resume
+            await asyncio.gather(receiver, heartbeat, turns, return_exceptions=True)
+
+    async def receive(self) -> None:
+        while True:
+            try:
+                raw = await self.websocket.receive_text()
+            except (WebSocketDisconnect, RuntimeError):
+                return
+            self.last_seen = time.monotonic()
+            try:
+                frame = json.loads(raw)
+                kind = frame["type"]
+            except (ValueError, TypeError, KeyError):
+                await self.send({"type": "error", "error": "invalid_frame"})
+                continue
+            if kind == "ping":
+                await self.send({"type": "pong"})
+            elif kind == "message":
+                content = frame.get("content")
+                if not isinstance(content, str) or not content.strip():
+                    await self.send({"type": "error", "error": "No messages provided"})
+                    continue
+                try:
+                    self.inbox.put_nowait(content)
+                except asyncio.QueueFull:
+                    await self.send({"type": "error", "error": "busy"})
+            elif kind != "pong":
+                await self.send({"type": "error", "error": "invalid_frame"})
+
+    async def heartbeat(self) -> None:
+        while not self.closed:
+            await asyncio.sleep(WS_HEARTBEAT_INTERVAL)
+            if time.monotonic() - self.last_seen > WS_IDLE_TIMEOUT:
+                logger.info("Closing idle WebSocket")
+                await self.websocket.close(code=1000, reason="idle")
+                return
+            await self.send({"type": "ping"})
+
+    async def turns(self) -> None:
+        # Messages that arrived before a disconnect are still answered
+        while not (self.closed and self.inbox.empty()):
+            content = await self.inbox.get()
+            self.busy = True
+            try:
+                await self.turn(content)
+            finally:
+                self.busy = False
+
+    async def turn(self, content: str) -> None:
+        if admission.saturated():
+            exc = admission.reject()
+            await self.send({"type": "error", "error": "overloaded", "retry_after": exc.retry_after})
+            return
+        try:
+            async with turn_coordinator.session_lock(self.session_id):
+                if session_store.stored_transcript_key(self.session_id) != state_transcript_key(self.state):
+                    # Changed by another request since this socket last saw it
+                    self.state = await load_session(self.session_id) or self.state
+                state = self.state
+                state["current_input"] = content
+                async for kind, value in stream_turn(state, self.session_id):
+                    if kind == "text":
+                        await self.send({"type": "delta", "text": value})
+                    elif kind == "progress":
+                        if value["completed"]:
+                            await self.send({**value, "type": "milestone"})
+                    else:
+                        self.state = value
+        except AdmissionRejected as e:
+            await self.send({"type": "error", "error": "overloaded", "retry_after": e.retry_after})
+            return
+        except Exception:
+            logger.exception("WebSocket turn failed")
+            await self.send({"type": "error", "error": "Error processing request"})
+            return
+        
+        result = self.state
+        usage = result.get("usage") or {}
+        await self.send({
+            "type": "done",
+            "content": result["messages"][-1]["content"] if result["messages"] else "",
+            "turn": transcript_length(result),
+            "history_hash": state_transcript_key(result),
+            "usage": {"promptTokens": usage.get("input_tokens", 0), "completionTokens": usage.get("output_tokens", 0)},
+        })
+
+_open_sockets: set = set()
+registry.gauge("tutor_websocket_connections", "Open /api/ws connections on this worker.", lambda: len(_open_sockets))
+
+@app.websocket("/api/ws")
+async def chat_websocket(
+    websocket: WebSocket, session_id: Optional[str] = None, turn: Optional[int] = None, curriculum_id: Optional[str] = None,
+):
+    """Chat over one WebSocket per conversation (see ChatSocket).
+
+    Reconnect with ``?session_id=...&turn=N`` to resume, where N is how many
+    messages the client holds; a new session is created when there is no
+    session id or it is unknown.
+    """
+    if curriculum_id and curriculum_id not in curriculum_registry:
+        await websocket.close(code=1008, reason=f"Unknown curriculum: {curriculum_id}")
+        return
+    await websocket.accept()
+    
+    session_id = session_id or create_session()
+    session_id_var.set(session_id)
+    # Waits out a turn the previous connection left running, so its reply is
+    # part of what the client gets back
+    async with turn_coordinator.session_lock(session_id):
+        state = await load_session(session_id)
+        resumed = state is not None
+        if not state:
+            state = initialize_session(session_id, curriculum_id)
+            session_store.put(session_id, state)
+    logger.info("WebSocket %s session", "resumed" if resumed else "opened")
+    
+    socket = ChatSocket(websocket, state)
+    _open_sockets.add(socket)
+    try:
+        await socket.send_session(resumed, turn)
+        await socket.run()
+    finally:
+        _open_sockets.discard(socket)
+        logger.info("WebSocket closed")
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus metrics for this worker."""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/api/warm-up")
+async def warm_up_endpoint():
+    """Load the tutoring graph and models so the next turn doesn't pay for it."""
+    seconds = await asyncio.get_running_loop().run_in_executor(None, warm_up)
+    return {"ready": True, "seconds": round(seconds, 3)}
+
+@app.get("/api/curricula")
+async def list_curricula():
+    """List the courses this deployment can tutor."""
+    return [
+        {"id": c.id, "name": c.config.name, "description": c.config.description, "milestones": len(c.milestone_ids)}
+        for c in curriculum_registry
+    ]
+
 @app.post("/api/new-session")
-async def create_new_session():
+async def create_new_session(request: Optional[NewSessionRequest] = None):
     """Create a new tutoring session."""
-    print(f"\n[API] === NEW SESSION REQUEST ===")
+    curriculum_id = request.curriculum_id if request else None
+    check_curriculum(curriculum_id)
     session_id = create_session()
-    print(f"[API] Created session: {session_id}")
+    session_id_var.set(session_id)
     
-    state = initialize_session(session_id)
-    milestone_count = len(state['curriculum']['milestones'])
-    print(f"[API] Initialized session with {milestone_count} total milestones")
+    state = initialize_session(session_id, curriculum_id)
+    session_store.put(session_id, state, claimable=True)
+    _initial_checkpoints.add(asyncio.create_task(checkpoint_new_session(session_id, state)))
+    logger.info("Created new session on curriculum %s", state['curriculum_id'])
     
-    update_session(session_id, state)
-    print(f"[API] Stored session state")
-    print(f"[API] === NEW SESSION COMPLETE ===\n")
-    
-    return {"session_id": session_id}
\ No newline at end of file
+    return {"session_id": session_id}
+
+_initial_checkpoints: set = set()
+
+async def checkpoint_new_session(session_id: str, state: TutorState) -> None:
+    """Write a new session's initial state, curriculum included, as its
+    first checkpoint so whichever worker gets its first turn starts from it.
+
+    Runs after /api/new-session has answered: on a cold instance the graph
+    is built in a thread first, so the response doesn't wait for the
+    imports. Under the session lock, and only if the thread is still empty,
+    so it never lands on top of a turn that got there first.
+    """
+    try:
+        graph = await asyncio.to_thread(get_graph)
+        if not graph.checkpointer:
+            return
+        from .utils.graph import turn_node
+
+        async with turn_coordinator.session_lock(session_id):
+            config = thread_config(session_id)
+            if not await graph.checkpointer.aget_tuple(config):
+                await graph.aupdate_state(config, state, as_node=turn_node(graph))
+    except Exception:
+        logger.exception("Writing the initial checkpoint failed")
+    finally:
+        _initial_checkpoints.discard(asyncio.current_task())
\ No newline at end of file
@@ -0,0 +1,171 @@
+"""Replay stored student transcripts through the tutoring graph.
+
+Each line of the input JSONL file is one transcript:
+
+    {"id": "alice-1", "curriculum_id": "tictactoe", "background": "...",
+     "messages": [{"role": "user", "content": "..."}, {"role": "assistant", "content": "...",
+                   "milestone_completed": "m1"}, ...]}
+
+Only `messages` is required. Every user message is replayed, in order,
+through ``build_graph()`` as a fresh session (no checkpointer), so the
+history the tutor sees is its own replayed replies rather than the stored
+ones. A stored assistant message may carry the `milestone_completed`
+recorded at the time; it is reported next to the replayed decision.
+
+One JSON line per turn is appended to the results file: the milestone
+decision, route, latency and token usage. A transcript's rows are written
+together, followed by a ``{"id": ..., "done": true}`` line, once all of its
+turns have run. On restart, transcripts with a done line are skipped and
+rows of unfinished ones are discarded and replayed.
+
+    python -m api.replay transcripts.jsonl results.jsonl --concurrency 16
+    python -m api.replay transcripts.jsonl results.jsonl --offline   # fake model, no API key
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from typing import Any, Dict, List, Set
+
+
+def load_transcripts(path: str) -> List[Dict[str, Any]]:
+    transcripts = []
+    with open(path, encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            transcript = json.loads(line)
+            transcript.setdefault("id", f"line-{number}")
+            transcripts.append(transcript)
+    return transcripts
+
+
+def finished_ids(path: str) -> Set[str]:
+    """Ids of transcripts completed by an earlier run; drops the rows of
+    unfinished ones (and any line cut short by an interruption)."""
+    if not os.path.exists(path):
+        return set()
+    rows = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                rows.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    done = {row["id"] for row in rows if row.get("done")}
+    with open(path, "w", encoding="utf-8") as f:
+        for row in rows:
+            if row["id"] in done:
+                f.write(json.dumps(row) + "\n")
+    return done
+
+
+async def replay(graph, transcript: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Run every user message of `transcript` through `graph`; one row per turn."""
+    from .index import initialize_session
+
+    state = initialize_session(f"replay-{transcript['id']}", transcript.get("curriculum_id"))
+    if transcript.get("background"):
+        state["student"] = {"background": transcript["background"]}
+
+    messages = transcript["messages"]
+    rows = []
+    for index, message in enumerate(messages):
+        if message["role"] != "user":
+            continue
+        recorded = messages[index + 1] if index + 1 < len(messages) and messages[index + 1]["role"] == "assistant" else {}
+        before = state["current_milestone"]
+        completed_before = set(state["milestones_completed"])
+        state = {**state, "current_input": message["content"], "usage": {}}
+
+        started = time.perf_counter()
+        state = await graph.ainvoke(state)
+        elapsed = time.perf_counter() - started
+
+        usage = state.get("usage") or {}
+        newly_completed = [m for m in state["milestones_completed"] if m not in completed_before]
+        rows.append({
+            "id": transcript["id"],
+            "turn": len(rows) + 1,
+            "milestone_before": before,
+            "milestone_completed": newly_completed[0] if newly_completed else None,
+            "recorded_milestone_completed": recorded.get("milestone_completed"),
+            "milestones_completed": state["milestones_completed"],
+            "route": state.get("route"),
+            "latency_ms": round(elapsed * 1000),
+            "input_tokens": usage.get("input_tokens", 0),
+            "output_tokens": usage.get("output_tokens", 0),
+            "cache_read_input_tokens": usage.get("cache_read_input_tokens", 0),
+            "cost_usd": usage.get("cost_usd", 0),
+            # A failed model call leaves the turn without usage
+            "error": not usage,
+        })
+    return rows
+
+
+async def run(args) -> int:
+    from .utils.graph import build_graph
+
+    transcripts = load_transcripts(args.transcripts)
+    done = finished_ids(args.results) if args.resume else set()
+    if not args.resume:
+        open(args.results, "w").close()
+    pending = [t for t in transcripts if t["id"] not in done]
+    print(f"{len(transcripts)} transcripts, {len(transcripts) - len(pending)} already done, {len(pending)} to replay",
+          file=sys.stderr)
+
+    graph = build_graph()
+    limit = asyncio.Semaphore(args.concurrency)
+    failures = 0
+    started = time.perf_counter()
+
+    with open(args.results, "a", encoding="utf-8") as results:
+        async def replay_one(transcript: Dict[str, Any]) -> None:
+            nonlocal failures
+            async with limit:
+                try:
+                    rows = await replay(graph, transcript)
+                except Exception as e:
+                    failures += 1
+                    print(f"{transcript['id']}: {type(e).__name__}: {e}", file=sys.stderr)
+                    return
+            # One write per transcript, so an interruption can't split it
+            lines = [json.dumps(row) for row in rows]
+            lines.append(json.dumps({
+                "id": transcript["id"], "done": True, "turns": len(rows),
+                "milestones_completed": rows[-1]["milestones_completed"] if rows else [],
+            }))
+            results.write("\n".join(lines) + "\n")
+            results.flush()
+
+        await asyncio.gather(*(replay_one(t) for t in pending))
+
+    print(f"replayed {len(pending) - failures} transcripts in {time.perf_counter() - started:.1f}s, "
+          f"{failures} failed", file=sys.stderr)
+    return 1 if failures else 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("transcripts", help="JSONL file of transcripts")
+    parser.add_argument("results", help="JSONL file for per-turn results")
+    parser.add_argument("--concurrency", type=int, default=8, help="transcripts replayed at the same time")
+    parser.add_argument("--offline", action="store_true", help="use the offline fake model instead of the API")
+    parser.add_argument("--no-resume", dest="resume", action="store_false",
+                        help="start over instead of skipping transcripts already in the results file")
+    args = parser.parse_args()
+
+    # Configure the app before it is imported
+    if args.offline:
+        os.environ.setdefault("LLM_PROVIDER", "fake")
+        os.environ.setdefault("FAKE_LLM_LATENCY", "0")
+        os.environ.setdefault("FAKE_LLM_TOKEN_DELAY", "0")
+    os.environ.setdefault("CHECKPOINT_DB_PATH", "")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    return asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
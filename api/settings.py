@@ -1,6 +1,171 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 
 load_dotenv(".env.local")
 
-ANTHROPIC_API_KEY = os.environ.get("ANTHROPIC_API_KEY") 
\ No newline at end of file
+ANTHROPIC_API_KEY = os.environ.get("ANTHROPIC_API_KEY") 
+
+# Model backend. "anthropic" calls the API; "fake" uses the offline stand-in
+# in utils/fake_llm.py, which replays FAKE_LLM_SCRIPT (a JSONL file of
+# TutoringResponse objects) or scripted replies, streamed token by token after
+# FAKE_LLM_LATENCY seconds (plus FAKE_LLM_PREFILL_DELAY per thousand prompt
+# tokens not served from its simulated prompt cache) with FAKE_LLM_TOKEN_DELAY
+# seconds between tokens.
+LLM_PROVIDER = os.environ.get("LLM_PROVIDER", "anthropic")
+FAKE_LLM_SCRIPT = os.environ.get("FAKE_LLM_SCRIPT") or None
+FAKE_LLM_LATENCY = float(os.environ.get("FAKE_LLM_LATENCY", "0.3"))
+FAKE_LLM_TOKEN_DELAY = float(os.environ.get("FAKE_LLM_TOKEN_DELAY", "0.01"))
+FAKE_LLM_PREFILL_DELAY = float(os.environ.get("FAKE_LLM_PREFILL_DELAY", "0"))
+
+# Admission control for model calls: at most LLM_MAX_CONCURRENCY run at once
+# and up to LLM_MAX_QUEUE wait (round-robin across sessions) for at most
+# LLM_QUEUE_TIMEOUT seconds; beyond that requests get a 429. LLM_TIMEOUT
+# bounds each call end to end, including the streamed response.
+LLM_MAX_CONCURRENCY = int(os.environ.get("LLM_MAX_CONCURRENCY", "32"))
+LLM_MAX_QUEUE = int(os.environ.get("LLM_MAX_QUEUE", "128"))
+LLM_QUEUE_TIMEOUT = float(os.environ.get("LLM_QUEUE_TIMEOUT", "10"))
+LLM_TIMEOUT = float(os.environ.get("LLM_TIMEOUT", "60"))
+
+# Anthropic HTTP client, shared by every model: a keep-alive pool of at most
+# LLM_POOL_MAX_CONNECTIONS (LLM_POOL_MAX_KEEPALIVE idle ones kept for
+# LLM_KEEPALIVE_EXPIRY seconds), LLM_CONNECT_TIMEOUT to connect and
+# LLM_READ_TIMEOUT between reads. Connection errors, 408/429/5xx and
+# overloaded responses are retried LLM_MAX_RETRIES times with full-jitter
+# exponential backoff from LLM_RETRY_BASE_DELAY up to LLM_RETRY_MAX_DELAY
+# seconds. A call with no response bytes after the LLM_HEDGE_PERCENTILE
+# percentile of recent first-byte times (never less than LLM_HEDGE_MIN_DELAY;
+# LLM_HEDGE_INITIAL_DELAY until there are enough samples) gets a second,
+# hedged request and the slower of the two is cancelled. At most
+# LLM_HEDGE_MAX_RATIO of calls are hedged; LLM_HEDGE_PERCENTILE=0 disables it.
+LLM_POOL_MAX_CONNECTIONS = int(os.environ.get("LLM_POOL_MAX_CONNECTIONS", "64"))
+LLM_POOL_MAX_KEEPALIVE = int(os.environ.get("LLM_POOL_MAX_KEEPALIVE", "32"))
+LLM_KEEPALIVE_EXPIRY = float(os.environ.get("LLM_KEEPALIVE_EXPIRY", "60"))
+LLM_CONNECT_TIMEOUT = float(os.environ.get("LLM_CONNECT_TIMEOUT", "5"))
+LLM_READ_TIMEOUT = float(os.environ.get("LLM_READ_TIMEOUT", "30"))
+LLM_MAX_RETRIES = int(os.environ.get("LLM_MAX_RETRIES", "2"))
+LLM_RETRY_BASE_DELAY = float(os.environ.get("LLM_RETRY_BASE_DELAY", "0.5"))
+LLM_RETRY_MAX_DELAY = float(os.environ.get("LLM_RETRY_MAX_DELAY", "8"))
+LLM_HEDGE_PERCENTILE = float(os.environ.get("LLM_HEDGE_PERCENTILE", "95"))
+LLM_HEDGE_MIN_DELAY = float(os.environ.get("LLM_HEDGE_MIN_DELAY", "0.5"))
+LLM_HEDGE_INITIAL_DELAY = float(os.environ.get("LLM_HEDGE_INITIAL_DELAY", "3"))
+LLM_HEDGE_MAX_RATIO = float(os.environ.get("LLM_HEDGE_MAX_RATIO", "0.1"))
+
+# Model routing: a turn goes to STRONG_MODEL when it carries code that parses
+# (and so may complete the milestone) or is at least ROUTE_LONG_MESSAGE_CHARS
+# long; everything else goes to FAST_MODEL. Each route has its own max_tokens
+# and USD prices per million input/output tokens for the cost metric (cache
+# reads bill at 0.1x and cache writes at 1.25x the input price). The static
+# system prompt is only cached on models whose minimum prefix it reaches; with
+# the stock curriculum that is STRONG_MODEL but not a Haiku FAST_MODEL, which
+# needs 2048 tokens (see utils/prompt.py).
+FAST_MODEL = os.environ.get("FAST_MODEL", "claude-3-haiku-20240307")
+FAST_MAX_TOKENS = int(os.environ.get("FAST_MAX_TOKENS", "512"))
+FAST_INPUT_PRICE = float(os.environ.get("FAST_INPUT_PRICE", "0.25"))
+FAST_OUTPUT_PRICE = float(os.environ.get("FAST_OUTPUT_PRICE", "1.25"))
+STRONG_MODEL = os.environ.get("STRONG_MODEL", "claude-3-5-sonnet-20240620")
+STRONG_MAX_TOKENS = int(os.environ.get("STRONG_MAX_TOKENS", "1024"))
+STRONG_INPUT_PRICE = float(os.environ.get("STRONG_INPUT_PRICE", "3"))
+STRONG_OUTPUT_PRICE = float(os.environ.get("STRONG_OUTPUT_PRICE", "15"))
+ROUTE_LONG_MESSAGE_CHARS = int(os.environ.get("ROUTE_LONG_MESSAGE_CHARS", "600"))
+
+# Response cache for turns without code: replies are reused for the same
+# curriculum, milestone progress, normalized message and recent context.
+# Off unless RESPONSE_CACHE_MAX_ENTRIES > 0; entries expire after
+# RESPONSE_CACHE_TTL_SECONDS and the cache stays under RESPONSE_CACHE_MAX_BYTES.
+RESPONSE_CACHE_MAX_ENTRIES = int(os.environ.get("RESPONSE_CACHE_MAX_ENTRIES", "0"))
+RESPONSE_CACHE_TTL_SECONDS = float(os.environ.get("RESPONSE_CACHE_TTL_SECONDS", str(60 * 60)))
+RESPONSE_CACHE_MAX_BYTES = int(os.environ.get("RESPONSE_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+
+# Rolling summary: every SUMMARY_EVERY_TURNS turns, all but the latest
+# HISTORY_KEEP_MESSAGES messages are folded into the session's running
+# summary by SUMMARY_MODEL and dropped from the stored history.
+SUMMARY_MODEL = os.environ.get("SUMMARY_MODEL", "claude-3-haiku-20240307")
+SUMMARY_EVERY_TURNS = int(os.environ.get("SUMMARY_EVERY_TURNS", "4"))
+HISTORY_KEEP_MESSAGES = int(os.environ.get("HISTORY_KEEP_MESSAGES", "6"))
+
+# Local pre-assessment: code the student shares is run against the current
+# milestone's checks in a subprocess limited to ASSESSMENT_TIMEOUT seconds and
+# ASSESSMENT_MEMORY_MB of memory. Up to ASSESSMENT_MAX_CODE_CHARS of the
+# session's code is kept so later milestones can build on earlier functions.
+# ASSESSMENT_SANDBOX picks how the checks are isolated: "off" (the default)
+# never runs student code and leaves grading to the model; "bwrap" runs it
+# under bubblewrap (ASSESSMENT_SANDBOX_BIN) as nobody, with no network, a
+# read-only view of the Python install only and a private /tmp;
+# "unsafe-local" runs it as the server's own user and is for local
+# development with trusted code only.
+ASSESSMENT_SANDBOX = os.environ.get("ASSESSMENT_SANDBOX", "off").lower()
+ASSESSMENT_SANDBOX_BIN = os.environ.get("ASSESSMENT_SANDBOX_BIN", "bwrap")
+ASSESSMENT_TIMEOUT = float(os.environ.get("ASSESSMENT_TIMEOUT", "3"))
+ASSESSMENT_MEMORY_MB = int(os.environ.get("ASSESSMENT_MEMORY_MB", "256"))
+ASSESSMENT_MAX_CODE_CHARS = int(os.environ.get("ASSESSMENT_MAX_CODE_CHARS", "20000"))
+
+# Parallel assessment: with PARALLEL_ASSESSMENT on, each turn runs the tutor
+# reply and the milestone assessment as separate graph nodes at the same time
+# and a join node applies the milestone guards; off, one node and one model
+# call do both. Code that local checks can't decide is graded by
+# ASSESSMENT_MODEL with at most ASSESSMENT_MAX_TOKENS of output. Off by
+# default: benchmarks/parallel_assessment shows no gain in time to first text
+# and, without a sandbox to run checks, more tokens per turn.
+PARALLEL_ASSESSMENT = os.environ.get("PARALLEL_ASSESSMENT", "0").lower() in ("1", "true", "yes")
+ASSESSMENT_MODEL = os.environ.get("ASSESSMENT_MODEL", STRONG_MODEL)
+ASSESSMENT_MAX_TOKENS = int(os.environ.get("ASSESSMENT_MAX_TOKENS", "200"))
+
+# Streaming: decoded tutor text is sent to the client in batches of at least
+# STREAM_MIN_CHUNK_CHARS characters, or whatever has accumulated once
+# STREAM_MAX_CHUNK_DELAY seconds have passed since the last flush.
+STREAM_MIN_CHUNK_CHARS = int(os.environ.get("STREAM_MIN_CHUNK_CHARS", "24"))
+STREAM_MAX_CHUNK_DELAY = float(os.environ.get("STREAM_MAX_CHUNK_DELAY", "0.05"))
+
+# WebSocket chat (/api/ws): the server pings every WS_HEARTBEAT_INTERVAL
+# seconds and closes connections it hasn't heard from (any frame, including
+# pongs) for WS_IDLE_TIMEOUT seconds. Up to WS_MAX_QUEUED_MESSAGES messages
+# sent while a turn is running wait their turn; more are refused.
+WS_HEARTBEAT_INTERVAL = float(os.environ.get("WS_HEARTBEAT_INTERVAL", "20"))
+WS_IDLE_TIMEOUT = float(os.environ.get("WS_IDLE_TIMEOUT", "60"))
+WS_MAX_QUEUED_MESSAGES = int(os.environ.get("WS_MAX_QUEUED_MESSAGES", "4"))
+
+# In-memory session store bounds. Least recently used sessions are evicted
+# once either the count or the approximate byte budget is exceeded, and any
+# session idle for longer than the TTL is dropped. Sessions are held in a
+# compact form: only the newest SESSION_RECENT_MESSAGES messages stay as
+# plain strings, older messages and shared code are zlib-compressed.
+SESSION_MAX_COUNT = int(os.environ.get("SESSION_MAX_COUNT", "5000"))
+SESSION_IDLE_TTL_SECONDS = float(os.environ.get("SESSION_IDLE_TTL_SECONDS", str(6 * 60 * 60)))
+SESSION_MAX_BYTES = int(os.environ.get("SESSION_MAX_BYTES", str(256 * 1024 * 1024)))
+SESSION_RECENT_MESSAGES = int(os.environ.get("SESSION_RECENT_MESSAGES", "4"))
+
+# Durable session checkpoints (SQLite in WAL mode, shared by every worker on
+# the host). Writes are buffered and committed in batches every
+# CHECKPOINT_FLUSH_INTERVAL seconds or once CHECKPOINT_BATCH_SIZE rows are
+# pending; only the newest CHECKPOINT_KEEP checkpoints per session are kept.
+# Every CHECKPOINT_SWEEP_INTERVAL seconds, sessions nobody has written to for
+# CHECKPOINT_RETENTION_SECONDS are deleted from the database. This is the
+# student's saved progress, so it is kept far longer than the in-memory
+# SESSION_IDLE_TTL_SECONDS; 0 keeps sessions forever.
+# Set CHECKPOINT_DB_PATH to an empty string to disable persistence.
+CHECKPOINT_DB_PATH = os.environ.get(
+    "CHECKPOINT_DB_PATH", os.path.join(tempfile.gettempdir(), "tutor_checkpoints.sqlite")
+)
+CHECKPOINT_FLUSH_INTERVAL = float(os.environ.get("CHECKPOINT_FLUSH_INTERVAL", "0.05"))
+CHECKPOINT_BATCH_SIZE = int(os.environ.get("CHECKPOINT_BATCH_SIZE", "64"))
+CHECKPOINT_KEEP = int(os.environ.get("CHECKPOINT_KEEP", "3"))
+CHECKPOINT_SWEEP_INTERVAL = float(os.environ.get("CHECKPOINT_SWEEP_INTERVAL", "300"))
+CHECKPOINT_RETENTION_SECONDS = float(os.environ.get("CHECKPOINT_RETENTION_SECONDS", str(90 * 24 * 60 * 60)))
+
+# Curricula are loaded from JSON (or YAML, if PyYAML is installed) files in
+# CURRICULUM_DIR at startup; new sessions use DEFAULT_CURRICULUM_ID unless
+# the client asks for another one.
+CURRICULUM_DIR = os.environ.get("CURRICULUM_DIR", os.path.join(os.path.dirname(__file__), "curricula"))
+DEFAULT_CURRICULUM_ID = os.environ.get("DEFAULT_CURRICULUM_ID", "tictactoe")
+
+# Cold start: LangGraph, LangChain, the model clients and the compiled graph
+# are loaded on the first tutoring turn, not at import. With
+# WARM_UP_ON_STARTUP=1 they are loaded in the background as soon as the app
+# starts; GET /api/warm-up does the same on demand (e.g. from a cron ping).
+WARM_UP_ON_STARTUP = os.environ.get("WARM_UP_ON_STARTUP", "0").lower() in ("1", "true", "yes")
+
+# Logging: LOG_LEVEL=DEBUG turns on the per-turn milestone guard tracing;
+# LOG_FORMAT is "json" (one object per line) or "text".
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.environ.get("LOG_FORMAT", "json")
@@ -0,0 +1,115 @@
+import asyncio
+import math
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Deque
+
+from ..settings import LLM_MAX_CONCURRENCY, LLM_MAX_QUEUE, LLM_QUEUE_TIMEOUT
+from .log import get_logger
+from .metrics import registry
+
+logger = get_logger("admission")
+
+ADMISSION_REJECTED = registry.counter("tutor_llm_calls_rejected_total", "Model calls rejected by admission control.")
+
+class AdmissionRejected(Exception):
+    """No model call slot is available; retry after `retry_after` seconds."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Too many pending tutoring requests, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+class AdmissionController:
+    """Bounds concurrent model calls with a bounded, session-fair wait queue.
+
+    Up to `max_concurrent` callers hold a slot at once. Others wait in
+    per-session FIFO queues that are served round-robin, so a session with
+    many queued requests can't starve the rest. When `max_queue` callers are
+    already waiting, or a caller waited `queue_timeout` seconds, it is
+    rejected with an estimated Retry-After instead of piling up.
+    """
+
+    def __init__(self, max_concurrent: int = LLM_MAX_CONCURRENCY, max_queue: int = LLM_MAX_QUEUE,
+                 queue_timeout: float = LLM_QUEUE_TIMEOUT):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self.queued = 0
+        self._waiting: "OrderedDict[str, Deque[asyncio.Future]]" = OrderedDict()
+        # Moving average of how long a slot is held, for Retry-After
+        self._hold_seconds = 2.0
+
+    def saturated(self) -> bool:
+        """True when a new caller would be rejected straight away."""
+        return self.active >= self.max_concurrent and self.queued >= self.max_queue
+
+    def retry_after(self) -> int:
+        waves = (self.queued + 1) / self.max_concurrent
+        return min(60, max(1, math.ceil(self._hold_seconds * waves)))
+
+    def reject(self) -> AdmissionRejected:
+        ADMISSION_REJECTED.inc()
+        logger.warning("Rejected model call: %d active, %d queued", self.active, self.queued)
+        return AdmissionRejected(self.retry_after())
+
+    @asynccontextmanager
+    async def slot(self, session_id: str):
+        await self._acquire(session_id)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._hold_seconds = 0.8 * self._hold_seconds + 0.2 * (time.perf_counter() - started)
+            self._release()
+
+    async def _acquire(self, session_id: str) -> None:
+        if self.active < self.max_concurrent and not self.queued:
+            self.active += 1
+            return
+        if self.queued >= self.max_queue:
+            raise self.reject()
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiting.setdefault(session_id, deque()).append(waiter)
+        self.queued += 1
+        try:
+            async with asyncio.timeout(self.queue_timeout):
+                await waiter
+        except BaseException as e:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as we gave up; pass it on
+                self._release()
+            else:
+                waiter.cancel()
+                self._discard(session_id, waiter)
+            if isinstance(e, TimeoutError):
+                raise self.reject() from None
+            raise
+
+    def _release(self) -> None:
+        # Hand the slot straight to the next session in round-robin order
+        while self._waiting:
+            session_id, waiters = self._waiting.popitem(last=False)
+            waiter = waiters.popleft()
+            self.queued -= 1
+            if waiters:
+                self._waiting[session_id] = waiters
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    def _discard(self, session_id: str, waiter: asyncio.Future) -> None:
+        waiters = self._waiting.get(session_id)
+        if waiters and waiter in waiters:
+            waiters.remove(waiter)
+            self.queued -= 1
+            if not waiters:
+                del self._waiting[session_id]
+
+admission = AdmissionController()
+
+registry.gauge("tutor_llm_calls_active", "Model calls currently holding an admission slot.", lambda: admission.active)
+registry.gauge("tutor_llm_calls_queued", "Model calls waiting for an admission slot.", lambda: admission.queued)
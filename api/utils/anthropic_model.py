@@ -0,0 +1,20 @@
+from functools import cached_property
+
+import anthropic
+from langchain_anthropic import ChatAnthropic
+
+from .http_client import llm_http_client
+
+class PooledChatAnthropic(ChatAnthropic):
+    """ChatAnthropic whose async calls go through the shared, pooled and
+    hedging HTTP client (see http_client) named `http_client_name`.
+
+    Retries are the transport's job, so build it with ``max_retries=0`` to
+    avoid the SDK retrying on top of them.
+    """
+
+    http_client_name: str = "tutor"
+
+    @cached_property
+    def _async_client(self) -> anthropic.AsyncClient:
+        return anthropic.AsyncClient(**self._client_params, http_client=llm_http_client(self.http_client_name))
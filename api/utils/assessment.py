@@ -0,0 +1,271 @@
+import ast
+import asyncio
+import json
+import os
+import re
+import secrets
+import sys
+import tempfile
+import time
+from typing import Dict, List, NamedTuple, Optional, Sequence
+
+from ..settings import (
+    ASSESSMENT_MAX_CODE_CHARS, ASSESSMENT_MEMORY_MB, ASSESSMENT_SANDBOX, ASSESSMENT_SANDBOX_BIN, ASSESSMENT_TIMEOUT,
+)
+from .log import get_logger
+from .metrics import registry
+
+logger = get_logger("assessment")
+
+ASSESSMENTS = registry.counter(
+    "tutor_assessments_total",
+    "Local pre-assessments by outcome: no_code, unseparated, syntax_error, passed, failed, unchecked or error.",
+    ("outcome",),
+)
+ASSESSMENT_LATENCY = registry.histogram("tutor_assessment_duration_seconds", "Duration of sandboxed milestone checks.")
+
+_CHECKS_SCRIPT = os.path.join(os.path.dirname(__file__), "assessment_checks.py")
+SANDBOXES = ("off", "bwrap", "unsafe-local")
+if ASSESSMENT_SANDBOX not in SANDBOXES:
+    raise ValueError(f"ASSESSMENT_SANDBOX must be one of {', '.join(SANDBOXES)}, not {ASSESSMENT_SANDBOX!r}")
+if ASSESSMENT_SANDBOX == "unsafe-local":
+    logger.warning("ASSESSMENT_SANDBOX=unsafe-local: student code runs unisolated as the server's user")
+# Read-only in the bubblewrap sandbox: the interpreter and the system libraries it links
+_SANDBOX_PATHS = tuple(dict.fromkeys((sys.base_prefix, sys.prefix, "/usr", "/lib", "/lib64", "/bin", "/etc/ld.so.cache")))
+_SANDBOX_SCRIPT = "/sandbox/assessment_checks.py"
+# More than any honest result; stops a submission flooding the result pipe
+_MAX_RESULT_BYTES = 1 << 20
+_FENCED = re.compile(r"```[ \t]*(?:python|py)?[ \t]*\n(.*?)```", re.S | re.I)
+# Lines that read as Python rather than prose: block headers ending in a
+# colon, imports, returns, assignments and print calls
+_CODE_LINE = re.compile(
+    r"^[ \t]*(?:(?:def|class|for|while|if|elif|else|try|except|finally|with)\b[^\n]*:[ \t]*(?:#[^\n]*)?$"
+    r"|(?:import|from)[ \t]+[\w.]+|return\b|print\(|[A-Za-z_][\w.]*(?:\[[^\]\n]*\])?[ \t]*[-+*/]?=(?!=))",
+    re.M,
+)
+# Lines of prose tolerated before or after unfenced code ("Here is my
+# code:", "Does this work?")
+_PROSE_LINES = 5
+# Bounds concurrent check subprocesses so a burst of submissions can't fork-bomb the instance
+_sandboxes = asyncio.Semaphore(os.cpu_count() or 2)
+
+class Assessment(NamedTuple):
+    """Local verdict on the code in one student message.
+
+    `checks` maps each of the milestone's checks to ``{"passed", "detail"}``;
+    it is empty when there was no code, it didn't parse, or the milestone
+    has no checks.
+    """
+
+    code_found: bool
+    syntax_error: Optional[str] = None
+    checks: Dict[str, dict] = {}
+    error: Optional[str] = None
+    # Code-like lines that couldn't be separated from the prose around them
+    unseparated: bool = False
+
+    @property
+    def checked(self) -> bool:
+        return bool(self.checks) and not self.error
+
+    @property
+    def passed(self) -> bool:
+        return self.checked and all(result["passed"] for result in self.checks.values())
+
+    @property
+    def outcome(self) -> str:
+        if not self.code_found:
+            return "no_code"
+        if self.unseparated:
+            return "unseparated"
+        if self.syntax_error:
+            return "syntax_error"
+        if self.error:
+            return "error"
+        if not self.checks:
+            return "unchecked"
+        return "passed" if self.passed else "failed"
+
+    def describe(self, milestone_id: Optional[str]) -> str:
+        """Verdict as prompt text for the tutoring model."""
+        if self.syntax_error:
+            return f"The student's code does not parse: {self.syntax_error}. {milestone_id} is not complete."
+        if self.unseparated:
+            return (f"The student's message seems to mix code with prose, so no automated checks ran; "
+                    f"judge yourself whether it completes {milestone_id}.")
+        if not self.checked:
+            return f"No automated checks are available for {milestone_id}; assess the code yourself."
+        lines = [
+            f"- {name}: {'PASSED' if result['passed'] else 'FAILED'} ({result['detail']})"
+            for name, result in self.checks.items()
+        ]
+        verdict = "complete" if self.passed else "not complete"
+        return (
+            f"Automated checks ran the student's code for {milestone_id}:\n" + "\n".join(lines)
+            + f"\nThese results are authoritative: {milestone_id} is {verdict}."
+        )
+
+    def describe_for_tutor(self, milestone_id: Optional[str]) -> str:
+        """Verdict as prompt text for a tutor that doesn't grade the turn
+        (the parallel graph's reply node); where `describe` asks the model
+        to judge the code itself, this says the verdict comes separately."""
+        if self.syntax_error or self.checked:
+            return self.describe(milestone_id)
+        return (f"No automated checks ran on this code for {milestone_id}; whether it completes {milestone_id} is "
+                f"assessed separately, so give feedback on the code without saying whether the milestone is done.")
+
+def _is_code(source: str) -> bool:
+    """Whether `source` parses as Python with more than bare expressions."""
+    try:
+        tree = ast.parse(source)
+    except SyntaxError:
+        return False
+    return any(not isinstance(node, ast.Expr) for node in tree.body)
+
+def extract_code(message: str) -> List[str]:
+    """Code blocks in a student message.
+
+    Fenced blocks are used when present. Otherwise a message that parses as
+    Python and contains more than bare expressions (prose like "what does a
+    list do?" fails to parse or is a single expression) is taken as code,
+    and failing that the longest run of lines that does, after dropping up
+    to _PROSE_LINES lines of prose from either end. Messages whose code
+    can't be separated this way yield nothing; see looks_like_code.
+    """
+    blocks = [block.strip("\n") for block in _FENCED.findall(message)]
+    if blocks:
+        return blocks
+    if _is_code(message):
+        return [message]
+    lines = message.splitlines()
+    # A statement can't start indented, so only unindented lines open a run
+    starts = [i for i, line in enumerate(lines[:_PROSE_LINES + 1]) if line[:1].strip()]
+    ends = range(len(lines), max(len(lines) - _PROSE_LINES, 0) - 1, -1)
+    for start, end in sorted(((s, e) for s in starts for e in ends if e > s), key=lambda span: span[0] - span[1]):
+        code = "\n".join(lines[start:end]).strip("\n")
+        if _is_code(code):
+            # Dropped lines that read as code mean the run is only part of
+            # the student's code (the rest has a typo, say), which is unsure
+            dropped = "\n".join(lines[:start] + lines[end:])
+            return [] if _CODE_LINE.search(dropped) else [code]
+    return []
+
+def looks_like_code(message: str) -> bool:
+    """Whether a message without extractable code still has several lines
+    that read as Python, e.g. code with a typo or prose woven through it."""
+    return len(_CODE_LINE.findall(message)) >= 2
+
+def remember_code(previous: Sequence[str], blocks: Sequence[str], limit: int = ASSESSMENT_MAX_CODE_CHARS) -> List[str]:
+    """The session's code blocks with `blocks` appended, oldest dropped past `limit` characters."""
+    kept = list(previous) + list(blocks)
+    while len(kept) > 1 and sum(len(block) for block in kept) > limit:
+        kept.pop(0)
+    return kept
+
+def sandbox_command() -> List[str]:
+    """Command line that runs the checks script under ASSESSMENT_SANDBOX."""
+    if ASSESSMENT_SANDBOX == "bwrap":
+        binds = [arg for path in _SANDBOX_PATHS for arg in ("--ro-bind-try", path, path)]
+        return [
+            ASSESSMENT_SANDBOX_BIN, "--unshare-all", "--die-with-parent", "--new-session", "--clearenv",
+            "--uid", "65534", "--gid", "65534", "--cap-drop", "ALL", *binds,
+            "--ro-bind", _CHECKS_SCRIPT, _SANDBOX_SCRIPT,
+            "--proc", "/proc", "--dev", "/dev", "--tmpfs", "/tmp", "--chdir", "/tmp",
+            "--", sys.executable, "-I", _SANDBOX_SCRIPT,
+        ]
+    return [sys.executable, "-I", _CHECKS_SCRIPT]
+
+async def _read_result(fd: int) -> bytes:
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader()
+    transport, _ = await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), os.fdopen(fd, "rb", 0))
+    try:
+        data = b""
+        while chunk := await reader.read(65536):
+            data += chunk
+            if len(data) > _MAX_RESULT_BYTES:
+                raise RuntimeError("checks wrote an oversized result")
+        return data
+    finally:
+        transport.close()
+
+async def run_checks(blocks: Sequence[str], checks: Sequence[str], timeout: float = ASSESSMENT_TIMEOUT) -> Dict[str, dict]:
+    """Run `checks` against `blocks` in a sandboxed, resource-limited interpreter.
+
+    The result comes back on a pipe of its own, as one line tagged with a
+    nonce made for this run, so nothing the student's code prints counts.
+    The checks share the interpreter with the student's code, so a
+    determined submission can still fake its own verdict; the sandbox is
+    what keeps it away from the server.
+    """
+    nonce = secrets.token_hex(16)
+    read_fd, write_fd = os.pipe()
+    request = json.dumps({
+        "blocks": list(blocks), "checks": list(checks), "timeout": timeout, "memory_mb": ASSESSMENT_MEMORY_MB,
+        "result_fd": write_fd, "nonce": nonce,
+    })
+    async with _sandboxes:
+        with tempfile.TemporaryDirectory(prefix="assess-") as workdir:
+            try:
+                process = await asyncio.create_subprocess_exec(
+                    *sandbox_command(),
+                    stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.DEVNULL,
+                    cwd=workdir, env={}, pass_fds=(write_fd,),
+                )
+            except BaseException:
+                os.close(read_fd)
+                raise
+            finally:
+                os.close(write_fd)
+            try:
+                _, data = await asyncio.wait_for(
+                    asyncio.gather(process.communicate(request.encode("utf-8")), _read_result(read_fd)), timeout + 1
+                )
+            except BaseException:
+                if process.returncode is None:
+                    process.kill()
+                await process.wait()
+                raise
+    records = data.decode("utf-8", "replace").splitlines()
+    if len(records) != 1 or not records[0].startswith(nonce + " "):
+        raise RuntimeError(f"checks exited with status {process.returncode} and no valid result")
+    return json.loads(records[0][len(nonce) + 1:])
+
+async def assess_submission(message: str, previous_code: Sequence[str], milestone_id: Optional[str],
+                            checks: Sequence[str]) -> tuple[Assessment, List[str]]:
+    """Assess the code in `message` against a milestone's checks.
+
+    Returns the verdict and the session's code blocks to store: the new
+    blocks are run together with the code the student shared earlier, since
+    later milestones build on earlier functions.
+    """
+    blocks = extract_code(message)
+    if not blocks:
+        # Code detection can't be sure here, so the model judges the message
+        # instead of the turn being treated as conversation
+        unsure = looks_like_code(message)
+        assessment = Assessment(code_found=unsure, unseparated=unsure)
+        ASSESSMENTS.inc(outcome=assessment.outcome)
+        return assessment, list(previous_code)
+
+    for block in blocks:
+        try:
+            ast.parse(block)
+        except SyntaxError as e:
+            assessment = Assessment(code_found=True, syntax_error=f"{e.msg} on line {e.lineno}")
+            ASSESSMENTS.inc(outcome=assessment.outcome)
+            return assessment, list(previous_code)
+
+    code = remember_code(previous_code, blocks)
+    if not checks or not milestone_id or ASSESSMENT_SANDBOX == "off":
+        assessment = Assessment(code_found=True)
+    else:
+        started = time.perf_counter()
+        try:
+            assessment = Assessment(code_found=True, checks=await run_checks(code, checks))
+        except Exception as e:
+            logger.warning("Running checks for %s failed: %r", milestone_id, e)
+            assessment = Assessment(code_found=True, error=type(e).__name__)
+        ASSESSMENT_LATENCY.observe(time.perf_counter() - started)
+    ASSESSMENTS.inc(outcome=assessment.outcome)
+    return assessment, code
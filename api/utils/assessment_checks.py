@@ -0,0 +1,242 @@
+"""Milestone checks run against a student's code in a separate interpreter.
+
+This file is executed as a script by `assessment.py` in an isolated
+(``python -I``) subprocess, inside the ASSESSMENT_SANDBOX, with CPU, memory,
+file-size and process limits. It must only use the standard library. The
+request arrives as JSON on stdin:
+
+    {"blocks": ["<code>", ...], "checks": ["board_shape", ...], "timeout": 2.0,
+     "result_fd": 5, "nonce": "<hex>"}
+
+and one line, the nonce and a JSON object mapping each check to
+``{"passed": bool, "detail": str}``, is written to `result_fd`. Anything the
+student's code prints is captured and discarded.
+"""
+import ast
+import builtins
+import copy
+import io
+import json
+import os
+import resource
+import signal
+import sys
+from contextlib import redirect_stderr, redirect_stdout
+
+# Moves fed to input(): X takes 1, 3, 5, 7 and wins on the anti-diagonal
+SCRIPTED_MOVES = ["1", "2", "3", "4", "5", "6", "7", "8", "9"]
+LABELLED_BOARD = [[1, 2, 3], [4, 5, 6], [7, 8, 9]]
+
+WIN_BOARDS = [
+    [["X", "X", "X"], [4, 5, 6], [7, 8, 9]],
+    [[1, 2, 3], ["X", "X", "X"], [7, 8, 9]],
+    [["X", 2, 3], ["X", 5, 6], ["X", 8, 9]],
+    [[1, 2, "X"], [4, 5, "X"], [7, 8, "X"]],
+    [["X", 2, 3], [4, "X", 6], [7, 8, "X"]],
+    [[1, 2, "X"], [4, "X", 6], ["X", 8, 9]],
+]
+NO_WIN_BOARDS = [
+    LABELLED_BOARD,
+    [["X", "O", "X"], [4, "O", 6], [7, 8, 9]],
+    [["X", "O", "X"], ["X", "O", "O"], ["O", "X", "X"]],
+]
+
+class CheckTimeout(Exception):
+    pass
+
+class OutOfInput(Exception):
+    """The code asked for more input than the scripted moves provide."""
+
+def scripted_input(moves):
+    remaining = list(moves)
+
+    def fake_input(prompt=""):
+        if not remaining:
+            raise OutOfInput()
+        return remaining.pop(0)
+
+    return fake_input
+
+def run_quietly(fn, *args, seconds=1.0, moves=SCRIPTED_MOVES):
+    """Call fn with stdout captured, scripted input and a wall-clock limit."""
+    def on_alarm(signum, frame):
+        raise CheckTimeout()
+
+    output = io.StringIO()
+    builtins.input = scripted_input(moves)
+    signal.signal(signal.SIGALRM, on_alarm)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        with redirect_stdout(output), redirect_stderr(io.StringIO()):
+            result = fn(*args)
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+    return result, output.getvalue()
+
+def is_board(value):
+    return (isinstance(value, list) and len(value) == 3
+            and all(isinstance(row, list) and len(row) == 3 for row in value))
+
+def functions(namespace, *fragments):
+    return [
+        value for name, value in namespace.items()
+        if callable(value) and getattr(value, "__module__", None) == "submission"
+        and any(fragment in name.lower() for fragment in fragments)
+    ]
+
+def call_flexibly(fn, board, seconds):
+    """Call fn with the board and, for two-argument signatures, the player."""
+    try:
+        return run_quietly(fn, board, seconds=seconds)
+    except TypeError:
+        return run_quietly(fn, board, "X", seconds=seconds)
+
+def find_board(namespace, seconds):
+    for value in namespace.values():
+        if is_board(value):
+            return value
+    for fn in functions(namespace, "board"):
+        try:
+            board, _ = run_quietly(fn, seconds=seconds)
+        except Exception:
+            continue
+        if is_board(board):
+            return board
+    return None
+
+def check_board_shape(namespace, tree, seconds):
+    board = find_board(namespace, seconds)
+    if board is None:
+        return False, "no 3x3 list-of-lists board (as a variable or returned by a *board* function) was found"
+    return True, "found a 3x3 board"
+
+def check_board_display(namespace, tree, seconds):
+    board = find_board(namespace, seconds) or copy.deepcopy(LABELLED_BOARD)
+    candidates = functions(namespace, "display", "print", "show", "draw")
+    if not candidates:
+        return False, "no display/print/show/draw function was found"
+    for fn in candidates:
+        try:
+            _, output = run_quietly(fn, copy.deepcopy(board), seconds=seconds)
+        except Exception as e:
+            detail = f"{fn.__name__} raised {type(e).__name__}: {e}"
+            continue
+        if len([line for line in output.splitlines() if line.strip()]) >= 3:
+            return True, f"{fn.__name__} prints the board over {len(output.splitlines())} lines"
+        detail = f"{fn.__name__} printed fewer than 3 lines"
+    return False, detail
+
+def check_player_move(namespace, tree, seconds):
+    candidates = functions(namespace, "move", "place", "update", "play", "turn")
+    if not candidates:
+        return False, "no move/place/update function was found"
+    detail = ""
+    for fn in candidates:
+        for args in (("X", 5), (5, "X"), ("X",), ()):
+            board = copy.deepcopy(LABELLED_BOARD)
+            try:
+                result, _ = run_quietly(fn, board, *args, seconds=seconds, moves=["5"])
+            except (TypeError, OutOfInput):
+                continue
+            except Exception as e:
+                detail = f"{fn.__name__} raised {type(e).__name__}: {e}"
+                continue
+            updated = result if is_board(result) else board
+            if updated != LABELLED_BOARD:
+                return True, f"{fn.__name__} places a mark on the board"
+        detail = detail or f"{fn.__name__} did not change the board when playing cell 5"
+    return False, detail
+
+def check_win_detection(namespace, tree, seconds):
+    candidates = functions(namespace, "win", "victory")
+    if not candidates:
+        return False, "no win-checking function was found"
+    detail = ""
+    for fn in candidates:
+        try:
+            missed = [b for b in WIN_BOARDS if not call_flexibly(fn, copy.deepcopy(b), seconds)[0]]
+            false_wins = [b for b in NO_WIN_BOARDS if call_flexibly(fn, copy.deepcopy(b), seconds)[0]]
+        except Exception as e:
+            detail = f"{fn.__name__} raised {type(e).__name__}: {e}"
+            continue
+        if not missed and not false_wins:
+            return True, f"{fn.__name__} detects every row, column and diagonal win"
+        detail = f"{fn.__name__} missed {len(missed)} of {len(WIN_BOARDS)} winning boards and reported {len(false_wins)} false wins"
+    return False, detail
+
+def check_game_loop(namespace, tree, seconds):
+    if not any(isinstance(node, (ast.While, ast.For)) for node in ast.walk(tree)):
+        return False, "no game loop was found"
+    source = namespace["__source__"]
+    program = {"__name__": "__main__", "__builtins__": builtins}
+    try:
+        run_quietly(exec, compile(source, "<submission>", "exec"), program, seconds=seconds * 2)
+    except SystemExit:
+        pass
+    except OutOfInput:
+        return False, "the game kept asking for moves after X won with cells 1, 3, 5 and 7"
+    except CheckTimeout:
+        return False, "the game loop did not finish"
+    except Exception as e:
+        return False, f"the game raised {type(e).__name__}: {e}"
+    return True, "the game ends once a player wins"
+
+CHECKS = {
+    "board_shape": check_board_shape,
+    "board_display": check_board_display,
+    "player_move": check_player_move,
+    "win_detection": check_win_detection,
+    "game_loop": check_game_loop,
+}
+
+def load(blocks, seconds):
+    """Execute each block in one namespace, tolerating blocks that fail at
+    top level so earlier definitions survive a broken or interactive block."""
+    namespace = {"__name__": "submission", "__builtins__": builtins}
+    for block in blocks:
+        try:
+            run_quietly(exec, compile(block, "<submission>", "exec"), namespace, seconds=seconds)
+        except BaseException:
+            continue
+    return namespace
+
+def limit_resources(timeout, memory_mb):
+    resource.setrlimit(resource.RLIMIT_CPU, (int(timeout) + 1, int(timeout) + 1))
+    resource.setrlimit(resource.RLIMIT_AS, (memory_mb * 2**20, memory_mb * 2**20))
+    resource.setrlimit(resource.RLIMIT_FSIZE, (0, 0))
+    # No new processes or threads, so nothing outlives the run or holds the result pipe open
+    resource.setrlimit(resource.RLIMIT_NPROC, (0, 0))
+
+def main():
+    request = json.load(sys.stdin)
+    sys.stdin = io.StringIO("")
+    result = os.fdopen(request.pop("result_fd"), "w", encoding="utf-8")
+    nonce = request.pop("nonce")
+    limit_resources(request["timeout"], request.get("memory_mb", 256))
+
+    blocks = request["blocks"]
+    seconds = max(0.1, request["timeout"] / (len(request["checks"]) + 2))
+    source = "\n\n".join(blocks)
+    namespace = load(blocks, seconds)
+    namespace["__source__"] = source
+    tree = ast.parse(source)
+
+    results = {}
+    for name in request["checks"]:
+        check = CHECKS.get(name)
+        if check is None:
+            results[name] = {"passed": False, "detail": f"unknown check {name}"}
+            continue
+        try:
+            passed, detail = check(namespace, tree, seconds)
+        except CheckTimeout:
+            passed, detail = False, "timed out"
+        except BaseException as e:
+            passed, detail = False, f"{type(e).__name__}: {e}"
+        results[name] = {"passed": passed, "detail": detail}
+
+    result.write(f"{nonce} {json.dumps(results)}\n")
+    result.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,469 @@
+import asyncio
+import atexit
+import sqlite3
+import threading
+import time
+from collections.abc import AsyncIterator, Iterator, Sequence
+from typing import Any, Dict, Optional, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+
+from ..settings import (
+    CHECKPOINT_BATCH_SIZE, CHECKPOINT_DB_PATH, CHECKPOINT_FLUSH_INTERVAL, CHECKPOINT_KEEP, CHECKPOINT_RETENTION_SECONDS,
+    CHECKPOINT_SWEEP_INTERVAL,
+)
+from .log import get_logger
+from .state import thread_config  # re-exported: defined there so callers needn't import LangGraph
+
+logger = get_logger("checkpoint")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoints (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    parent_checkpoint_id TEXT,
+    type TEXT,
+    checkpoint BLOB,
+    metadata_type TEXT,
+    metadata BLOB,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+);
+CREATE TABLE IF NOT EXISTS writes (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    task_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    channel TEXT NOT NULL,
+    type TEXT,
+    value BLOB,
+    task_path TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+);
+CREATE TABLE IF NOT EXISTS threads (
+    thread_id TEXT PRIMARY KEY,
+    updated_at REAL NOT NULL
+);
+"""
+
+CheckpointKey = Tuple[str, str, str]  # thread id, checkpoint ns, checkpoint id
+WriteKey = Tuple[str, str, str, str, int]  # checkpoint key + task id, write idx
+
+def _connect(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=5.0)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA busy_timeout=5000")
+    return conn
+
+class SQLiteCheckpointer(BaseCheckpointSaver[int]):
+    """LangGraph checkpointer backed by a local SQLite database in WAL mode.
+
+    WAL lets several worker processes read the same file while one of them
+    writes, so any worker can pick up a session by its thread id. Writes are
+    buffered in memory and committed by a background thread in batches;
+    reads consult that buffer first, so a process always sees its own writes.
+    A crash can lose at most the last flush interval of checkpoints.
+
+    Every `sweep_interval` seconds the flusher also deletes threads nobody
+    has written to for `ttl_seconds` (wall clock, since workers share the
+    file), so the database only holds live sessions.
+    """
+
+    def __init__(
+        self,
+        path: str = CHECKPOINT_DB_PATH,
+        *,
+        flush_interval: float = CHECKPOINT_FLUSH_INTERVAL,
+        batch_size: int = CHECKPOINT_BATCH_SIZE,
+        keep: int = CHECKPOINT_KEEP,
+        ttl_seconds: float = CHECKPOINT_RETENTION_SECONDS,
+        sweep_interval: float = CHECKPOINT_SWEEP_INTERVAL,
+        serde=None,
+    ):
+        super().__init__(serde=serde)
+        self.path = path
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.keep = keep
+        self.ttl_seconds = ttl_seconds
+        self.sweep_interval = sweep_interval
+
+        self._conn = _connect(path)
+        self._conn.executescript(_SCHEMA)
+        # Threads written before the threads table existed start their TTL now
+        self._conn.execute(
+            "INSERT OR IGNORE INTO threads SELECT DISTINCT thread_id, ? FROM checkpoints", (time.time(),)
+        )
+        self._last_sweep = time.monotonic()
+        self._db_lock = threading.Lock()
+
+        # Rows waiting to be committed, keyed like their primary keys
+        self._lock = threading.Lock()
+        self._pending_checkpoints: Dict[CheckpointKey, tuple] = {}
+        self._pending_writes: Dict[WriteKey, tuple] = {}
+        self._wakeup = threading.Event()
+        self._closed = False
+        self._flusher = threading.Thread(target=self._flush_loop, name="checkpoint-flusher", daemon=True)
+        self._flusher.start()
+        atexit.register(self.close)
+
+    # -- reads ---------------------------------------------------------------
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = get_checkpoint_id(config)
+
+        with self._lock:
+            pending_ids = [
+                key[2] for key in self._pending_checkpoints
+                if key[0] == thread_id and key[1] == checkpoint_ns
+            ]
+            if checkpoint_id:
+                row = self._pending_checkpoints.get((thread_id, checkpoint_ns, checkpoint_id))
+            elif pending_ids:
+                checkpoint_id = max(pending_ids)
+                row = self._pending_checkpoints[(thread_id, checkpoint_ns, checkpoint_id)]
+            else:
+                row = None
+
+        if row is None:
+            query = (
+                "SELECT checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata_type, metadata "
+                "FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ?"
+            )
+            params: tuple = (thread_id, checkpoint_ns)
+            if checkpoint_id:
+                query += " AND checkpoint_id = ?"
+                params += (checkpoint_id,)
+            else:
+                query += " ORDER BY checkpoint_id DESC LIMIT 1"
+            with self._db_lock:
+                found = self._conn.execute(query, params).fetchone()
+            if found is None:
+                return None
+            checkpoint_id, *row = found
+            row = tuple(row)
+
+        return self._to_tuple((thread_id, checkpoint_ns, checkpoint_id), row)
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        # History listing is rare (debugging, state history), so commit first
+        # and read everything from the database
+        self.flush()
+        query = (
+            "SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint, "
+            "metadata_type, metadata FROM checkpoints"
+        )
+        clauses, params = [], []
+        if config:
+            clauses.append("thread_id = ?")
+            params.append(config["configurable"]["thread_id"])
+            if (checkpoint_ns := config["configurable"].get("checkpoint_ns")) is not None:
+                clauses.append("checkpoint_ns = ?")
+                params.append(checkpoint_ns)
+            if checkpoint_id := get_checkpoint_id(config):
+                clauses.append("checkpoint_id = ?")
+                params.append(checkpoint_id)
+        if before and (before_id := get_checkpoint_id(before)):
+            clauses.append("checkpoint_id < ?")
+            params.append(before_id)
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += " ORDER BY checkpoint_id DESC"
+
+        with self._db_lock:
+            rows = self._conn.execute(query, params).fetchall()
+
+        for thread_id, checkpoint_ns, checkpoint_id, *row in rows:
+            result = self._to_tuple((thread_id, checkpoint_ns, checkpoint_id), tuple(row))
+            if filter and not all(result.metadata.get(k) == v for k, v in filter.items()):
+                continue
+            if limit is not None:
+                if limit <= 0:
+                    break
+                limit -= 1
+            yield result
+
+    def _to_tuple(self, key: CheckpointKey, row: tuple) -> CheckpointTuple:
+        thread_id, checkpoint_ns, checkpoint_id = key
+        parent_checkpoint_id, type_, checkpoint, metadata_type, metadata = row
+        return CheckpointTuple(
+            config={"configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint_id,
+            }},
+            checkpoint=self.serde.loads_typed((type_, checkpoint)),
+            metadata=self.serde.loads_typed((metadata_type, metadata)),
+            parent_config=(
+                {"configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_ns": checkpoint_ns,
+                    "checkpoint_id": parent_checkpoint_id,
+                }}
+                if parent_checkpoint_id else None
+            ),
+            pending_writes=self._load_writes(key),
+        )
+
+    def _load_writes(self, key: CheckpointKey) -> list:
+        with self._db_lock:
+            rows = self._conn.execute(
+                "SELECT task_id, idx, channel, type, value, task_path FROM writes "
+                "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                key,
+            ).fetchall()
+        writes = {(task_id, idx): (channel, type_, value) for task_id, idx, channel, type_, value, _ in rows}
+        with self._lock:
+            for write_key, (channel, type_, value, _, _) in self._pending_writes.items():
+                if write_key[:3] == key:
+                    writes[write_key[3:]] = (channel, type_, value)
+        return [
+            (task_id, channel, self.serde.loads_typed((type_, value)))
+            for (task_id, _), (channel, type_, value) in sorted(writes.items())
+        ]
+
+    # -- writes --------------------------------------------------------------
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        type_, serialized = self.serde.dumps_typed(checkpoint)
+        metadata_type, serialized_metadata = self.serde.dumps_typed(get_checkpoint_metadata(config, metadata))
+        row = (config["configurable"].get("checkpoint_id"), type_, serialized, metadata_type, serialized_metadata)
+        with self._lock:
+            self._pending_checkpoints[(thread_id, checkpoint_ns, checkpoint["id"])] = row
+        self._maybe_wake()
+        return {"configurable": {
+            "thread_id": thread_id,
+            "checkpoint_ns": checkpoint_ns,
+            "checkpoint_id": checkpoint["id"],
+        }}
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        key = (
+            config["configurable"]["thread_id"],
+            config["configurable"].get("checkpoint_ns", ""),
+            config["configurable"]["checkpoint_id"],
+        )
+        with self._lock:
+            for idx, (channel, value) in enumerate(writes):
+                write_idx = WRITES_IDX_MAP.get(channel, idx)
+                write_key = (*key, task_id, write_idx)
+                # Regular writes are idempotent per task; special writes (errors, interrupts) replace
+                replace = write_idx < 0
+                if not replace and write_key in self._pending_writes:
+                    continue
+                type_, serialized = self.serde.dumps_typed(value)
+                self._pending_writes[write_key] = (channel, type_, serialized, task_path, replace)
+        self._maybe_wake()
+
+    def delete_thread(self, thread_id: str) -> None:
+        self.flush()
+        with self._db_lock:
+            self._conn.execute("BEGIN")
+            self._conn.execute("DELETE FROM checkpoints WHERE thread_id = ?", (thread_id,))
+            self._conn.execute("DELETE FROM writes WHERE thread_id = ?", (thread_id,))
+            self._conn.execute("DELETE FROM threads WHERE thread_id = ?", (thread_id,))
+            self._conn.execute("COMMIT")
+
+    def delete_idle_threads(self, max_idle: float) -> int:
+        """Delete every thread last written more than `max_idle` seconds ago;
+        returns how many were deleted. Threads with rows still buffered in
+        this process are live and kept."""
+        with self._lock:
+            pending = {key[0] for key in self._pending_checkpoints} | {key[0] for key in self._pending_writes}
+        with self._db_lock:
+            idle = [
+                thread_id for (thread_id,) in self._conn.execute(
+                    "SELECT thread_id FROM threads WHERE updated_at < ?", (time.time() - max_idle,)
+                ).fetchall()
+                if thread_id not in pending
+            ]
+            if not idle:
+                return 0
+            params = [(thread_id,) for thread_id in idle]
+            self._conn.execute("BEGIN")
+            try:
+                for table in ("checkpoints", "writes", "threads"):
+                    self._conn.executemany(f"DELETE FROM {table} WHERE thread_id = ?", params)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        logger.info("Deleted %d idle checkpoint threads", len(idle))
+        return len(idle)
+
+    # -- async API -----------------------------------------------------------
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.get_running_loop().run_in_executor(None, self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        items = await asyncio.get_running_loop().run_in_executor(
+            None, lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+        for item in items:
+            yield item
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        # Only buffers in memory; the commit happens on the flusher thread
+        return self.put(config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        return self.put_writes(config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.get_running_loop().run_in_executor(None, self.delete_thread, thread_id)
+
+    # -- batching ------------------------------------------------------------
+
+    def _maybe_wake(self) -> None:
+        if len(self._pending_checkpoints) + len(self._pending_writes) >= self.batch_size:
+            self._wakeup.set()
+
+    def _flush_loop(self) -> None:
+        while not self._closed:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except sqlite3.Error:
+                logger.exception("Batch commit failed, will retry")
+            if self.ttl_seconds > 0 and time.monotonic() - self._last_sweep >= self.sweep_interval:
+                self._last_sweep = time.monotonic()
+                try:
+                    self.delete_idle_threads(self.ttl_seconds)
+                except sqlite3.Error:
+                    logger.exception("Idle thread sweep failed, will retry")
+
+    def flush(self) -> int:
+        """Commit every buffered row in one transaction; returns the row count."""
+        with self._lock:
+            checkpoints = list(self._pending_checkpoints.items())
+            writes = list(self._pending_writes.items())
+        if not checkpoints and not writes:
+            return 0
+
+        with self._db_lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    [(*key, *row) for key, row in checkpoints],
+                )
+                for replace in (False, True):
+                    verb = "INSERT OR REPLACE" if replace else "INSERT OR IGNORE"
+                    self._conn.executemany(
+                        f"{verb} INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        [(*key, *row[:4]) for key, row in writes if row[4] == replace],
+                    )
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO threads VALUES (?, ?)",
+                    [(thread_id, time.time()) for thread_id in {key[0] for key, _ in checkpoints}],
+                )
+                self._prune({key[:2] for key, _ in checkpoints})
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+        # Drop only what was committed; rows replaced meanwhile stay pending
+        with self._lock:
+            for key, row in checkpoints:
+                if self._pending_checkpoints.get(key) is row:
+                    del self._pending_checkpoints[key]
+            for key, row in writes:
+                if self._pending_writes.get(key) is row:
+                    del self._pending_writes[key]
+        return len(checkpoints) + len(writes)
+
+    def _prune(self, threads: set) -> None:
+        """Keep only the newest `keep` checkpoints (and their writes) per thread."""
+        if self.keep <= 0:
+            return
+        for thread_id, checkpoint_ns in threads:
+            stale = self._conn.execute(
+                "SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+                "ORDER BY checkpoint_id DESC LIMIT -1 OFFSET ?",
+                (thread_id, checkpoint_ns, self.keep),
+            ).fetchall()
+            if not stale:
+                continue
+            params = [(thread_id, checkpoint_ns, checkpoint_id) for (checkpoint_id,) in stale]
+            self._conn.executemany(
+                "DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?", params
+            )
+            self._conn.executemany(
+                "DELETE FROM writes WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?", params
+            )
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        self._wakeup.set()
+        self._flusher.join(timeout=5)
+        self.flush()
+        with self._db_lock:
+            self._conn.close()
+
+_checkpointer: Optional[SQLiteCheckpointer] = None
+
+def get_checkpointer() -> Optional[SQLiteCheckpointer]:
+    """Process-wide checkpointer, or None when persistence is disabled."""
+    global _checkpointer
+    if _checkpointer is None and CHECKPOINT_DB_PATH:
+        _checkpointer = SQLiteCheckpointer(CHECKPOINT_DB_PATH)
+    return _checkpointer
@@ -1,44 +1,141 @@
-from pydantic import BaseModel
+import json
+import os
+from types import MappingProxyType
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+
+from pydantic import BaseModel, ConfigDict
+
+from ..settings import CURRICULUM_DIR, DEFAULT_CURRICULUM_ID
+from .log import get_logger
+
+try:
+    import yaml
+except ImportError:  # YAML curricula are optional; JSON always works
+    yaml = None
+
+logger = get_logger("curriculum")
 
 class MilestoneConfig(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     id: str
     name: str
     description: str
-    prerequisites: list[str]
+    prerequisites: Tuple[str, ...] = ()
+    checks: Tuple[str, ...] = ()  # Names from assessment_checks.CHECKS run on submitted code
 
 class CurriculumConfig(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
+    id: str
     name: str
+    project: str  # What the student builds, e.g. "tic-tac-toe game"
     description: str
-    milestones: list[MilestoneConfig]
-
-def create_tictactoe_curriculum() -> CurriculumConfig:
-    return CurriculumConfig( 
-        name = "Tic-Tac-Toe Game Lesson Plan",
-        description = "Build a complete tic-tac-toe game with board representation, game logic, and win conditions in a terminal game",
-        milestones = [
-            {
-                "id": "m1",
-                "name": "Board Implementation",
-                "description": "Code the game board representation, board initialization with integers labelling the cells, board update, and display functions. Prefer to use a 2D array to represent the board. Display it in a 3x3 grid in terminal console.",
-                "prerequisites": [],
-            },
-            {
-                "id": "m2",
-                "name": "Player Input",
-                "description": "Implement functions to handle player moves. The player should be able to make a move by entering the number of the cell they want to play in.",
-                "prerequisites": ["m1"],
-            },
-            {
-                "id": "m3",
-                "name": "Win Condition Implementation",
-                "description": "Code the win condition checks. The game should check if the player has won by getting three in a row, column, or diagonal.",
-                "prerequisites": ["m1", "m2"],
-            },
-            {
-                "id": "m4",
-                "name": "Game Loop",
-                "description": "Implement the main game loop. The game should alternate between the two players, and the game should continue until there is a winner or the board is full.",
-                "prerequisites": ["m1", "m2", "m3"],
-            },
-        ],
-    )
\ No newline at end of file
+    milestones: Tuple[MilestoneConfig, ...]
+    next_steps: Tuple[str, ...] = ()  # Suggested extensions once every milestone is done
+
+class Curriculum:
+    """A validated curriculum with its per-turn lookups precomputed.
+
+    Built once at startup and shared by every session on the course, so the
+    milestone guards never rebuild id lists or call `list.index()` per turn.
+    """
+
+    __slots__ = ("config", "milestone_ids", "positions", "prerequisites", "checks", "prompt", "milestone_rules", "celebration")
+
+    def __init__(self, config: CurriculumConfig):
+        self.config = config
+        self.milestone_ids: Tuple[str, ...] = tuple(m.id for m in config.milestones)
+        self.positions: Mapping[str, int] = MappingProxyType({mid: i for i, mid in enumerate(self.milestone_ids)})
+        self.prerequisites: Mapping[str, frozenset] = MappingProxyType(
+            {m.id: frozenset(m.prerequisites) for m in config.milestones}
+        )
+        self.checks: Mapping[str, Tuple[str, ...]] = MappingProxyType({m.id: m.checks for m in config.milestones})
+        self._validate()
+
+        self.prompt = json.dumps(
+            config.model_dump(exclude={"id": True, "project": True, "next_steps": True, "milestones": {"__all__": {"checks"}}}),
+            indent=2,
+        )
+        self.milestone_rules = "\n".join(
+            f'- If the student completed milestone {mid}, use: "milestone_completed": "{mid}"'
+            for mid in self.milestone_ids
+        )
+        self.celebration = self._render_celebration()
+
+    @property
+    def id(self) -> str:
+        return self.config.id
+
+    def first_open(self, completed: Iterable[str]) -> Optional[str]:
+        """First milestone in curriculum order that isn't in `completed`, or None once all are."""
+        done = set(completed)
+        return next((mid for mid in self.milestone_ids if mid not in done), None)
+
+    def sort_milestones(self, milestone_ids: Iterable[str]) -> List[str]:
+        """Order milestone ids by their position in the curriculum, dropping unknown ids."""
+        return sorted((mid for mid in milestone_ids if mid in self.positions), key=self.positions.__getitem__)
+
+    def _validate(self) -> None:
+        if len(self.positions) != len(self.milestone_ids):
+            raise ValueError(f"Curriculum {self.id!r} has duplicate milestone ids")
+        for milestone_id, prerequisites in self.prerequisites.items():
+            for prerequisite in prerequisites:
+                if prerequisite not in self.positions:
+                    raise ValueError(f"Curriculum {self.id!r}: {milestone_id} requires unknown milestone {prerequisite}")
+                # Milestones are worked through in order, so listing order must
+                # be a topological order of the prerequisite DAG (no cycles)
+                if self.positions[prerequisite] >= self.positions[milestone_id]:
+                    raise ValueError(f"Curriculum {self.id!r}: {milestone_id} requires later milestone {prerequisite}")
+
+    def _render_celebration(self) -> str:
+        built = "\n".join(f"✅ {m.name}" for m in self.config.milestones)
+        message = (
+            "🎉🎉🎉 CONGRATULATIONS! 🎉🎉🎉\n\n"
+            f"You have successfully completed ALL milestones for your {self.config.project}! You've built:\n\n{built}\n\n"
+            f"Your {self.config.project} is now complete and fully functional! You should be proud of your accomplishment. "
+            "You've demonstrated strong programming skills and problem-solving abilities throughout this project.\n\n"
+        )
+        if self.config.next_steps:
+            ideas = "\n".join(f"- {idea}" for idea in self.config.next_steps)
+            message += f"Feel free to enhance your project further by adding features like:\n{ideas}\n\n"
+        return message + "Great job! 🎉"
+
+class CurriculumRegistry:
+    """Curricula available to this deployment, keyed by curriculum id."""
+
+    def __init__(self, default_id: str = DEFAULT_CURRICULUM_ID):
+        self.default_id = default_id
+        self._curricula: Dict[str, Curriculum] = {}
+
+    def register(self, config: CurriculumConfig) -> Curriculum:
+        curriculum = Curriculum(config)
+        self._curricula[curriculum.id] = curriculum
+        return curriculum
+
+    def load_directory(self, path: str) -> None:
+        """Load every .json (and, with PyYAML installed, .yaml/.yml) file in `path`."""
+        for filename in sorted(os.listdir(path)):
+            stem, ext = os.path.splitext(filename)
+            if ext not in (".json", ".yaml", ".yml"):
+                continue
+            if ext != ".json" and yaml is None:
+                logger.warning("Skipping %s: PyYAML is not installed", filename)
+                continue
+            with open(os.path.join(path, filename), encoding="utf-8") as f:
+                data = json.load(f) if ext == ".json" else yaml.safe_load(f)
+            data.setdefault("id", stem)
+            self.register(CurriculumConfig.model_validate(data))
+
+    def get(self, curriculum_id: Optional[str] = None) -> Curriculum:
+        """Look up a curriculum, defaulting to the deployment's default course."""
+        return self._curricula[curriculum_id or self.default_id]
+
+    def __contains__(self, curriculum_id: str) -> bool:
+        return curriculum_id in self._curricula
+
+    def __iter__(self):
+        return iter(self._curricula.values())
+
+curriculum_registry = CurriculumRegistry()
+curriculum_registry.load_directory(CURRICULUM_DIR)
@@ -0,0 +1,241 @@
+import asyncio
+import itertools
+import json
+import re
+import time
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Set, Tuple
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import PrivateAttr
+
+from .output_parser import TutoringResponse
+from .streaming import message_text
+
+_CURRENT_MILESTONE = re.compile(r"CURRENTLY WORKING ON: (\w+)")
+_CODE_BLOCK = re.compile(r"```.*?```", re.S)
+# Markers in the assessment prompt (see prompt.ASSESSMENT_PROMPT)
+_ASSESSED_MILESTONE = re.compile(r"Milestone being assessed: (\w+)")
+_CODE_HEADER = "Student's code:"
+_CODE_HINTS = ("```", "def ", "print(", "for ", "while ", " = ")
+
+# Replies the scripted mode picks from, so runs are deterministic
+_QUESTIONS = (
+    "Good thinking! What data structure could represent the state you need for {milestone}?",
+    "Before you write code, how would you break {milestone} into smaller steps?",
+    "What do you expect to happen if you run that? Try predicting it first.",
+)
+
+def _approx_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+class FakeTutorModel(BaseChatModel):
+    """Offline stand-in for the tutoring model.
+
+    Produces TutoringResponse JSON without network access. Given a `script`
+    (a JSONL file of responses) it replays those in order and loops;
+    otherwise it reads the current milestone from the prompt and marks it
+    complete whenever the student's message contains code. Output is
+    streamed in ~4-character tokens after `latency` seconds (plus
+    `prefill_delay` per thousand uncached prompt tokens), `token_delay`
+    apart, with usage metadata shaped like Anthropic's.
+
+    With `cache_min_tokens` set, the prompt cache is simulated too: the
+    prompt up to its last `cache_control` breakpoint is written to the cache
+    the first time it is seen and read from it afterwards, provided it is at
+    least that many tokens long. Entries never expire.
+    """
+
+    latency: float = 0.3
+    token_delay: float = 0.01
+    prefill_delay: float = 0.0
+    script: Optional[str] = None
+    cache_min_tokens: int = 0
+    _replay: Optional[Iterator[Dict[str, Any]]] = PrivateAttr(default=None)
+    _turn: int = PrivateAttr(default=0)
+    _cached_prefixes: Set[str] = PrivateAttr(default_factory=set)
+
+    def model_post_init(self, __context: Any) -> None:
+        if self.script:
+            with open(self.script, encoding="utf-8") as f:
+                responses = [TutoringResponse.model_validate_json(line).model_dump() for line in f if line.strip()]
+            if not responses:
+                raise ValueError(f"Fake LLM script {self.script!r} has no responses")
+            self._replay = itertools.cycle(responses)
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-tutor"
+
+    def _respond(self, messages: List[BaseMessage]) -> Dict[str, Any]:
+        if self._replay:
+            return next(self._replay)
+
+        prompt = "\n".join(message_text(m) for m in messages[:-1])
+        student = message_text(messages[-1]) if messages else ""
+        match = _CURRENT_MILESTONE.search(prompt)
+        milestone = match.group(1) if match else "none"
+        self._turn += 1
+
+        if milestone != "none" and any(hint in student for hint in _CODE_HINTS):
+            return {
+                "message": f"That works! Your code covers everything {milestone} asks for.\nWhat do you think comes next?",
+                "milestone_completed": milestone,
+                "feedback": f"Working implementation of {milestone}",
+            }
+        return {
+            "message": _QUESTIONS[self._turn % len(_QUESTIONS)].format(milestone=milestone),
+            "milestone_completed": "none",
+            "feedback": f"Still working on {milestone}",
+        }
+
+    def clear_prompt_cache(self) -> None:
+        self._cached_prefixes.clear()
+
+    def _cache_usage(self, messages: List[BaseMessage]) -> Tuple[int, int]:
+        """Tokens (read from, written to) the simulated prompt cache."""
+        parts, tokens, cached = [], 0, None
+        for message in messages:
+            blocks = message.content if isinstance(message.content, list) else [message.content]
+            for block in blocks:
+                text = block.get("text", "") if isinstance(block, dict) else str(block)
+                parts.append(text)
+                tokens += _approx_tokens(text)
+                if isinstance(block, dict) and block.get("cache_control"):
+                    cached = ("\0".join(parts), tokens)
+        if not self.cache_min_tokens or cached is None or cached[1] < self.cache_min_tokens:
+            return 0, 0
+        prefix, tokens = cached
+        if prefix in self._cached_prefixes:
+            return tokens, 0
+        self._cached_prefixes.add(prefix)
+        return 0, tokens
+
+    def _reply(self, messages: List[BaseMessage]) -> tuple[List[str], Dict[str, Any]]:
+        text = json.dumps(self._respond(messages))
+        tokens = [text[i:i + 4] for i in range(0, len(text), 4)]
+        prompt_tokens = sum(_approx_tokens(message_text(m)) for m in messages)
+        cache_read, cache_creation = (min(n, prompt_tokens) for n in self._cache_usage(messages))
+        usage = {
+            "input_tokens": prompt_tokens,
+            "output_tokens": len(tokens),
+            "total_tokens": prompt_tokens + len(tokens),
+            "input_token_details": {"cache_read": cache_read, "cache_creation": cache_creation},
+        }
+        return tokens, usage
+
+    def _first_token_delay(self, usage: Dict[str, Any]) -> float:
+        uncached = usage["input_tokens"] - usage["input_token_details"]["cache_read"]
+        return self.latency + self.prefill_delay * uncached / 1000
+
+    def _generate(self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs: Any) -> ChatResult:
+        tokens, usage = self._reply(messages)
+        time.sleep(self._first_token_delay(usage) + self.token_delay * len(tokens))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="".join(tokens), usage_metadata=usage))])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs: Any) -> ChatResult:
+        tokens, usage = self._reply(messages)
+        await asyncio.sleep(self._first_token_delay(usage) + self.token_delay * len(tokens))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="".join(tokens), usage_metadata=usage))])
+
+    def _stream(self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        tokens, usage = self._reply(messages)
+        time.sleep(self._first_token_delay(usage))
+        for i, token in enumerate(tokens):
+            if i:
+                time.sleep(self.token_delay)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+        yield ChatGenerationChunk(message=AIMessageChunk(content="", usage_metadata=usage))
+
+    async def _astream(self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        tokens, usage = self._reply(messages)
+        await asyncio.sleep(self._first_token_delay(usage))
+        for i, token in enumerate(tokens):
+            if i:
+                await asyncio.sleep(self.token_delay)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                await run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+        # Anthropic reports usage at the end of the stream
+        yield ChatGenerationChunk(message=AIMessageChunk(content="", usage_metadata=usage))
+
+class FakeAssessmentModel(BaseChatModel):
+    """Offline stand-in for the milestone assessment model.
+
+    Marks the assessed milestone complete whenever the prompt carries
+    student code, like FakeTutorModel, and replies with the short verdict
+    JSON after `latency` seconds plus `prefill_delay` per thousand prompt
+    tokens.
+    """
+
+    latency: float = 0.3
+    prefill_delay: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-assessment"
+
+    def _assess(self, messages: List[BaseMessage]) -> AIMessage:
+        prompt = "\n".join(message_text(m) for m in messages)
+        match = _ASSESSED_MILESTONE.search(prompt)
+        milestone = match.group(1) if match else "none"
+        code = prompt.split(_CODE_HEADER, 1)[1] if _CODE_HEADER in prompt else ""
+        passed = milestone != "none" and any(hint in code for hint in _CODE_HINTS)
+        text = json.dumps({
+            "milestone_completed": milestone if passed else "none",
+            "feedback": f"Working implementation of {milestone}" if passed else f"{milestone} is not done yet",
+        })
+        return AIMessage(content=text, usage_metadata={
+            "input_tokens": _approx_tokens(prompt), "output_tokens": _approx_tokens(text),
+            "total_tokens": _approx_tokens(prompt) + _approx_tokens(text),
+        })
+
+    def _delay(self, reply: AIMessage) -> float:
+        return self.latency + self.prefill_delay * reply.usage_metadata["input_tokens"] / 1000
+
+    def _generate(self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs: Any) -> ChatResult:
+        reply = self._assess(messages)
+        time.sleep(self._delay(reply))
+        return ChatResult(generations=[ChatGeneration(message=reply)])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs: Any) -> ChatResult:
+        reply = self._assess(messages)
+        await asyncio.sleep(self._delay(reply))
+        return ChatResult(generations=[ChatGeneration(message=reply)])
+
+class FakeSummaryModel(BaseChatModel):
+    """Offline stand-in for the summary model.
+
+    Keeps the two most recent code blocks from the current summary and new
+    messages plus a count of folded messages, so its output stays bounded
+    like a real summary would.
+    """
+
+    latency: float = 0.3
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-summary"
+
+    def _summarize(self, messages: List[BaseMessage]) -> AIMessage:
+        prompt = "\n".join(message_text(m) for m in messages)
+        code = _CODE_BLOCK.findall(prompt)[-2:]
+        folded = prompt.count("\nStudent: ") + prompt.count("\nTutor: ")
+        text = "\n\n".join([f"**Milestone notes**: folded {folded} messages.", "**Student code**:", *code])[:2000]
+        return AIMessage(content=text, usage_metadata={
+            "input_tokens": _approx_tokens(prompt), "output_tokens": _approx_tokens(text),
+            "total_tokens": _approx_tokens(prompt) + _approx_tokens(text),
+        })
+
+    def _generate(self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs: Any) -> ChatResult:
+        time.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=self._summarize(messages))])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs: Any) -> ChatResult:
+        await asyncio.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=self._summarize(messages))])
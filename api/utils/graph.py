@@ -1,228 +1,657 @@
+from typing import Any, Dict, List, Optional, Tuple
+import ast
+import asyncio
+import logging
+import time
+
+from langchain_core.exceptions import OutputParserException
+from langchain_core.runnables import Runnable
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from langgraph.config import get_stream_writer
 from langgraph.graph import StateGraph, END
 
+from ..settings import (
+    HISTORY_KEEP_MESSAGES, LLM_TIMEOUT, PARALLEL_ASSESSMENT, ROUTE_LONG_MESSAGE_CHARS, SUMMARY_EVERY_TURNS,
+)
+from .admission import AdmissionRejected, admission
+from .assessment import Assessment, assess_submission, extract_code, looks_like_code
+from .curriculum import curriculum_registry
 from .state import TutorState
-from .llm import llm
-from .output_parser import tutoring_parser
-from .prompt import unified_tutoring_prompt
+from .llm import ROUTES, assessment_llm, summary_llm, token_usage, tutor_llm, usage_cost
+from .metrics import (
+    LLM_COST, LLM_LATENCY, LLM_TTFT, MILESTONE_COMPLETIONS, PARSER_FAILURES, PARSER_OUTCOMES, PARSER_REPAIRS,
+    TURNS_ROUTED, record_token_usage,
+)
+from .output_parser import TutoringOutputParser, parse_verdict
+from .response_cache import response_cache, response_key
+from .prompt import assessment_prompt, chat_prompt, summary_prompt, tutor_prompt, unified_tutoring_prompt
+from .log import get_logger
+from .streaming import message_text
 
-def log(message: str) -> None:
-    """Log with immediate flush for real-time output"""
-    print(message, flush=True)
+# Built on first use and shared by every session; the chains themselves are
+# stateless so concurrent turns can await them without stepping on each other.
+# They stop at the model so the reply's usage metadata (including prompt cache
+# reads/writes) is available before the JSON is parsed. One of each per
+# model route.
+tutoring_chains: Dict[str, Runnable] = {}
+chat_chains: Dict[str, Runnable] = {}
+reply_chains: Dict[str, Runnable] = {}
+summary_chain: Optional[Runnable] = None
+assessment_chain: Optional[Runnable] = None
 
-async def process_message(state: TutorState) -> TutorState:
-    """Process student message with simplified Socratic tutoring."""
-    session_id = state.get("session_id", "unknown")
-    log(f"\n[SESSION {session_id}] === PROCESSING MESSAGE ===")
-    log(f"[INPUT] Message: {state['current_input'][:100]}{'...' if len(state['current_input']) > 100 else ''}")
-    log(f"[STATE IN] Current milestone: {state.get('current_milestone')}")
-    log(f"[STATE IN] Completed milestones: {state.get('milestones_completed', [])}")
+FAILED_REPLY = "I apologize, but I encountered an error. Please try again."
+
+# Nodes whose model output is the tutor's reply, streamed to the client as
+# it's generated
+STREAMED_NODES = ("process_message", "tutor_reply")
+
+logger = get_logger("graph")
+
+def log_turn(state: TutorState, final_state: TutorState, llm_verdict: str, usage: dict) -> None:
+    """One INFO line per processed turn with the milestone transition and token usage."""
+    logger.info(
+        "Turn processed: milestone %s -> %s", state.get('current_milestone'), final_state['current_milestone'],
+        extra={
+            "milestones_completed": final_state['milestones_completed'],
+            "llm_verdict": llm_verdict,
+            **usage,
+        },
+    )
+
+def tutor_chain(code_found: bool, route: str) -> Runnable:
+    """The assessing chain for turns with code, else the conversation-only one."""
+    chains, prompt = (tutoring_chains, unified_tutoring_prompt) if code_found else (chat_chains, chat_prompt)
+    if route not in chains:
+        chains[route] = prompt | tutor_llm(route)
+    return chains[route]
+
+def reply_chain(route: str) -> Runnable:
+    """The tutor chain for turns with code whose verdict comes from assess_milestone."""
+    if route not in reply_chains:
+        reply_chains[route] = tutor_prompt | tutor_llm(route)
+    return reply_chains[route]
+
+def verdict_chain() -> Runnable:
+    global assessment_chain
+    if assessment_chain is None:
+        assessment_chain = assessment_prompt | assessment_llm()
+    return assessment_chain
+
+def history_summary_chain() -> Runnable:
+    global summary_chain
+    if summary_chain is None:
+        summary_chain = summary_prompt | summary_llm()
+    return summary_chain
+
+def warm_up() -> None:
+    """Create every model client and chain ahead of the first turn."""
+    for route in ROUTES:
+        tutor_chain(True, route)
+        tutor_chain(False, route)
+        reply_chain(route)
+    verdict_chain()
+    history_summary_chain()
+
+def classify_turn(message: str, milestone_open: bool) -> Tuple[str, str]:
+    """Model route for a student message and the heuristic that chose it.
+
+    Only code that parses can complete the milestone, so only its assessment
+    needs the strong model; the fast model can point at a syntax error. Code
+    that can't be separated from the prose is judged by the model, so it goes
+    to the strong one too. Without code, long messages (explanations, detailed questions) still go to the
+    strong model and short ones don't.
+    """
+    if not milestone_open:
+        return "fast", "finished"
+    blocks = extract_code(message)
+    if blocks:
+        try:
+            for block in blocks:
+                ast.parse(block)
+        except SyntaxError:
+            return "fast", "syntax_error"
+        return "strong", "code"
+    if looks_like_code(message):
+        return "strong", "unseparated_code"
+    if len(message) >= ROUTE_LONG_MESSAGE_CHARS:
+        return "strong", "long_message"
+    return "fast", "chat"
+
+def route_turn(state: TutorState) -> dict:
+    """Pick the tutor model for this turn from cheap message heuristics."""
+    curriculum = curriculum_registry.get(state.get('curriculum_id'))
+    milestone_open = len(state.get('milestones_completed', [])) < len(curriculum.milestone_ids)
+    route, reason = classify_turn(state["current_input"], milestone_open)
+    TURNS_ROUTED.inc(route=route, reason=reason)
+    return {"route": route}
+
+def resolve_milestones(state: TutorState, curriculum, debug: bool) -> Tuple[set, Optional[str], List[str]]:
+    """Completed milestones, the milestone being worked on and those still
+    open, with the forward-only guards applied."""
+    # Strict forward-only milestone management
+    all_milestone_ids = curriculum.milestone_ids
+    completed = set(state.get('milestones_completed', []))
+    current_milestone = state.get('current_milestone')
     
-    try:
-        message = state["current_input"]
-        updated_messages = state["messages"] + [{"role": "user", "content": message}]
-        
-        # Strict forward-only milestone management
-        all_milestone_ids = [m['id'] for m in state['curriculum']['milestones']]
-        completed = set(state.get('milestones_completed', []))
-        current_milestone = state.get('current_milestone')
-        
-        log(f"[MILESTONE GUARD] All milestones: {all_milestone_ids}")
-        log(f"[MILESTONE GUARD] Previously completed: {list(completed)}")
-        log(f"[MILESTONE GUARD] Current milestone: {current_milestone}")
-        
-        # GUARD: Ensure completed milestones are never lost or reduced
-        if len(completed) > len(state.get('milestones_completed', [])):
-            log(f"[MILESTONE GUARD] WARNING: Completed milestones increased unexpectedly")
+    if debug:
+        logger.debug("Milestone guard: all=%s completed=%s current=%s", all_milestone_ids, sorted(completed), current_milestone)
+    
+    # GUARD: Ensure completed milestones are never lost or reduced
+    if len(completed) > len(state.get('milestones_completed', [])):
+        logger.warning("Milestone guard: completed milestones increased unexpectedly")
+    
+    # GUARD: Find current milestone if none set - use curriculum order ONLY
+    if not current_milestone:
+        for milestone_id in all_milestone_ids:
+            if milestone_id not in completed:
+                current_milestone = milestone_id
+                if debug:
+                    logger.debug("Milestone guard: bootstrap to first incomplete %s", current_milestone)
+                break
+    
+    # GUARD: Prevent working on completed milestones
+    if current_milestone and current_milestone in completed:
+        logger.warning("Milestone guard: blocked work on completed milestone %s", current_milestone)
+        # Find next incomplete milestone
+        for milestone_id in all_milestone_ids:
+            if milestone_id not in completed:
+                current_milestone = milestone_id
+                if debug:
+                    logger.debug("Milestone guard: redirected to next incomplete %s", current_milestone)
+                break
+    
+    # Available milestones (not yet completed, in order)
+    available_milestones = [m for m in all_milestone_ids if m not in completed]
+    if debug:
+        logger.debug("Milestone guard: available=%s", available_milestones)
+    
+    return completed, current_milestone, available_milestones
+
+def advance_milestones(curriculum, completed: set, current_milestone: Optional[str],
+                       verdict: str) -> Tuple[bool, set, Optional[str]]:
+    """Whether `verdict` completes the current milestone, the completed
+    milestones after it, and the milestone to work on next."""
+    all_milestone_ids = curriculum.milestone_ids
+    
+    # STRICT milestone completion logic - only allow completion of current milestone
+    new_completed = completed.copy()  # Never lose completed milestones
+    
+    # ONLY allow completion if the verdict is explicitly the current milestone ID
+    just_completed = bool(verdict == current_milestone and 
+                          current_milestone and 
+                          current_milestone not in completed and
+                          current_milestone in curriculum.positions)
+    if just_completed:
+        new_completed.add(current_milestone)
+    
+    # STRICT forward progression - only advance if milestone was just completed
+    next_milestone = current_milestone  # Default: stay on current
+    
+    if just_completed:
+        current_index = curriculum.positions[current_milestone]
         
-        # GUARD: Find current milestone if none set - use curriculum order ONLY
+        # Look for next milestone in strict curriculum order
+        for i in range(current_index + 1, len(all_milestone_ids)):
+            next_id = all_milestone_ids[i]
+            if next_id not in new_completed:
+                next_milestone = next_id
+                break
+        else:
+            # All milestones completed
+            next_milestone = None
+    
+    # GUARD: Final validation - never go backwards
+    if next_milestone and next_milestone in new_completed:
+        logger.warning("Progression guard: blocked backwards movement to %s", next_milestone)
+        next_milestone = current_milestone
+    
+    return just_completed, new_completed, next_milestone
+
+def report_progress(completed_before: set, current_milestone: Optional[str], milestones_completed: List[str]) -> None:
+    """Send the turn's milestone progress to ``stream_mode="custom"`` readers
+    as soon as the verdict is applied, ahead of the stored state."""
+    get_stream_writer()({
+        "type": "progress",
+        "completed": [m for m in milestones_completed if m not in completed_before],
+        "current_milestone": current_milestone,
+        "milestones_completed": milestones_completed,
+    })
+
+def conclude_turn(state: TutorState, curriculum, completed: set, current_milestone: Optional[str],
+                  updated_messages: List[Dict[str, str]], response: Dict[str, str], assessment: Assessment,
+                  usage: Dict[str, Any], code_blocks: List[str], debug: bool) -> TutorState:
+    """Apply the milestone verdict in `response` through the completion and
+    progression guards and build the state after the turn."""
+    all_milestone_ids = curriculum.milestone_ids
+    
+    # SIMPLE EXPLICIT MILESTONE COMPLETION - no complex parsing needed
+    completed_milestone_id = response.get('milestone_completed', 'none')
+    if debug:
+        logger.debug("Completion guard: LLM returned %r for current milestone %s (local checks: %s)",
+                     completed_milestone_id, current_milestone, assessment.outcome)
+    
+    # Local checks are reproducible, so they decide whenever they ran;
+    # the model's verdict only counts for milestones without checks
+    if not assessment.code_found or assessment.syntax_error:
+        completed_milestone_id = 'none'
+    elif assessment.checked:
+        local_verdict = current_milestone if assessment.passed else 'none'
+        if local_verdict != completed_milestone_id:
+            logger.info("Local checks overrode the model's verdict %r with %r", completed_milestone_id, local_verdict)
+        completed_milestone_id = local_verdict
+    
+    just_completed, new_completed, next_milestone = advance_milestones(
+        curriculum, completed, current_milestone, completed_milestone_id
+    )
+    if just_completed:
+        MILESTONE_COMPLETIONS.inc(curriculum=curriculum.id, milestone=current_milestone)
+        if debug:
+            logger.debug("Completion guard: approved completion of %s", current_milestone)
+    elif debug:
+        reasons = []
+        if completed_milestone_id == 'none':
+            reasons.append("verdict is 'none' - no completion")
+        elif completed_milestone_id != current_milestone:
+            reasons.append(f"verdict is '{completed_milestone_id}' but current is '{current_milestone}'")
         if not current_milestone:
-            for milestone_id in all_milestone_ids:
-                if milestone_id not in completed:
-                    current_milestone = milestone_id
-                    log(f"[MILESTONE GUARD] Bootstrap to first incomplete: {current_milestone}")
-                    break
-        
-        # GUARD: Prevent working on completed milestones
+            reasons.append("no current milestone set")
         if current_milestone and current_milestone in completed:
-            log(f"[MILESTONE GUARD] BLOCKING: Attempted to work on completed milestone {current_milestone}")
-            # Find next incomplete milestone
-            for milestone_id in all_milestone_ids:
-                if milestone_id not in completed:
-                    current_milestone = milestone_id
-                    log(f"[MILESTONE GUARD] Redirected to next incomplete: {current_milestone}")
-                    break
-        
-        # Available milestones (not yet completed, in order)
-        available_milestones = [m for m in all_milestone_ids if m not in completed]
-        log(f"[MILESTONE GUARD] Available milestones: {available_milestones}")
-        
-        # PRE-ASSESSMENT: Check if student might be completing the current milestone
-        # This helps us determine the correct state to pass to the LLM
-        
-        # Single LLM call for Socratic tutoring + assessment
-        log(f"[LLM CALL] Starting unified tutoring response...")
-        chain = unified_tutoring_prompt | llm | tutoring_parser
-        response = chain.invoke({
-            "student_background": state["student"]["background"],
-            "curriculum": state["curriculum"],
-            "current_milestone": current_milestone,
-            "milestones_completed": list(completed),
-            "available_milestones": available_milestones,
-            "history": updated_messages[-5:],
-            "input": message,
-        })
-        log(f"[LLM RESPONSE] Response: {response}")
-        
-        # STRICT milestone completion logic - only allow completion of current milestone
-        new_completed = completed.copy()  # Never lose completed milestones
-        just_completed = False
-        
-        # SIMPLE EXPLICIT MILESTONE COMPLETION - no complex parsing needed
-        completed_milestone_id = response.get('milestone_completed', 'none')
-        log(f"[COMPLETION GUARD] LLM returned milestone_completed: '{completed_milestone_id}'")
-        log(f"[COMPLETION GUARD] Current milestone: {current_milestone}")
-        log(f"[COMPLETION GUARD] Already completed: {current_milestone in completed if current_milestone else 'N/A'}")
-        
-        # ONLY allow completion if LLM explicitly returns the current milestone ID
-        completion_allowed = (completed_milestone_id == current_milestone and 
-                            current_milestone and 
-                            current_milestone not in completed and
-                            current_milestone in all_milestone_ids)
-        
-        log(f"[COMPLETION DECISION] Explicit milestone ID match: {completed_milestone_id == current_milestone}")
-        log(f"[COMPLETION DECISION] Current milestone exists: {bool(current_milestone)}")
-        log(f"[COMPLETION DECISION] Not already completed: {current_milestone not in completed if current_milestone else False}")
-        log(f"[COMPLETION DECISION] Valid milestone ID: {current_milestone in all_milestone_ids if current_milestone else False}")
-        log(f"[COMPLETION DECISION] Final allowed: {completion_allowed}")
-        
-        if completion_allowed:
-            new_completed.add(current_milestone)
-            just_completed = True
-            log(f"[COMPLETION GUARD] ✅ APPROVED completion of: {current_milestone}")
-        else:
-            reasons = []
-            if completed_milestone_id == 'none':
-                reasons.append("LLM returned 'none' - no completion")
-            elif completed_milestone_id != current_milestone:
-                reasons.append(f"LLM returned '{completed_milestone_id}' but current is '{current_milestone}'")
-            if not current_milestone:
-                reasons.append("no current milestone set")
-            if current_milestone and current_milestone in completed:
-                reasons.append("milestone already completed")
-            if current_milestone and current_milestone not in all_milestone_ids:
-                reasons.append("invalid milestone ID")
-            
-            reason = ", ".join(reasons) if reasons else "unknown reason"
-            log(f"[COMPLETION GUARD] ❌ REJECTED completion ({reason})")
-        
-        # STRICT forward progression - only advance if milestone was just completed
-        next_milestone = current_milestone  # Default: stay on current
-        
-        if just_completed:
-            log(f"[PROGRESSION GUARD] Finding next milestone after completing {current_milestone}")
-            current_index = all_milestone_ids.index(current_milestone)
-            
-            # Look for next milestone in strict curriculum order
-            for i in range(current_index + 1, len(all_milestone_ids)):
-                next_id = all_milestone_ids[i]
-                if next_id not in new_completed:
-                    next_milestone = next_id
-                    log(f"[PROGRESSION GUARD] ✅ Advancing to next milestone: {next_milestone}")
-                    break
-            else:
-                # All milestones completed
-                next_milestone = None
-                log(f"[PROGRESSION GUARD] 🎉 ALL MILESTONES COMPLETED!")
-        else:
-            log(f"[PROGRESSION GUARD] Staying on current milestone: {current_milestone}")
-        
-        # GUARD: Final validation - never go backwards
-        if next_milestone and next_milestone in new_completed:
-            log(f"[PROGRESSION GUARD] BLOCKING: Attempted backwards movement to {next_milestone}")
-            next_milestone = current_milestone
-        
-        # SPECIAL HANDLING: If all milestones are complete, generate celebration response
-        if next_milestone is None and len(new_completed) == len(all_milestone_ids):
-            log(f"[FINAL MILESTONE] All milestones completed! Generating celebration response...")
-            celebration_response = "🎉🎉🎉 CONGRATULATIONS! 🎉🎉🎉\n\nYou have successfully completed ALL milestones for the Tic-Tac-Toe project! You've built:\n\n✅ Board Implementation\n✅ Player Input\n✅ Win Condition Implementation\n✅ Game Loop\n\nYour tic-tac-toe game is now complete and fully functional! You should be proud of your accomplishment. You've demonstrated strong programming skills and problem-solving abilities throughout this project.\n\nFeel free to enhance your game further by adding features like:\n- Better user interface\n- Computer AI opponent\n- Score tracking\n- Different board sizes\n\nGreat job! 🎉"
-            
-            # Build final state for completed project
-            final_state = {
-                **state,
-                "messages": updated_messages + [{"role": "assistant", "content": celebration_response}],
-                "current_milestone": None,  # No more milestones
-                "milestones_completed": sorted(list(new_completed), key=lambda x: all_milestone_ids.index(x)),
-            }
-            
-            log(f"[FINAL MILESTONE] Project complete! All {len(new_completed)} milestones done.")
-            log(f"[SESSION {session_id}] === PROJECT COMPLETED ===\n")
-            
-            return final_state
-        
-        # Build response with congratulations if milestone was just completed
-        response_content = response['message']
-        if just_completed:
-            congratulations = f"🎉 Great job! You've completed milestone: {current_milestone}!\n\n"
-            response_content = congratulations + response_content
-            log(f"[MESSAGE] Added congratulations for {current_milestone}")
-        
-        # Final state with protected milestone values
-        final_milestones_completed = sorted(list(new_completed), key=lambda x: all_milestone_ids.index(x))
+            reasons.append("milestone already completed")
+        if current_milestone and current_milestone not in curriculum.positions:
+            reasons.append("invalid milestone ID")
+    
+        reason = ", ".join(reasons) if reasons else "unknown reason"
+        logger.debug("Completion guard: rejected completion (%s)", reason)
+    
+    # SPECIAL HANDLING: If all milestones are complete, generate celebration response
+    if next_milestone is None and len(new_completed) == len(all_milestone_ids):
+        celebration_response = curriculum.celebration
+    
+        # Build final state for completed project
         final_state = {
             **state,
-            "messages": updated_messages + [{"role": "assistant", "content": response_content}],
-            "current_milestone": next_milestone,
-            "milestones_completed": final_milestones_completed,
+            "messages": updated_messages + [{"role": "assistant", "content": celebration_response}],
+            "usage": usage,
+            "code_blocks": code_blocks,
+            "current_milestone": None,  # No more milestones
+            "milestones_completed": curriculum.sort_milestones(new_completed),
         }
+    
+        log_turn(state, final_state, completed_milestone_id, usage)
+    
+        return final_state
+    
+    # Milestone progress reaches the client as a structured event (see
+    # report_progress), so the reply itself is left as the model wrote it
+    final_milestones_completed = curriculum.sort_milestones(new_completed)
+    final_state = {
+        **state,
+        "messages": updated_messages + [{"role": "assistant", "content": response['message']}],
+        "current_milestone": next_milestone,
+        "usage": usage,
+        "code_blocks": code_blocks,
+        "milestones_completed": final_milestones_completed,
+    }
+    
+    # FINAL GUARD: Verify no backwards movement
+    if len(final_state['milestones_completed']) < len(state.get('milestones_completed', [])):
+        logger.error("State guard: completed milestones decreased")
+        # Restore previous completed milestones
+        final_state['milestones_completed'] = state.get('milestones_completed', [])
+    
+    if (final_state['current_milestone'] and 
+        final_state['current_milestone'] in final_state['milestones_completed']):
+        logger.error("State guard: current milestone is already completed")
+        # Find next incomplete milestone
+        for milestone_id in all_milestone_ids:
+            if milestone_id not in final_state['milestones_completed']:
+                final_state['current_milestone'] = milestone_id
+                logger.error("State guard: corrected current milestone to %s", milestone_id)
+                break
+    
+    log_turn(state, final_state, completed_milestone_id, usage)
+    
+    return final_state
+
+async def generate_reply(state: TutorState, chain: Runnable, route: str, inputs: Dict[str, Any],
+                         cache_key: Optional[str] = None) -> Tuple[Dict[str, str], Dict[str, Any]]:
+    """Stream the tutor model's reply and parse it.
+    
+    With a `cache_key` the reply is served from the response cache when
+    present, and stored there otherwise.
+    """
+    cached = response_cache.get(cache_key) if cache_key else None
+    if cached:
+        usage = {"input_tokens": 0, "output_tokens": 0, "cache_read_input_tokens": 0,
+                 "cache_creation_input_tokens": 0, "latency_ms": 0, "route": route, "cost_usd": 0.0,
+                 "cached": True}
+        return cached, usage
+    
+    # Streamed and reassembled here so time-to-first-token can be measured
+    # and the reply is scanned as it arrives; the deadline covers the whole
+    # stream, not just each read
+    parser = TutoringOutputParser()
+    async with admission.slot(state["session_id"]), asyncio.timeout(LLM_TIMEOUT):
+        started = time.perf_counter()
+        reply = None
+        first_token = True
+        async for chunk in chain.astream(inputs):
+            text = message_text(chunk)
+            # The first chunk (Anthropic's message_start) carries no text
+            if first_token and text:
+                LLM_TTFT.observe(time.perf_counter() - started, route=route)
+                first_token = False
+            reply = chunk if reply is None else reply + chunk
+            parser.feed(text)
+    elapsed = time.perf_counter() - started
+    LLM_LATENCY.observe(elapsed, route=route)
+    usage = token_usage(reply, elapsed)
+    record_token_usage(usage, route)
+    cost = usage_cost(usage, route)
+    LLM_COST.inc(cost, route=route)
+    usage.update(route=route, cost_usd=round(cost, 6))
+    try:
+        response = parser.finish()
+    except OutputParserException:
+        PARSER_FAILURES.inc()
+        PARSER_OUTCOMES.inc(outcome="failed")
+        raise
+    PARSER_OUTCOMES.inc(outcome="repaired" if parser.repairs else "clean")
+    for repair in parser.repairs:
+        PARSER_REPAIRS.inc(repair=repair)
+    if parser.repairs:
+        logger.info("Repaired tutor reply: %s", ", ".join(parser.repairs))
+    if cache_key and "truncated" not in parser.repairs:
+        response_cache.put(cache_key, response, elapsed)
+    return response, usage
+
+def reply_inputs(state: TutorState, curriculum, completed: set, current_milestone: Optional[str],
+                 available_milestones: List[str], assessment: Assessment) -> Dict[str, Any]:
+    """Variables for the tutor prompts; each prompt uses the ones it needs."""
+    updated_messages = state["messages"] + [{"role": "user", "content": state["current_input"]}]
+    return {
+        "student_background": state["student"]["background"],
+        "project": curriculum.config.project,
+        "curriculum": curriculum.prompt,
+        "milestone_rules": curriculum.milestone_rules,
+        "current_milestone": current_milestone,
+        "milestones_completed": list(completed),
+        "available_milestones": available_milestones,
+        "local_assessment": assessment.describe(current_milestone),
+        "tutor_assessment": assessment.describe_for_tutor(current_milestone),
+        "summary": state.get("summary") or "(nothing yet)",
+        "history": updated_messages[-5:],
+        "input": state["current_input"],
+    }
+
+def reply_cache_key(state: TutorState, curriculum, completed: set, current_milestone: Optional[str],
+                    assessment: Assessment) -> Optional[str]:
+    """Response cache key for the turn, or None if it mustn't be cached.
+    
+    Turns without code can't complete anything, so a reply to the same
+    message at the same point in the course (same lead-up, same student
+    context) can be served again without calling the model.
+    """
+    if assessment.code_found or not response_cache.enabled:
+        return None
+    return response_key(
+        curriculum.id, current_milestone, completed, state["current_input"], state["messages"][-4:],
+        context=f"{state['student']['background']}\0{state.get('summary') or ''}",
+    )
+
+def failed_turn(state: TutorState) -> TutorState:
+    """The state after a turn that couldn't be processed: the student's
+    message and an apology, with progress unchanged."""
+    return {
+        **state,
+        "messages": state["messages"] + [
+            {"role": "user", "content": state["current_input"]},
+            {"role": "assistant", "content": FAILED_REPLY}
+        ]
+    }
+
+async def process_message(state: TutorState) -> TutorState:
+    """Process student message with simplified Socratic tutoring.
+    
+    One model call writes the reply and judges milestone completion; see
+    build_graph for the parallel alternative.
+    """
+    # Guard tracing below is only built when DEBUG is on, so it costs one
+    # attribute check per turn in production
+    debug = logger.isEnabledFor(logging.DEBUG)
+    if debug:
+        logger.debug("Processing message: %.100s", state['current_input'])
+        logger.debug("State in: milestone=%s completed=%s", state.get('current_milestone'), state.get('milestones_completed', []))
+    
+    try:
+        message = state["current_input"]
+        updated_messages = state["messages"] + [{"role": "user", "content": message}]
+        curriculum = curriculum_registry.get(state.get('curriculum_id'))
+        completed, current_milestone, available_milestones = resolve_milestones(state, curriculum, debug)
         
-        # FINAL GUARD: Log state transition for verification
-        log(f"[STATE GUARD] BEFORE: milestone={state.get('current_milestone')}, completed={state.get('milestones_completed', [])}")
-        log(f"[STATE GUARD] AFTER:  milestone={final_state['current_milestone']}, completed={final_state['milestones_completed']}")
-        
-        # FINAL GUARD: Verify no backwards movement
-        if len(final_state['milestones_completed']) < len(state.get('milestones_completed', [])):
-            log(f"[STATE GUARD] 🚨 CRITICAL ERROR: Completed milestones decreased!")
-            # Restore previous completed milestones
-            final_state['milestones_completed'] = state.get('milestones_completed', [])
-        
-        if (final_state['current_milestone'] and 
-            final_state['current_milestone'] in final_state['milestones_completed']):
-            log(f"[STATE GUARD] 🚨 CRITICAL ERROR: Current milestone is completed!")
-            # Find next incomplete milestone
-            for milestone_id in all_milestone_ids:
-                if milestone_id not in final_state['milestones_completed']:
-                    final_state['current_milestone'] = milestone_id
-                    log(f"[STATE GUARD] EMERGENCY CORRECTION: Set to {milestone_id}")
-                    break
+        # Run any code in the message against the milestone's checks first.
+        # Without code nothing can be completed, so the model gets the
+        # shorter conversation-only prompt with no assessment instructions
+        assessment, code_blocks = await assess_submission(
+            message, state.get("code_blocks", []), current_milestone, curriculum.checks.get(current_milestone, ()),
+        )
+        route = state.get("route") or "strong"
         
-        log(f"[STATE OUT] Current milestone: {final_state['current_milestone']}")
-        log(f"[STATE OUT] Completed milestones: {final_state['milestones_completed']}")
-        log(f"[SESSION {session_id}] === PROCESSING COMPLETE ===\n")
+        # Single LLM call for Socratic tutoring + assessment
+        response, usage = await generate_reply(
+            state, tutor_chain(assessment.code_found, route), route,
+            reply_inputs(state, curriculum, completed, current_milestone, available_milestones, assessment),
+            reply_cache_key(state, curriculum, completed, current_milestone, assessment),
+        )
+        if debug:
+            logger.debug("LLM response: %s", response)
         
+        final_state = conclude_turn(state, curriculum, completed, current_milestone, updated_messages, response,
+                                    assessment, usage, code_blocks, debug)
+        report_progress(completed, final_state['current_milestone'], final_state['milestones_completed'])
         return final_state
         
-    except Exception as e:
-        log(f"[ERROR] Exception: {str(e)}")
-        import traceback
-        log(f"[ERROR] Traceback: {traceback.format_exc()}")
-        
-        error_message = "I apologize, but I encountered an error. Please try again."
-        return {
-            **state,
-            "messages": state["messages"] + [
-                {"role": "user", "content": message},
-                {"role": "assistant", "content": error_message}
-            ]
-        }
+    except AdmissionRejected:
+        # Surfaced to the handler as a 429 rather than a tutor reply
+        raise
+    except Exception:
+        logger.exception("Failed to process message")
+        return failed_turn(state)
 
+# Parallel graph: prepare_turn runs the local checks, then tutor_reply and
+# assess_milestone run at the same time and join_turn applies the verdict.
+# The intermediate results travel in the state's `turn_*` keys and are
+# cleared by the join.
+
+async def prepare_turn(state: TutorState) -> dict:
+    """Settle the milestone being worked on and run the local checks."""
+    curriculum = curriculum_registry.get(state.get('curriculum_id'))
+    completed, current_milestone, _ = resolve_milestones(state, curriculum, logger.isEnabledFor(logging.DEBUG))
+    assessment, code_blocks = await assess_submission(
+        state["current_input"], state.get("code_blocks", []), current_milestone,
+        curriculum.checks.get(current_milestone, ()),
+    )
+    return {
+        "current_milestone": current_milestone,
+        "turn_assessment": assessment._asdict(),
+        "turn_code_blocks": code_blocks,
+    }
+
+async def tutor_reply(state: TutorState) -> dict:
+    """Write the tutor's reply; milestone completion is assess_milestone's job."""
+    curriculum = curriculum_registry.get(state.get('curriculum_id'))
+    assessment = Assessment(**state["turn_assessment"])
+    completed = set(state.get('milestones_completed', []))
+    available_milestones = [m for m in curriculum.milestone_ids if m not in completed]
+    route = state.get("route") or "strong"
+    chain = reply_chain(route) if assessment.code_found else tutor_chain(False, route)
+    try:
+        response, usage = await generate_reply(
+            state, chain, route,
+            reply_inputs(state, curriculum, completed, state["current_milestone"], available_milestones, assessment),
+            reply_cache_key(state, curriculum, completed, state["current_milestone"], assessment),
+        )
+    except AdmissionRejected:
+        raise
+    except Exception:
+        logger.exception("Failed to write the tutor reply")
+        return {"turn_reply": {}}
+    return {"turn_reply": {"message": response["message"], "usage": usage}}
+
+async def grade_milestone(state: TutorState, assessment: Assessment, milestone_id: Optional[str]) -> Dict[str, Any]:
+    """Verdict on the current milestone.
+    
+    Local checks decide whenever they ran, and code that is missing or
+    doesn't parse can't complete anything; only code the checks couldn't
+    judge goes to the assessment model, along with the whole message when
+    its code couldn't be separated from the prose.
+    """
+    if not milestone_id or not assessment.code_found or assessment.syntax_error:
+        return {"milestone_completed": "none", "source": "no_code"}
+    if assessment.checked:
+        return {"milestone_completed": milestone_id if assessment.passed else "none", "source": "checks"}
+    
+    curriculum = curriculum_registry.get(state.get('curriculum_id'))
+    milestone = curriculum.config.milestones[curriculum.positions[milestone_id]]
+    code = state["turn_code_blocks"] + ([state["current_input"]] if assessment.unseparated else [])
+    try:
+        async with admission.slot(state["session_id"]), asyncio.timeout(LLM_TIMEOUT):
+            started = time.perf_counter()
+            reply = await verdict_chain().ainvoke({
+                "project": curriculum.config.project,
+                "milestone_id": milestone_id,
+                "milestone_name": milestone.name,
+                "milestone_description": milestone.description,
+                "code": "\n\n".join(code),
+            })
+    except AdmissionRejected:
+        raise
+    except Exception:
+        # Never complete a milestone on a failed assessment
+        logger.exception("Milestone assessment failed")
+        return {"milestone_completed": "none", "source": "error"}
+    
+    usage = token_usage(reply, time.perf_counter() - started)
+    cost = usage_cost(usage, "strong")
+    record_token_usage(usage, "assessment")
+    LLM_COST.inc(cost, route="assessment")
+    usage["cost_usd"] = round(cost, 6)
+    verdict, feedback = parse_verdict(message_text(reply), milestone_id)
+    return {"milestone_completed": verdict, "feedback": feedback, "source": "model", "usage": usage}
+
+async def assess_milestone(state: TutorState) -> dict:
+    """Grade the turn's code while the tutor's reply is being written."""
+    verdict = await grade_milestone(state, Assessment(**state["turn_assessment"]), state["current_milestone"])
+    return {"turn_verdict": verdict}
+
+def join_turn(state: TutorState) -> TutorState:
+    """Combine the reply and the verdict through the milestone guards and
+    report the resulting progress.
+    
+    Progress waits for the join rather than going out as soon as the
+    verdict is in: until tutor_reply has its model slot the turn can still
+    be rejected with a 429, and the client mustn't hear about a milestone
+    that was never stored.
+    """
+    scratch = {"turn_assessment": {}, "turn_code_blocks": [], "turn_reply": {}, "turn_verdict": {}}
+    reply, verdict = state["turn_reply"], state["turn_verdict"]
+    
+    debug = logger.isEnabledFor(logging.DEBUG)
+    curriculum = curriculum_registry.get(state.get('curriculum_id'))
+    completed = set(state.get('milestones_completed', []))
+    usage = dict(reply.get("usage") or {})
+    if verdict.get("usage"):
+        usage["assessment"] = verdict["usage"]
+    # The verdict still counts when the reply failed; only the reply falls
+    # back to an apology
+    response = {"message": reply.get("message") or FAILED_REPLY, "milestone_completed": verdict["milestone_completed"]}
+    updated_messages = state["messages"] + [{"role": "user", "content": state["current_input"]}]
+    final_state = conclude_turn(
+        state, curriculum, completed, state["current_milestone"], updated_messages, response,
+        Assessment(**state["turn_assessment"]), usage, state["turn_code_blocks"], debug,
+    )
+    report_progress(completed, final_state['current_milestone'], final_state['milestones_completed'])
+    return {**final_state, **scratch}
+
+def needs_summary(state: TutorState) -> bool:
+    """Whether SUMMARY_EVERY_TURNS turns have piled up on top of the
+    messages that are always kept verbatim."""
+    return len(state["messages"]) >= HISTORY_KEEP_MESSAGES + 2 * SUMMARY_EVERY_TURNS
+
+def format_transcript(messages: list) -> str:
+    return "\n".join(
+        f"{'Student' if m['role'] == 'user' else 'Tutor'}: {m['content']}" for m in messages
+    )
+
+async def summarize_history(state: TutorState) -> dict:
+    """Fold all but the latest messages into the running summary and drop them.
+
+    Runs on the small summary model and returns the state update. The tutor
+    prompt only ever carries the summary plus the last few messages, so
+    prompt size stays flat however long the session gets. This isn't a
+    graph node: the API runs it in the background once a turn is stored
+    (see index.schedule_summary), so the reply never waits for it. On
+    failure the raw history is kept and the fold is retried after the next
+    turn.
+    """
+    messages = state["messages"]
+    folded, kept = messages[:-HISTORY_KEEP_MESSAGES], messages[-HISTORY_KEEP_MESSAGES:]
+    curriculum = curriculum_registry.get(state.get('curriculum_id'))
+    try:
+        async with admission.slot(state["session_id"]), asyncio.timeout(LLM_TIMEOUT):
+            started = time.perf_counter()
+            reply = await history_summary_chain().ainvoke({
+                "project": curriculum.config.project,
+                "milestones": ", ".join(f"{m.id} ({m.name})" for m in curriculum.config.milestones),
+                "current_milestone": state.get("current_milestone") or "none",
+                "summary": state.get("summary") or "(empty)",
+                "transcript": format_transcript(folded),
+            })
+    except Exception:
+        logger.warning("Summarizing history failed, keeping raw messages", exc_info=True)
+        return {}
+    
+    usage = token_usage(reply, time.perf_counter() - started)
+    logger.info("Folded %d messages into the summary", len(folded), extra={"summary_" + k: v for k, v in usage.items()})
+    return {
+        "summary": message_text(reply).strip(),
+        "messages": kept,
+        "history_offset": state.get("history_offset", 0) + len(folded),
+    }
 
 # Graph Construction
-def build_graph():
-    """Build simplified LangGraph with single processing node."""
+def build_graph(checkpointer: Optional[BaseCheckpointSaver] = None, parallel: bool = PARALLEL_ASSESSMENT):
+    """Build the tutoring graph: the model router, then the turn itself.
+
+    With `parallel` the turn is prepare_turn fanning out to tutor_reply and
+    assess_milestone, joined by join_turn; otherwise it's the single
+    process_message node. With a checkpointer, each run must pass
+    ``thread_config(session_id)`` so the resulting state is persisted under
+    the session id.
+    """
     workflow = StateGraph(TutorState)
     
-    workflow.add_node("process_message", process_message)
-    workflow.add_edge("process_message", END)
-    workflow.set_entry_point("process_message")
+    workflow.add_node("route_turn", route_turn)
+    if parallel:
+        workflow.add_node("prepare_turn", prepare_turn)
+        workflow.add_node("tutor_reply", tutor_reply)
+        workflow.add_node("assess_milestone", assess_milestone)
+        workflow.add_node("join_turn", join_turn)
+        workflow.add_edge("route_turn", "prepare_turn")
+        workflow.add_edge("prepare_turn", "tutor_reply")
+        workflow.add_edge("prepare_turn", "assess_milestone")
+        workflow.add_edge(["tutor_reply", "assess_milestone"], "join_turn")
+        last = "join_turn"
+    else:
+        workflow.add_node("process_message", process_message)
+        workflow.add_edge("route_turn", "process_message")
+        last = "process_message"
+    workflow.add_edge(last, END)
+    workflow.set_entry_point("route_turn")
     
-    return workflow.compile()
\ No newline at end of file
+    return workflow.compile(checkpointer=checkpointer)
+
+def turn_node(graph) -> str:
+    """The node that ends a turn in `graph`, for writing to a stored turn's
+    state as if that node had."""
+    return "join_turn" if "join_turn" in graph.nodes else "process_message"
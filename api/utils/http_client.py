@@ -0,0 +1,280 @@
+import asyncio
+import random
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+from functools import lru_cache
+from typing import AsyncIterator, Callable, Deque, Optional, Set, Tuple
+
+import httpx
+
+from ..settings import (
+    LLM_CONNECT_TIMEOUT,
+    LLM_HEDGE_INITIAL_DELAY,
+    LLM_HEDGE_MAX_RATIO,
+    LLM_HEDGE_MIN_DELAY,
+    LLM_HEDGE_PERCENTILE,
+    LLM_KEEPALIVE_EXPIRY,
+    LLM_MAX_RETRIES,
+    LLM_POOL_MAX_CONNECTIONS,
+    LLM_POOL_MAX_KEEPALIVE,
+    LLM_READ_TIMEOUT,
+    LLM_RETRY_BASE_DELAY,
+    LLM_RETRY_MAX_DELAY,
+)
+from .log import get_logger
+from .metrics import registry
+
+logger = get_logger("http_client")
+
+LLM_HTTP_RETRIES = registry.counter(
+    "tutor_llm_http_retries_total", "Model API requests retried after an error, by client and reason.",
+    ("client", "reason"),
+)
+LLM_HEDGES = registry.counter(
+    "tutor_llm_hedged_requests_total", "Model API requests that were hedged, by client and which request won.",
+    ("client", "winner"),
+)
+
+# 529 is Anthropic's "overloaded"
+RETRYABLE_STATUS = frozenset((408, 409, 429, 500, 502, 503, 504, 529))
+RETRYABLE_ERRORS = (httpx.TimeoutException, httpx.NetworkError, httpx.RemoteProtocolError)
+# First-byte samples needed before the hedge delay follows the percentile
+HEDGE_MIN_SAMPLES = 20
+
+def retry_after_seconds(headers: httpx.Headers) -> Optional[float]:
+    """Server-requested wait from Retry-After (seconds or an HTTP date), if any."""
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+class LatencyWindow:
+    """The last `size` latency samples, for percentile lookups."""
+
+    def __init__(self, size: int = 200):
+        self._samples: Deque[float] = deque(maxlen=size)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def record(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def percentile(self, p: float) -> float:
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))]
+
+class _PrefetchedStream(httpx.AsyncByteStream):
+    """A response body whose first chunk was already read off the wire."""
+
+    def __init__(self, first: bytes, rest: AsyncIterator[bytes], stream: httpx.AsyncByteStream):
+        self._first = first
+        self._rest = rest
+        self._stream = stream
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        if self._first:
+            yield self._first
+        async for chunk in self._rest:
+            yield chunk
+
+    async def aclose(self) -> None:
+        await self._stream.aclose()
+
+class HedgingTransport(httpx.AsyncBaseTransport):
+    """Retries and hedges requests sent through another transport.
+
+    Every attempt waits for the first byte of the response body, not just the
+    headers, since a streamed reply that hasn't produced anything is exactly
+    the straggler worth racing. If nothing has arrived after the hedge delay
+    (a percentile of recent first-byte times) the same request is sent again,
+    the first to produce a byte wins and the other is cancelled and its
+    connection closed. Connection errors, timeouts before the first byte and
+    retryable statuses are retried with full-jitter exponential backoff,
+    honouring Retry-After. Errors after the first byte are left to the caller:
+    part of the reply has already been handed on.
+
+    The transport also sets each request's connect/read/write/pool deadlines,
+    overriding whatever the client asked for.
+    """
+
+    def __init__(
+        self,
+        transport: httpx.AsyncBaseTransport,
+        name: str,
+        timeout: httpx.Timeout,
+        max_retries: int = LLM_MAX_RETRIES,
+        retry_base_delay: float = LLM_RETRY_BASE_DELAY,
+        retry_max_delay: float = LLM_RETRY_MAX_DELAY,
+        hedge_percentile: float = LLM_HEDGE_PERCENTILE,
+        hedge_min_delay: float = LLM_HEDGE_MIN_DELAY,
+        hedge_initial_delay: float = LLM_HEDGE_INITIAL_DELAY,
+        hedge_max_ratio: float = LLM_HEDGE_MAX_RATIO,
+        rng: Callable[[], float] = random.random,
+    ):
+        self._transport = transport
+        self.name = name
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_initial_delay = hedge_initial_delay
+        self.hedge_max_ratio = hedge_max_ratio
+        self._rng = rng
+        self.first_byte = LatencyWindow()
+        self.attempts = 0
+        self.hedges = 0
+
+    def hedge_delay(self) -> Optional[float]:
+        """Seconds to wait for a first byte before hedging, or None for no hedge."""
+        if self.hedge_percentile <= 0 or self.hedges >= self.hedge_max_ratio * self.attempts:
+            return None
+        if len(self.first_byte) < HEDGE_MIN_SAMPLES:
+            return self.hedge_initial_delay
+        return max(self.hedge_min_delay, self.first_byte.percentile(self.hedge_percentile))
+
+    def backoff(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Full-jitter delay before retry number `attempt + 1`."""
+        delay = self._rng() * min(self.retry_max_delay, self.retry_base_delay * 2 ** attempt)
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.retry_max_delay))
+        return delay
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        request.extensions = {**request.extensions, "timeout": self.timeout.as_dict()}
+        # Buffer the body so it can be sent more than once
+        await request.aread()
+        attempt = 0
+        while True:
+            try:
+                response = await self._attempt(request)
+            except RETRYABLE_ERRORS as e:
+                if attempt >= self.max_retries:
+                    raise
+                reason, retry_after = type(e).__name__, None
+            else:
+                if response.status_code not in RETRYABLE_STATUS or attempt >= self.max_retries:
+                    return response
+                reason, retry_after = str(response.status_code), retry_after_seconds(response.headers)
+                await response.aclose()
+            delay = self.backoff(attempt, retry_after)
+            LLM_HTTP_RETRIES.inc(client=self.name, reason=reason)
+            logger.info("Retrying %s request after %s in %.2fs (attempt %d)", self.name, reason, delay, attempt + 1)
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+    async def _attempt(self, request: httpx.Request) -> httpx.Response:
+        self.attempts += 1
+        delay = self.hedge_delay()
+        primary = asyncio.create_task(self._send(request))
+        pending: Set[asyncio.Task] = {primary}
+        hedge: Optional[asyncio.Task] = None
+        error: Optional[BaseException] = None
+        failed: Optional[httpx.Response] = None
+        winner: Optional[httpx.Response] = None
+        try:
+            while pending and winner is None:
+                done, pending = await asyncio.wait(
+                    pending, timeout=delay if hedge is None else None, return_when=asyncio.FIRST_COMPLETED,
+                )
+                if not done:
+                    # No first byte yet: race a second copy of the request
+                    self.hedges += 1
+                    hedge = asyncio.create_task(self._send(request))
+                    pending.add(hedge)
+                    logger.info("Hedging %s request after %.2fs without a response", self.name, delay)
+                    continue
+                for task in done:
+                    if task.exception() is not None:
+                        error = error or task.exception()
+                        continue
+                    response, elapsed = task.result()
+                    if winner is not None:
+                        await response.aclose()
+                    elif response.status_code in RETRYABLE_STATUS and pending:
+                        # The other request may still succeed; keep this one in case it doesn't
+                        if failed is not None:
+                            await failed.aclose()
+                        failed = response
+                    else:
+                        winner = response
+                        if response.status_code < 400:
+                            self.first_byte.record(elapsed)
+                        if hedge is not None:
+                            LLM_HEDGES.inc(client=self.name, winner="hedge" if task is hedge else "primary")
+        finally:
+            await _cancel(pending)
+        if winner is not None:
+            if failed is not None:
+                await failed.aclose()
+            return winner
+        if failed is not None:
+            return failed
+        # Every request in the race failed; the retry loop backs off
+        raise error
+
+    async def _send(self, request: httpx.Request) -> Tuple[httpx.Response, float]:
+        """Send `request` and wait for the first chunk of the body."""
+        started = time.monotonic()
+        response = await self._transport.handle_async_request(request)
+        try:
+            chunks = response.stream.__aiter__()
+            try:
+                first = await chunks.__anext__()
+            except StopAsyncIteration:
+                first = b""
+        except BaseException:
+            await response.aclose()
+            raise
+        return httpx.Response(
+            status_code=response.status_code,
+            headers=response.headers,
+            stream=_PrefetchedStream(first, chunks, response.stream),
+            extensions=response.extensions,
+        ), time.monotonic() - started
+
+async def _cancel(tasks: Set[asyncio.Task]) -> None:
+    """Cancel the losing requests and close any response that got through anyway."""
+    for task in tasks:
+        task.cancel()
+    for result in await asyncio.gather(*tasks, return_exceptions=True):
+        if isinstance(result, tuple):
+            await result[0].aclose()
+
+def llm_timeout() -> httpx.Timeout:
+    return httpx.Timeout(connect=LLM_CONNECT_TIMEOUT, read=LLM_READ_TIMEOUT, write=LLM_READ_TIMEOUT, pool=LLM_CONNECT_TIMEOUT)
+
+@lru_cache(maxsize=None)
+def _pool() -> httpx.AsyncHTTPTransport:
+    """Keep-alive connection pool shared by every model client."""
+    return httpx.AsyncHTTPTransport(limits=httpx.Limits(
+        max_connections=LLM_POOL_MAX_CONNECTIONS,
+        max_keepalive_connections=LLM_POOL_MAX_KEEPALIVE,
+        keepalive_expiry=LLM_KEEPALIVE_EXPIRY,
+    ))
+
+@lru_cache(maxsize=None)
+def llm_http_client(name: str) -> httpx.AsyncClient:
+    """HTTP client for the model called `name`. All of them share one
+    connection pool; each keeps its own first-byte latencies for hedging."""
+    timeout = llm_timeout()
+    return httpx.AsyncClient(transport=HedgingTransport(_pool(), name, timeout), timeout=timeout)
@@ -1,12 +1,144 @@
-from langchain_anthropic import ChatAnthropic
-from ..settings import ANTHROPIC_API_KEY
-
-llm = ChatAnthropic(
-    model="claude-3-5-sonnet-20240620",
-    temperature=0,
-    max_tokens=1024,
-    timeout=None,
-    max_retries=2,
-    api_key=ANTHROPIC_API_KEY,
-    streaming=True,
-)
\ No newline at end of file
+from functools import lru_cache
+from typing import Any, Dict
+
+from ..settings import (
+    ANTHROPIC_API_KEY,
+    ASSESSMENT_MAX_TOKENS,
+    ASSESSMENT_MODEL,
+    FAKE_LLM_LATENCY,
+    FAKE_LLM_PREFILL_DELAY,
+    FAKE_LLM_SCRIPT,
+    FAKE_LLM_TOKEN_DELAY,
+    FAST_INPUT_PRICE,
+    FAST_MAX_TOKENS,
+    FAST_MODEL,
+    FAST_OUTPUT_PRICE,
+    LLM_PROVIDER,
+    LLM_TIMEOUT,
+    STRONG_INPUT_PRICE,
+    STRONG_MAX_TOKENS,
+    STRONG_MODEL,
+    STRONG_OUTPUT_PRICE,
+    SUMMARY_MODEL,
+)
+
+# Tutor models by route: "fast" for conversational turns, "strong" for turns
+# that need code assessed (see graph.route_turn)
+ROUTES = ("fast", "strong")
+# USD per million (input, output) tokens
+PRICES = {
+    "fast": (FAST_INPUT_PRICE, FAST_OUTPUT_PRICE),
+    "strong": (STRONG_INPUT_PRICE, STRONG_OUTPUT_PRICE),
+}
+# (model, max_tokens) per route for the Anthropic provider
+_ANTHROPIC_ROUTES = {
+    "fast": (FAST_MODEL, FAST_MAX_TOKENS),
+    "strong": (STRONG_MODEL, STRONG_MAX_TOKENS),
+}
+
+def prompt_cache_minimum(model: str) -> int:
+    """Shortest prompt prefix, in tokens, Anthropic will cache for `model`;
+    a `cache_control` breakpoint before that is silently ignored."""
+    return 2048 if "haiku" in model else 1024
+
+if LLM_PROVIDER not in ("anthropic", "fake"):
+    raise ValueError(f"Unknown LLM_PROVIDER: {LLM_PROVIDER!r}")
+
+# Models are created on first use: importing langchain_anthropic (and the
+# anthropic SDK) is the largest part of a cold start, and requests that
+# never reach the model shouldn't pay for it. Anthropic models share one
+# pooled HTTP client that owns deadlines, retries and hedging
+# (see http_client), so the SDK's own retries are off.
+
+@lru_cache(maxsize=None)
+def tutor_llm(route: str):
+    """The tutoring model for `route`, shared by every session."""
+    if LLM_PROVIDER == "fake":
+        from .fake_llm import FakeTutorModel
+
+        return FakeTutorModel(
+            latency=FAKE_LLM_LATENCY, token_delay=FAKE_LLM_TOKEN_DELAY, prefill_delay=FAKE_LLM_PREFILL_DELAY,
+            script=FAKE_LLM_SCRIPT, cache_min_tokens=prompt_cache_minimum(_ANTHROPIC_ROUTES[route][0]),
+        )
+
+    from .anthropic_model import PooledChatAnthropic
+
+    model, max_tokens = _ANTHROPIC_ROUTES[route]
+    return PooledChatAnthropic(
+        model=model,
+        temperature=0,
+        max_tokens=max_tokens,
+        timeout=LLM_TIMEOUT,
+        max_retries=0,
+        api_key=ANTHROPIC_API_KEY,
+        streaming=True,
+        http_client_name=f"tutor_{route}",
+    )
+
+@lru_cache(maxsize=None)
+def assessment_llm():
+    """Model that grades milestone code local checks couldn't decide."""
+    if LLM_PROVIDER == "fake":
+        from .fake_llm import FakeAssessmentModel
+
+        return FakeAssessmentModel(latency=FAKE_LLM_LATENCY, prefill_delay=FAKE_LLM_PREFILL_DELAY)
+
+    from .anthropic_model import PooledChatAnthropic
+
+    return PooledChatAnthropic(
+        model=ASSESSMENT_MODEL,
+        temperature=0,
+        max_tokens=ASSESSMENT_MAX_TOKENS,
+        timeout=LLM_TIMEOUT,
+        max_retries=0,
+        api_key=ANTHROPIC_API_KEY,
+        http_client_name="assessment",
+    )
+
+@lru_cache(maxsize=None)
+def summary_llm():
+    """Small, fast model for the rolling conversation summary."""
+    if LLM_PROVIDER == "fake":
+        from .fake_llm import FakeSummaryModel
+
+        return FakeSummaryModel(latency=FAKE_LLM_LATENCY)
+
+    from .anthropic_model import PooledChatAnthropic
+
+    return PooledChatAnthropic(
+        model=SUMMARY_MODEL,
+        temperature=0,
+        max_tokens=700,
+        timeout=LLM_TIMEOUT,
+        max_retries=0,
+        api_key=ANTHROPIC_API_KEY,
+        http_client_name="summary",
+    )
+
+def token_usage(message: Any, elapsed: float) -> Dict[str, Any]:
+    """Token counts for one model call, split by prompt cache outcome.
+
+    `input_tokens` is the full prompt size; `cache_read_input_tokens` of it
+    were served from the prompt cache and `cache_creation_input_tokens` were
+    written to it.
+    """
+    usage = getattr(message, "usage_metadata", None) or {}
+    details = usage.get("input_token_details") or {}
+    return {
+        "input_tokens": usage.get("input_tokens", 0),
+        "output_tokens": usage.get("output_tokens", 0),
+        "cache_read_input_tokens": details.get("cache_read") or 0,
+        "cache_creation_input_tokens": details.get("cache_creation") or 0,
+        "latency_ms": round(elapsed * 1000),
+    }
+
+def usage_cost(usage: Dict[str, Any], route: str) -> float:
+    """Estimated USD cost of one call on `route` from its `token_usage`."""
+    input_price, output_price = PRICES[route]
+    cached = usage["cache_read_input_tokens"] + usage["cache_creation_input_tokens"]
+    input_cost = input_price * (
+        usage["input_tokens"] - cached
+        + 0.1 * usage["cache_read_input_tokens"]
+        + 1.25 * usage["cache_creation_input_tokens"]
+    )
+    return (input_cost + output_price * usage["output_tokens"]) / 1_000_000
@@ -0,0 +1,129 @@
+import atexit
+import json
+import logging
+import queue
+import sys
+import time
+import uuid
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+
+from ..settings import LOG_FORMAT, LOG_LEVEL
+
+# Correlation ids attached to every record logged while handling a request
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+session_id_var: ContextVar[Optional[str]] = ContextVar("session_id", default=None)
+
+_RESERVED = set(logging.makeLogRecord({}).__dict__) | {"message", "asctime"}
+
+class _ContextFilter(logging.Filter):
+    """Stamp records with the current request/session ids.
+
+    Runs in the caller's context (before the record crosses the queue), which
+    is the only place the context variables hold the right values.
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        record.session_id = session_id_var.get()
+        return True
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED and value is not None:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s [%(request_id)s %(session_id)s] %(message)s")
+
+_listener: Optional[QueueListener] = None
+
+def configure_logging(level: str = LOG_LEVEL, fmt: str = LOG_FORMAT, stream=None) -> None:
+    """Route the `tutor` loggers through a queue to a background writer thread.
+
+    Request handlers only pay for enqueueing a record; formatting and the
+    blocking write to stdout happen on the listener thread, off the event loop.
+    """
+    global _listener
+    if _listener:
+        _listener.stop()
+
+    handler = logging.StreamHandler(stream or sys.stdout)
+    handler.setFormatter(JsonFormatter() if fmt == "json" else TextFormatter())
+
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    queue_handler = QueueHandler(log_queue)
+    queue_handler.addFilter(_ContextFilter())
+
+    root = logging.getLogger("tutor")
+    root.handlers = [queue_handler]
+    root.setLevel(level)
+    root.propagate = False
+
+    _listener = QueueListener(log_queue, handler, respect_handler_level=False)
+    _listener.start()
+
+def shutdown_logging() -> None:
+    """Flush queued records; registered to run at interpreter exit."""
+    global _listener
+    if _listener:
+        _listener.stop()
+        _listener = None
+
+def get_logger(name: str) -> logging.Logger:
+    return logging.getLogger(f"tutor.{name}")
+
+def new_request_id() -> str:
+    return uuid.uuid4().hex[:12]
+
+class RequestContextMiddleware:
+    """ASGI middleware that gives each HTTP request a correlation id.
+
+    Honours an incoming `x-request-id` header, echoes the id back on the
+    response, and logs one access line with the route and latency.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.logger = get_logger("http")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        incoming = dict(scope.get("headers") or []).get(b"x-request-id")
+        request_id = incoming.decode("latin-1") if incoming else new_request_id()
+        token = request_id_var.set(request_id)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message.setdefault("headers", []).append((b"x-request-id", request_id.encode("latin-1")))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            self.logger.info(
+                "%s %s %s", scope["method"], scope["path"], status,
+                extra={"status": status, "duration_ms": round((time.perf_counter() - started) * 1000, 1)},
+            )
+            request_id_var.reset(token)
+
+configure_logging()
+atexit.register(shutdown_logging)
@@ -0,0 +1,226 @@
+import bisect
+import time
+from typing import Callable, Dict, Iterable, List, Tuple
+
+from .state import session_store
+
+# Minimal Prometheus text-format registry. Every metric is only touched from
+# the event loop, so plain dict updates are enough; scraping renders a
+# snapshot of the current values.
+
+LabelValues = Tuple[str, ...]
+
+# Buckets in seconds, spanning fast cache/parse paths up to slow LLM turns
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(names: Iterable[str], values: Iterable[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _number(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}", *self.samples()]
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> List[str]:
+        return [f"{self.name}{_labels(self.labelnames, key)} {_number(value)}" for key, value in self._values.items()]
+
+class Gauge(_Metric):
+    """A gauge whose value is read from `function` at scrape time."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, function: Callable[[], float]):
+        super().__init__(name, documentation)
+        self.function = function
+
+    def samples(self) -> List[str]:
+        return [f"{self.name} {_number(self.function())}"]
+
+class FunctionCounter(Gauge):
+    """A counter whose running total is read from `function` at scrape time,
+    for counts another object already keeps."""
+
+    kind = "counter"
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+        # Per label set: non-cumulative bucket counts (last slot is +Inf), sum
+        self._values: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        counts, total = self._values.setdefault(key, ([0] * (len(self.buckets) + 1), [0.0]))
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        total[0] += value
+
+    def count(self, **labels: str) -> int:
+        entry = self._values.get(self._key(labels))
+        return sum(entry[0]) if entry else 0
+
+    def samples(self) -> List[str]:
+        lines = []
+        for key, (counts, total) in self._values.items():
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += count
+                le = 'le="+Inf"' if bound == "+Inf" else f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_number(round(total[0], 6))}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, function: Callable[[], float]) -> Gauge:
+        return self.register(Gauge(name, documentation, function))
+
+    def function_counter(self, name: str, documentation: str, function: Callable[[], float]) -> FunctionCounter:
+        return self.register(FunctionCounter(name, documentation, function))
+
+    def histogram(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (), buckets=LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+registry = Registry()
+
+REQUEST_LATENCY = registry.histogram(
+    "tutor_http_request_duration_seconds", "HTTP request latency by route, including streamed bodies.",
+    ("method", "route", "status"),
+)
+LLM_LATENCY = registry.histogram("tutor_llm_request_duration_seconds", "Duration of tutoring LLM calls by model route.", ("route",))
+LLM_TTFT = registry.histogram(
+    "tutor_llm_time_to_first_token_seconds", "Time until the LLM streamed its first token, by model route.", ("route",),
+)
+LLM_TOKENS = registry.counter(
+    "tutor_llm_tokens_total",
+    "Tokens reported in Anthropic usage metadata by model route. type is input, output, cache_read or cache_creation.",
+    ("route", "type"),
+)
+LLM_COST = registry.counter("tutor_llm_cost_dollars_total", "Estimated spend on tutoring LLM calls by model route.", ("route",))
+TURNS_ROUTED = registry.counter(
+    "tutor_turns_routed_total", "Turns by the model route chosen and the heuristic that chose it.", ("route", "reason"),
+)
+PARSER_FAILURES = registry.counter("tutor_parser_failures_total", "LLM replies that could not be parsed as a tutoring response.")
+PARSER_OUTCOMES = registry.counter(
+    "tutor_parser_replies_total", "Parsed LLM replies by outcome: clean, repaired or failed.", ("outcome",),
+)
+PARSER_REPAIRS = registry.counter(
+    "tutor_parser_repairs_total", "Fixes the tolerant parser applied to LLM replies, by kind.", ("repair",),
+)
+MILESTONE_COMPLETIONS = registry.counter(
+    "tutor_milestone_completions_total", "Milestones approved by the completion guard.", ("curriculum", "milestone"),
+)
+TURNS_COALESCED = registry.counter(
+    "tutor_turns_coalesced_total", "Duplicate in-flight turns answered from another request's LLM call.",
+)
+TURNS_SERIALIZED = registry.counter(
+    "tutor_turns_serialized_total", "Turns that waited for an earlier turn on the same session to finish.",
+)
+SESSIONS = registry.gauge("tutor_sessions", "Sessions held in this worker's session store.", lambda: session_store.stats()["sessions"])
+SESSION_STORE_BYTES = registry.gauge(
+    "tutor_session_store_bytes", "Approximate size of the session store.", lambda: session_store.stats()["bytes"],
+)
+for _stat, _documentation in (
+    ("hits", "Session store lookups that found the session."),
+    ("misses", "Session store lookups that found nothing, including expired sessions."),
+    ("evictions", "Sessions dropped from the session store to stay under its count and byte bounds."),
+    ("expirations", "Sessions dropped from the session store after SESSION_IDLE_TTL_SECONDS idle."),
+):
+    registry.function_counter(
+        f"tutor_session_store_{_stat}_total", _documentation, lambda stat=_stat: session_store.stats()[stat],
+    )
+
+def record_token_usage(usage: Dict[str, int], route: str) -> None:
+    """Add one call's `llm.token_usage` counts to the token counters."""
+    LLM_TOKENS.inc(usage["input_tokens"], route=route, type="input")
+    LLM_TOKENS.inc(usage["output_tokens"], route=route, type="output")
+    LLM_TOKENS.inc(usage["cache_read_input_tokens"], route=route, type="cache_read")
+    LLM_TOKENS.inc(usage["cache_creation_input_tokens"], route=route, type="cache_creation")
+
+class MetricsMiddleware:
+    """ASGI middleware that records request latency per route template.
+
+    The route is read after the app ran, once routing has put it in the
+    scope. Paths that didn't match a route share one label so scanners can't
+    blow up the series count.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            REQUEST_LATENCY.observe(
+                time.perf_counter() - started,
+                method=scope["method"], route=getattr(route, "path", "unmatched"), status=str(status),
+            )
@@ -1,5 +1,8 @@
+import json
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
 from pydantic import BaseModel, Field
-from langchain_core.output_parsers import JsonOutputParser
 
 class TutoringResponse(BaseModel):
     message: str = Field(
@@ -12,4 +15,251 @@ class TutoringResponse(BaseModel):
         description="Brief assessment of their progress or what's missing"
     )
 
-tutoring_parser = JsonOutputParser(pydantic_object=TutoringResponse)
\ No newline at end of file
+_MESSAGE_KEY = re.compile(r'"message"\s*:\s*"')
+_STRING_FIELD = r'"{}"\s*:\s*"((?:[^"\\]|\\.)*)"'
+_STRICT = json.JSONDecoder()
+# Accepts raw control characters (e.g. real newlines) inside strings
+_LENIENT = json.JSONDecoder(strict=False)
+_SIMPLE_ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+
+class MessageFieldExtractor:
+    """Incrementally decode the "message" field of a streamed TutoringResponse.
+
+    Feed raw model output as it arrives; each call returns only the newly
+    decoded characters of the message string so they can be forwarded to the
+    client before the JSON object is complete. The other fields are left to
+    the regular parser once the full output is available.
+    """
+
+    def __init__(self):
+        self._pending = ""
+        self._in_message = False
+        self.done = False
+
+    def feed(self, text: str) -> str:
+        if self.done or not text:
+            return ""
+        self._pending += text
+
+        if not self._in_message:
+            match = _MESSAGE_KEY.search(self._pending)
+            if not match:
+                return ""
+            self._pending = self._pending[match.end():]
+            self._in_message = True
+
+        return self._decode()
+
+    def _decode(self) -> str:
+        out = []
+        text = self._pending
+        i = 0
+        while i < len(text):
+            char = text[i]
+            if char == '"':
+                closes = self._closes_string(text, i)
+                if closes is None:
+                    # Can't tell yet whether this quote ends the message
+                    break
+                if closes:
+                    self.done = True
+                    i = len(text)
+                    break
+                # A stray unescaped quote inside the message
+                out.append(char)
+                i += 1
+                continue
+            if char != '\\':
+                out.append(char)
+                i += 1
+                continue
+
+            # Escape sequence: wait for the rest of it if it was split across chunks
+            if i + 1 >= len(text):
+                break
+            code = text[i + 1]
+            if code in _SIMPLE_ESCAPES:
+                out.append(_SIMPLE_ESCAPES[code])
+                i += 2
+            elif code == 'u':
+                if i + 6 > len(text):
+                    break
+                try:
+                    codepoint = int(text[i + 2:i + 6], 16)
+                except ValueError:
+                    out.append(text[i:i + 6])
+                    i += 6
+                    continue
+                if 0xD800 <= codepoint < 0xDC00:
+                    # High surrogate: needs its low half before it can be decoded
+                    if i + 12 > len(text):
+                        break
+                    try:
+                        out.append(json.loads(f'"{text[i:i + 12]}"'))
+                    except ValueError:
+                        out.append('�')
+                    i += 12
+                else:
+                    out.append(chr(codepoint))
+                    i += 6
+            else:
+                out.append(code)
+                i += 2
+
+        self._pending = text[i:]
+        return "".join(out)
+
+    @staticmethod
+    def _closes_string(text: str, i: int) -> Optional[bool]:
+        """Whether the quote at `i` ends the message: it must be followed by
+        the end of the object or a comma and the next key. None until enough
+        of the text has arrived to tell."""
+        rest = text[i + 1:].lstrip()
+        if not rest:
+            return None
+        if rest[0] == '}':
+            return True
+        if rest[0] != ',':
+            return False
+        rest = rest[1:].lstrip()
+        if not rest:
+            return None
+        return rest[0] == '"'
+
+    def finish(self) -> bool:
+        """Settle a closing quote held back at the end of the output; True
+        if the message string was terminated."""
+        if not self.done and self._in_message and self._pending.strip().rstrip(',').rstrip() == '"':
+            self.done = True
+            self._pending = ""
+        return self.done
+
+
+class TutoringOutputParser:
+    """Tolerant parser for one streamed TutoringResponse.
+
+    `feed` the model output as it arrives; like `MessageFieldExtractor` it
+    returns the newly decoded characters of the message. `finish` then
+    returns the validated response as a dict. Rather than failing the turn,
+    it repairs what it can and records each fix in `repairs`:
+
+    - ``wrapped``: code fences or prose before the object
+    - ``trailing_text``: anything after the object
+    - ``control_characters``: raw newlines or tabs inside strings
+    - ``malformed``: the object doesn't decode (stray quotes, truncation);
+      the fields are recovered by scanning instead
+    - ``truncated``: the message string was cut off
+    - ``missing_fields``: milestone_completed or feedback absent, defaulted
+      to "none" and ""
+    - ``prose``: no JSON at all; the whole reply is the message
+
+    Only output with no recoverable message raises OutputParserException.
+    """
+
+    def __init__(self):
+        self._chunks: List[str] = []
+        self._message: List[str] = []
+        self._extractor = MessageFieldExtractor()
+        self.repairs: List[str] = []
+
+    def feed(self, text: str) -> str:
+        self._chunks.append(text)
+        decoded = self._extractor.feed(text)
+        if decoded:
+            self._message.append(decoded)
+        return decoded
+
+    def parse(self, text: str) -> Dict[str, str]:
+        """Parse a complete reply in one go."""
+        self.feed(text)
+        return self.finish()
+
+    def finish(self) -> Dict[str, str]:
+        text = "".join(self._chunks)
+        fields = self._decode_object(text)
+        if fields is None:
+            fields = self._scan_fields(text)
+
+        message = fields.get("message")
+        if not isinstance(message, str) or not message.strip():
+            # Imported here so the API can load this module without LangChain
+            from langchain_core.exceptions import OutputParserException
+
+            raise OutputParserException("No tutor message found in the model output", llm_output=text)
+
+        milestone = fields.get("milestone_completed")
+        feedback = fields.get("feedback")
+        if not isinstance(milestone, str) or not milestone.strip() or not isinstance(feedback, str):
+            self._repair("missing_fields")
+        return TutoringResponse(
+            message=message,
+            milestone_completed=milestone.strip() if isinstance(milestone, str) and milestone.strip() else "none",
+            feedback=feedback if isinstance(feedback, str) else "",
+        ).model_dump()
+
+    def _repair(self, kind: str) -> None:
+        if kind not in self.repairs:
+            self.repairs.append(kind)
+
+    def _decode_object(self, text: str) -> Optional[Dict[str, Any]]:
+        start = text.find("{")
+        if start < 0:
+            return None
+        if text[:start].strip():
+            self._repair("wrapped")
+        try:
+            value, end = _STRICT.raw_decode(text, start)
+        except ValueError:
+            try:
+                value, end = _LENIENT.raw_decode(text, start)
+            except ValueError:
+                return None
+            self._repair("control_characters")
+        if not isinstance(value, dict):
+            return None
+        if text[end:].strip().strip("`").strip():
+            self._repair("trailing_text")
+        return value
+
+    def _scan_fields(self, text: str) -> Dict[str, Any]:
+        if not self._extractor._in_message:
+            if "{" not in text and text.strip():
+                self._repair("prose")
+                return {"message": text.strip()}
+            return {}
+
+        self._repair("malformed")
+        if not self._extractor.finish():
+            self._repair("truncated")
+        fields: Dict[str, Any] = {"message": "".join(self._message)}
+        for key in ("milestone_completed", "feedback"):
+            match = re.search(_STRING_FIELD.format(key), text)
+            if match:
+                try:
+                    fields[key] = _LENIENT.decode(f'"{match.group(1)}"')
+                except ValueError:
+                    fields[key] = match.group(1)
+        return fields
+
+def parse_verdict(text: str, milestone_id: str) -> Tuple[str, str]:
+    """Milestone verdict and feedback from an assessment model reply.
+
+    Anything other than a clear verdict for `milestone_id` (unparseable
+    output, another milestone's id) counts as not completed.
+    """
+    fields: Dict[str, Any] = {}
+    start = text.find("{")
+    if start >= 0:
+        try:
+            value, _ = _LENIENT.raw_decode(text, start)
+            if isinstance(value, dict):
+                fields = value
+        except ValueError:
+            pass
+    if not fields:
+        for key in ("milestone_completed", "feedback"):
+            match = re.search(_STRING_FIELD.format(key), text)
+            if match:
+                fields[key] = match.group(1)
+    verdict = milestone_id if fields.get("milestone_completed") == milestone_id else "none"
+    return verdict, str(fields.get("feedback") or "")
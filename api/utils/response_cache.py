@@ -0,0 +1,116 @@
+import hashlib
+import json
+import re
+import sys
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional
+
+from ..settings import RESPONSE_CACHE_MAX_BYTES, RESPONSE_CACHE_MAX_ENTRIES, RESPONSE_CACHE_TTL_SECONDS
+from .metrics import registry
+
+RESPONSE_CACHE_LOOKUPS = registry.counter(
+    "tutor_response_cache_lookups_total", "Response cache lookups for turns without code, by outcome: hit or miss.",
+    ("outcome",),
+)
+RESPONSE_CACHE_SAVED_SECONDS = registry.counter(
+    "tutor_response_cache_saved_seconds_total", "Model latency avoided by serving cached replies.",
+)
+
+_PUNCTUATION = re.compile(r"[?!.,;:'\"`]+")
+
+def normalize_input(text: str) -> str:
+    """Case, punctuation and whitespace-insensitive form of a student message."""
+    return " ".join(_PUNCTUATION.sub(" ", text.lower()).split())
+
+def response_key(curriculum_id: str, milestone_id: Optional[str], completed: Iterable[str], message: str,
+                 history: List[Dict[str, str]], context: str = "") -> str:
+    """Cache key for a turn.
+
+    `history` is the recent conversation before `message`; `context` is
+    anything else in the prompt that varies per session (background,
+    summary). Both are hashed so only turns with the same lead-up share a
+    reply.
+    """
+    recent = hashlib.sha256(json.dumps(
+        [context, [[m["role"], normalize_input(m["content"])] for m in history]]
+    ).encode("utf-8")).hexdigest()[:16]
+    return "\0".join((curriculum_id, milestone_id or "", ",".join(sorted(completed)), normalize_input(message), recent))
+
+class _Entry(NamedTuple):
+    response: Dict[str, str]
+    latency: float
+    size: int
+    stored_at: float
+
+class ResponseCache:
+    """LRU cache of tutor replies with a TTL and entry and byte bounds.
+
+    Only used for turns without student code: those can't complete a
+    milestone, so a cached reply never stands in for an assessment.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = RESPONSE_CACHE_MAX_ENTRIES,
+        ttl_seconds: float = RESPONSE_CACHE_TTL_SECONDS,
+        max_bytes: int = RESPONSE_CACHE_MAX_BYTES,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._clock = clock
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self.total_bytes = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[Dict[str, str]]:
+        """The cached reply for `key`, counting the lookup."""
+        entry = self._entries.get(key)
+        if entry and self._clock() - entry.stored_at > self.ttl_seconds:
+            self._remove(key)
+            entry = None
+        if not entry:
+            RESPONSE_CACHE_LOOKUPS.inc(outcome="miss")
+            return None
+        self._entries.move_to_end(key)
+        RESPONSE_CACHE_LOOKUPS.inc(outcome="hit")
+        RESPONSE_CACHE_SAVED_SECONDS.inc(entry.latency)
+        return dict(entry.response)
+
+    def put(self, key: str, response: Dict[str, str], latency: float) -> None:
+        """Cache `response`, which took `latency` seconds to generate."""
+        if key in self._entries:
+            self._remove(key)
+        size = sys.getsizeof(key) + sum(sys.getsizeof(value) for value in response.values())
+        if size > self.max_bytes:
+            return
+        now = self._clock()
+        self._entries[key] = _Entry(dict(response), latency, size, now)
+        self.total_bytes += size
+        # Expired entries mostly sit at the cold end; drop those first
+        while self._entries:
+            oldest, entry = next(iter(self._entries.items()))
+            if now - entry.stored_at <= self.ttl_seconds:
+                break
+            self._remove(oldest)
+        while len(self._entries) > self.max_entries or self.total_bytes > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.total_bytes = 0
+
+    def _remove(self, key: str) -> None:
+        self.total_bytes -= self._entries.pop(key).size
+
+response_cache = ResponseCache()
+
+registry.gauge("tutor_response_cache_entries", "Replies held in the response cache.", lambda: len(response_cache))
@@ -1,5 +1,17 @@
-from typing import TypedDict, List, Dict, Optional, Any
+from collections import OrderedDict
+from typing import TypedDict, List, Dict, Optional, Any, Callable, NamedTuple
+import hashlib
+import json
+import sys
+import time
 import uuid
+import zlib
+
+from ..settings import SESSION_IDLE_TTL_SECONDS, SESSION_MAX_BYTES, SESSION_MAX_COUNT, SESSION_RECENT_MESSAGES
+from .curriculum import curriculum_registry
+from .log import get_logger
+
+logger = get_logger("state")
 
 class StudentState(TypedDict):
     background: str
@@ -9,28 +21,290 @@ class TutorState(TypedDict):
     current_milestone: Optional[str]
     student: StudentState
     messages: List[Dict[str, str]]  # Simple dict format instead of LangChain objects
-    curriculum: Dict[str, Any]
+    curriculum_id: str  # Key into curriculum_registry; curricula are shared, not copied per session
     milestones_completed: List[str]
     current_input: str
-
-# Session management
-sessions: Dict[str, TutorState] = {}
+    usage: Dict[str, Any]  # Token usage of the latest LLM call (see llm.token_usage)
+    summary: str  # Running summary of the messages trimmed from the front of `messages`
+    history_offset: int  # How many of the conversation's first messages were trimmed
+    code_blocks: List[str]  # Code the student has shared, run together by the milestone checks
+    route: str  # Model route picked for the current turn ("fast" or "strong")
+    # Scratch space of the parallel graph, emptied again by its join node
+    turn_assessment: Dict[str, Any]  # Assessment of the turn's code (assessment.Assessment fields)
+    turn_code_blocks: List[str]  # code_blocks including the turn's code
+    turn_reply: Dict[str, Any]  # Tutor message and its usage; empty if the reply failed
+    turn_verdict: Dict[str, Any]  # Milestone verdict, where it came from and the assessment call's usage
 
 def create_session() -> str:
     """Create a new session and return session_id"""
     session_id = str(uuid.uuid4())
     return session_id
 
-def get_session(session_id: str) -> Optional[TutorState]:
-    """Get session state by ID"""
-    state = sessions.get(session_id)
-    if state:
-        print(f"[STATE MGMT] Retrieved session {session_id}: {len(state.get('messages', []))} messages, milestone {state.get('current_milestone')}", flush=True)
-    else:
-        print(f"[STATE MGMT] Session {session_id} not found", flush=True)
-    return state
-
-def update_session(session_id: str, state: TutorState) -> None:
-    """Update session state"""
-    print(f"[STATE MGMT] Updating session {session_id}: {len(state.get('messages', []))} messages, milestone {state.get('current_milestone')}", flush=True)
-    sessions[session_id] = state
\ No newline at end of file
+def thread_config(session_id: str) -> Dict[str, Any]:
+    """Graph config that keys checkpoints by session id."""
+    return {"configurable": {"thread_id": session_id}}
+
+def transcript_length(state: TutorState) -> int:
+    """Number of messages in the session's conversation so far, including
+    those already folded into the summary."""
+    return state.get('history_offset', 0) + len(state.get('messages', []))
+
+def transcript_key(message_count: int, last_assistant_message: str) -> str:
+    """Digest identifying a conversation by its length and latest tutor reply.
+
+    Plain truncated SHA-256 of ``"<count>\\0<reply>"`` so browser clients can
+    compute the same value with SubtleCrypto for the delta protocol.
+    """
+    return hashlib.sha256(
+        f"{message_count}\0{last_assistant_message}".encode("utf-8")
+    ).hexdigest()[:32]
+
+def state_transcript_key(state: TutorState) -> Optional[str]:
+    """Transcript key of a stored session, if it ends with a tutor reply."""
+    messages = state.get('messages', [])
+    if not messages or messages[-1].get('role') != 'assistant':
+        return None
+    return transcript_key(transcript_length(state), messages[-1].get('content', ''))
+
+def _compress(value: Any) -> bytes:
+    return zlib.compress(json.dumps(value, separators=(",", ":")).encode("utf-8")) if value else b""
+
+def _decompress(blob: bytes, empty: Any) -> Any:
+    return json.loads(zlib.decompress(blob)) if blob else empty
+
+class CompactSession:
+    """Memory-lean form of a stored TutorState.
+
+    The curriculum id, student background and message roles are interned so
+    every session points at one shared copy. Milestone progress is a bitmask
+    over curriculum positions plus the current milestone's position (-1 for
+    none). Only the newest `SESSION_RECENT_MESSAGES` messages are kept as
+    strings; older ones and the student's code are zlib-compressed JSON.
+    `pack` and `unpack` convert from and to the TutorState dict the graph
+    works with.
+    """
+
+    __slots__ = (
+        "session_id", "curriculum_id", "background", "current", "completed", "current_input",
+        "usage", "summary", "history_offset", "route", "message_count", "recent", "archive", "code",
+    )
+
+    @classmethod
+    def pack(cls, state: TutorState) -> "CompactSession":
+        curriculum = curriculum_registry.get(state.get('curriculum_id'))
+        messages = state.get('messages', [])
+        split = max(0, len(messages) - SESSION_RECENT_MESSAGES)
+        current = state.get('current_milestone')
+
+        record = cls.__new__(cls)
+        record.session_id = state['session_id']
+        record.curriculum_id = sys.intern(curriculum.id)
+        record.background = sys.intern(state['student']['background'])
+        record.current = curriculum.positions[current] if current in curriculum.positions else -1
+        record.completed = sum(1 << curriculum.positions[m] for m in state.get('milestones_completed', []) if m in curriculum.positions)
+        record.current_input = state.get('current_input', "")
+        record.usage = json.dumps(state['usage'], separators=(",", ":")) if state.get('usage') else ""
+        record.summary = state.get('summary', "")
+        record.history_offset = state.get('history_offset', 0)
+        record.route = sys.intern(state.get('route') or "fast")
+        record.message_count = len(messages)
+        # Flat (role, content, role, content, ...) to avoid a tuple per message
+        record.recent = tuple(
+            value for m in messages[split:] for value in (sys.intern(m['role']), m['content'])
+        )
+        record.archive = _compress([[m['role'], m['content']] for m in messages[:split]])
+        record.code = _compress(state.get('code_blocks', []))
+        return record
+
+    def unpack(self) -> TutorState:
+        curriculum = curriculum_registry.get(self.curriculum_id)
+        ids = curriculum.milestone_ids
+        messages = [{"role": role, "content": content} for role, content in _decompress(self.archive, [])]
+        messages.extend(
+            {"role": self.recent[i], "content": self.recent[i + 1]} for i in range(0, len(self.recent), 2)
+        )
+        return {
+            'session_id': self.session_id,
+            'current_milestone': ids[self.current] if self.current >= 0 else None,
+            'student': {"background": self.background},
+            'messages': messages,
+            'curriculum_id': self.curriculum_id,
+            'milestones_completed': [mid for i, mid in enumerate(ids) if self.completed >> i & 1],
+            'current_input': self.current_input,
+            'usage': json.loads(self.usage) if self.usage else {},
+            'summary': self.summary,
+            'history_offset': self.history_offset,
+            'code_blocks': _decompress(self.code, []),
+            'route': self.route,
+        }
+
+    def nbytes(self) -> int:
+        """Approximate bytes held by this record alone; interned strings
+        shared between sessions are not counted."""
+        size = sys.getsizeof(self) + sys.getsizeof(self.recent)
+        size += sum(sys.getsizeof(content) for content in self.recent[1::2])
+        if not any(self.current_input is content for content in self.recent[1::2]):
+            size += sys.getsizeof(self.current_input)
+        for value in (self.session_id, self.usage, self.summary, self.archive, self.code):
+            size += sys.getsizeof(value)
+        return size
+
+class _Entry(NamedTuple):
+    record: CompactSession
+    size: int
+    last_access: float
+    transcript_key: Optional[str]
+
+class SessionStore:
+    """Bounded in-memory session cache.
+
+    Sessions are kept in least-recently-used order. Writes evict from the cold
+    end until the store is back under `max_sessions` and `max_bytes`, and any
+    session idle for longer than `ttl_seconds` is treated as gone. States
+    are held as `CompactSession` records and `get` unpacks a fresh dict, so
+    changes only stick once they are `put` back.
+
+    Requests that arrive without a session id are resolved through two
+    secondary structures kept in step with every write: a transcript index
+    (see `transcript_key`) for conversations already in progress, and the
+    queue of created-but-unused sessions for conversations just starting.
+    """
+
+    def __init__(
+        self,
+        max_sessions: int = SESSION_MAX_COUNT,
+        ttl_seconds: float = SESSION_IDLE_TTL_SECONDS,
+        max_bytes: int = SESSION_MAX_BYTES,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._clock = clock
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._transcript_index: Dict[str, set] = {}
+        self._unclaimed: "OrderedDict[str, None]" = OrderedDict()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self._entries
+
+    def get(self, session_id: str) -> Optional[TutorState]:
+        """Get session state by ID, refreshing its recency."""
+        entry = self._entries.get(session_id)
+        now = self._clock()
+        if entry and now - entry.last_access > self.ttl_seconds:
+            self._remove(session_id)
+            self.expirations += 1
+            entry = None
+
+        if not entry:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self._entries[session_id] = entry._replace(last_access=now)
+        self._entries.move_to_end(session_id)
+        return entry.record.unpack()
+
+    def put(self, session_id: str, state: TutorState, claimable: bool = False) -> None:
+        """Store session state and evict whatever no longer fits.
+
+        `claimable` marks a freshly created session that an id-less request
+        starting a new conversation may take over (see `claim_unused_session`).
+        """
+        if session_id in self._entries:
+            self._remove(session_id)
+        record = CompactSession.pack(state)
+        size = record.nbytes()
+        key = state_transcript_key(state)
+        self._entries[session_id] = _Entry(record, size, self._clock(), key)
+        self.total_bytes += size
+        if key:
+            self._transcript_index.setdefault(key, set()).add(session_id)
+        if claimable:
+            self._unclaimed[session_id] = None
+        self._evict(keep=session_id)
+
+    def delete(self, session_id: str) -> None:
+        if session_id in self._entries:
+            self._remove(session_id)
+
+    def claim_unused_session(self) -> Optional[str]:
+        """Hand out the oldest session that has not had a turn yet, at most once.
+
+        Claiming removes it from the queue, so concurrent id-less requests
+        that start new conversations never end up sharing a session.
+        """
+        while self._unclaimed:
+            session_id, _ = self._unclaimed.popitem(last=False)
+            entry = self._entries.get(session_id)
+            if entry and not entry.record.message_count and self._clock() - entry.last_access <= self.ttl_seconds:
+                return session_id
+        return None
+
+    def stored_transcript_key(self, session_id: str) -> Optional[str]:
+        """Transcript key of the stored session, without unpacking it; None
+        if it isn't stored or doesn't end with a tutor reply."""
+        entry = self._entries.get(session_id)
+        return entry.transcript_key if entry else None
+
+    def find_by_transcript(self, message_count: int, last_assistant_message: str) -> Optional[str]:
+        """Find the session whose stored history matches the client's transcript.
+
+        Returns None when several sessions share the same transcript (e.g.
+        identical opening exchanges), since guessing would mix up students.
+        """
+        matches = self._transcript_index.get(transcript_key(message_count, last_assistant_message))
+        if not matches or len(matches) != 1:
+            return None
+        return next(iter(matches))
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "sessions": len(self._entries),
+            "bytes": self.total_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+    def _remove(self, session_id: str) -> None:
+        entry = self._entries.pop(session_id)
+        self.total_bytes -= entry.size
+        self._unclaimed.pop(session_id, None)
+        if entry.transcript_key:
+            matches = self._transcript_index[entry.transcript_key]
+            matches.discard(session_id)
+            if not matches:
+                del self._transcript_index[entry.transcript_key]
+
+    def _evict(self, keep: str) -> None:
+        now = self._clock()
+        # Idle sessions sit at the cold end, so expiry stops at the first live one
+        while self._entries:
+            session_id, entry = next(iter(self._entries.items()))
+            if session_id == keep or now - entry.last_access <= self.ttl_seconds:
+                break
+            self._remove(session_id)
+            self.expirations += 1
+
+        while len(self._entries) > 1 and (
+            len(self._entries) > self.max_sessions or self.total_bytes > self.max_bytes
+        ):
+            session_id = next(iter(self._entries))
+            if session_id == keep:
+                break
+            self._remove(session_id)
+            self.evictions += 1
+            logger.debug("Evicted session %s (%d sessions, %d bytes)", session_id, len(self._entries), self.total_bytes)
+
+session_store = SessionStore()
@@ -0,0 +1,73 @@
+import json
+import time
+from typing import Any, Optional
+
+from ..settings import STREAM_MAX_CHUNK_DELAY, STREAM_MIN_CHUNK_CHARS
+
+class ChunkBatcher:
+    """Group small token deltas into fewer, larger text chunks.
+
+    A batch is released once it holds at least ``min_chars`` characters or
+    ``max_delay`` seconds have passed since the previous release, so the
+    client still sees steady progress when the model is slow.
+    """
+
+    def __init__(self, min_chars: int = STREAM_MIN_CHUNK_CHARS, max_delay: float = STREAM_MAX_CHUNK_DELAY):
+        self.min_chars = min_chars
+        self.max_delay = max_delay
+        self._parts: list[str] = []
+        self._size = 0
+        self._last_flush = time.monotonic()
+
+    def add(self, text: str) -> Optional[str]:
+        if text:
+            self._parts.append(text)
+            self._size += len(text)
+        if self._size >= self.min_chars or (self._size and time.monotonic() - self._last_flush >= self.max_delay):
+            return self.flush()
+        return None
+
+    def flush(self) -> Optional[str]:
+        if not self._parts:
+            return None
+        batch = "".join(self._parts)
+        self._parts = []
+        self._size = 0
+        self._last_flush = time.monotonic()
+        return batch
+
+def message_text(message: Any) -> str:
+    """Text of a message or streamed chunk (plain string or content blocks)."""
+    content = getattr(message, "content", message)
+    if isinstance(content, str):
+        return content
+    return "".join(
+        block.get("text", "") for block in content
+        if isinstance(block, dict) and block.get("type") in ("text", "text_delta")
+    )
+
+def text_part(text: str) -> str:
+    """Format a text delta as a Vercel AI SDK data stream part."""
+    return f'0:{json.dumps(text)}\n'
+
+def data_part(value: Any) -> str:
+    """Format a value as a Vercel AI SDK data part (``useChat``'s `data`)."""
+    return f'2:{json.dumps([value])}\n'
+
+def annotation_part(value: Any) -> str:
+    """Format a value as an annotation on the assistant message being streamed."""
+    return f'8:{json.dumps([value])}\n'
+
+def unstreamed_remainder(streamed: str, final: str) -> str:
+    """Text the client still needs after `streamed` so it ends up seeing `final`.
+
+    The graph may decorate or replace the model's message after it was
+    streamed (e.g. the final celebration or the error fallback). Since
+    streamed text can't be taken back, anything not already sent is appended.
+    """
+    if not streamed:
+        return final
+    if final.startswith(streamed):
+        return final[len(streamed):]
+    extra = final.replace(streamed, "", 1).strip() if streamed in final else final
+    return f"\n\n{extra}" if extra else ""
@@ -0,0 +1,82 @@
+import asyncio
+from contextlib import asynccontextmanager
+from functools import partial
+from typing import Any, Awaitable, Dict, Hashable, Optional
+
+from .log import get_logger
+from .metrics import TURNS_COALESCED, TURNS_SERIALIZED
+
+logger = get_logger("turns")
+
+class TurnCoordinator:
+    """Keeps concurrent turns on one session from racing each other.
+
+    `session_lock` runs turns on the same session one at a time, so a turn
+    always starts from the state the previous one stored and a milestone
+    completion can't be overwritten by a concurrent stale turn.
+
+    `join`/`start` coalesce identical in-flight turns (a double submit or a
+    frontend retry): the first request starts the turn, duplicates wait for
+    its result instead of making their own LLM call. The turn runs as a task
+    of its own, so it finishes and is stored even if the request that
+    started it goes away.
+    """
+
+    def __init__(self):
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._waiters: Dict[str, int] = {}
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+
+    @asynccontextmanager
+    async def session_lock(self, session_id: str):
+        lock = self._locks.get(session_id)
+        if lock is None:
+            lock = self._locks[session_id] = asyncio.Lock()
+        if lock.locked():
+            TURNS_SERIALIZED.inc()
+        self._waiters[session_id] = self._waiters.get(session_id, 0) + 1
+        try:
+            async with lock:
+                yield
+        finally:
+            # Drop the lock once nobody holds or waits for it, so idle
+            # sessions don't accumulate locks
+            self._waiters[session_id] -= 1
+            if not self._waiters[session_id]:
+                del self._waiters[session_id]
+                del self._locks[session_id]
+
+    def join(self, key: Hashable) -> Optional[asyncio.Task]:
+        """The task of an identical turn already in flight, if any."""
+        pending = self._inflight.get(key)
+        if pending is not None:
+            TURNS_COALESCED.inc()
+            logger.info("Coalesced duplicate turn with the one in flight")
+        return pending
+
+    def start(self, key: Hashable, turn: Awaitable[Any]) -> asyncio.Task:
+        """Run `turn` as the in-flight turn for `key`, detached from the caller.
+
+        The caller and any duplicates `wait` on the returned task; none of
+        them can cancel it.
+        """
+        task = asyncio.ensure_future(turn)
+        self._inflight[key] = task
+        task.add_done_callback(partial(self._finished, key))
+        return task
+
+    def _finished(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Mark a failure as retrieved even when nobody was left waiting
+        if not task.cancelled():
+            task.exception()
+
+    async def wait(self, pending: asyncio.Task) -> Any:
+        # Shielded so a disconnecting request doesn't cancel the turn
+        return await asyncio.shield(pending)
+
+    def __len__(self) -> int:
+        return len(self._inflight)
+
+turn_coordinator = TurnCoordinator()
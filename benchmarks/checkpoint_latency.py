@@ -0,0 +1,111 @@
+"""Measure per-turn checkpoint overhead of the SQLite checkpointer.
+
+Plays scripted turns for a set of sessions through the graph with an instant
+stub LLM, once without a checkpointer and once with ``SQLiteCheckpointer``,
+and reports:
+
+- added graph latency per turn (the buffered checkpoint writes)
+- batch commit time on the flusher thread
+- cold read latency, i.e. restoring a session the way another worker would
+
+    python -m benchmarks.checkpoint_latency --sessions 50 --turns 20
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("ANTHROPIC_API_KEY", "offline-benchmark")
+# History summaries go to the offline summary model; the tutor chains are stubbed below
+os.environ.setdefault("LLM_PROVIDER", "fake")
+os.environ.setdefault("FAKE_LLM_LATENCY", "0")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+from api.index import initialize_session
+from api.utils import graph as graph_module
+from api.utils.checkpoint import SQLiteCheckpointer, thread_config
+from api.utils.llm import ROUTES
+
+from .concurrency import build_stub_chain
+
+
+def percentile(values, pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def describe(name: str, samples_ms) -> None:
+    print(f"{name:<28} p50 {percentile(samples_ms, 50):7.3f} ms   "
+          f"p95 {percentile(samples_ms, 95):7.3f} ms   mean {statistics.fmean(samples_ms):7.3f} ms")
+
+
+async def play(graph, sessions: int, turns: int, use_config: bool):
+    states = {f"bench-{i}": initialize_session(f"bench-{i}") for i in range(sessions)}
+    samples = []
+    for turn in range(turns):
+        for session_id, state in states.items():
+            state["current_input"] = f"Turn {turn}: here is my next attempt at the board"
+            config = thread_config(session_id) if use_config else None
+            start = time.perf_counter()
+            states[session_id] = await graph.ainvoke(state, config)
+            samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--turns", type=int, default=20)
+    args = parser.parse_args()
+
+    stub = build_stub_chain(latency=0)
+    graph_module.tutoring_chains = graph_module.chat_chains = {route: stub for route in ROUTES}
+
+    baseline = asyncio.run(play(graph_module.build_graph(), args.sessions, args.turns, use_config=False))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        checkpointer = SQLiteCheckpointer(os.path.join(tmp, "bench.sqlite"))
+        flushes = []
+        original_flush = checkpointer.flush
+
+        def timed_flush():
+            start = time.perf_counter()
+            rows = original_flush()
+            if rows:
+                flushes.append(((time.perf_counter() - start) * 1000, rows))
+            return rows
+
+        checkpointer.flush = timed_flush
+        persisted = asyncio.run(play(graph_module.build_graph(checkpointer), args.sessions, args.turns, use_config=True))
+        checkpointer.flush()
+
+        # Cold reads: a second connection with an empty buffer, like another worker
+        reader = SQLiteCheckpointer(checkpointer.path)
+        reads = []
+        for i in range(args.sessions):
+            start = time.perf_counter()
+            found = reader.get_tuple(thread_config(f"bench-{i}"))
+            reads.append((time.perf_counter() - start) * 1000)
+            assert found and found.checkpoint["channel_values"]["messages"]
+        size_kb = os.path.getsize(checkpointer.path) / 1024
+        reader.close()
+        checkpointer.close()
+
+    overhead = [p - b for p, b in zip(persisted, baseline)]
+    print(f"{args.sessions} sessions x {args.turns} turns")
+    describe("turn without checkpointer", baseline)
+    describe("turn with checkpointer", persisted)
+    describe("added write latency/turn", overhead)
+    describe("cold checkpoint read", reads)
+    if flushes:
+        describe("batch commit", [ms for ms, _ in flushes])
+        print(f"{len(flushes)} batches, {statistics.fmean(rows for _, rows in flushes):.1f} rows per batch, "
+              f"database {size_kb:.0f} KiB")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
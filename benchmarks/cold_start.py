@@ -0,0 +1,106 @@
+"""Measure serverless cold start: importing the app and its first responses.
+
+Each run is a fresh interpreter that imports ``api.index``, then serves
+``/api/new-session`` and one ``/api/chat/json`` turn in-process (offline
+fake model). Reports the median of --runs runs and fails if the import plus
+first /api/new-session takes longer than --budget seconds, or if that path
+loaded any of the modules that are meant to wait for the first turn.
+
+    python -m benchmarks.cold_start --runs 5 --budget 0.75
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+# Must not be imported before the first tutoring turn
+DEFERRED_MODULES = ("langgraph", "langchain_core", "langchain_anthropic", "anthropic", "langsmith")
+
+CHILD = """
+import json, sys, time
+started = time.perf_counter()
+import api.index
+imported = time.perf_counter()
+
+import asyncio
+import httpx
+
+async def main():
+    transport = httpx.ASGITransport(app=api.index.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://cold-start") as client:
+        before = time.perf_counter()
+        session = await client.post("/api/new-session")
+        new_session = time.perf_counter() - before
+        loaded = [m for m in DEFERRED if m in sys.modules]
+        before = time.perf_counter()
+        turn = await client.post("/api/chat/json", json={
+            "messages": [{"role": "user", "content": "Where do I start?"}],
+            "session_id": session.json()["session_id"],
+        })
+        first_turn = time.perf_counter() - before
+    return {"new_session": new_session, "first_turn": first_turn, "loaded": loaded,
+            "status": [session.status_code, turn.status_code]}
+
+result = asyncio.run(main())
+result["import"] = imported - started
+print(json.dumps(result))
+"""
+
+
+def run_once(env: dict) -> dict:
+    code = f"DEFERRED = {DEFERRED_MODULES!r}\n{CHILD}"
+    out = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget", type=float, default=0.75,
+                        help="max median seconds for import + first /api/new-session")
+    args = parser.parse_args()
+
+    env = {
+        **os.environ,
+        "LLM_PROVIDER": "fake",
+        "FAKE_LLM_LATENCY": "0",
+        "FAKE_LLM_TOKEN_DELAY": "0",
+        "LOG_LEVEL": "WARNING",
+        "PYTHONWARNINGS": "ignore",
+        "CHECKPOINT_DB_PATH": os.path.join(tempfile.mkdtemp(), "cold_start.sqlite"),
+    }
+    env.pop("WARM_UP_ON_STARTUP", None)
+    runs = [run_once(env) for _ in range(args.runs)]
+
+    def median(key: str) -> float:
+        return statistics.median(run[key] for run in runs)
+
+    cold = statistics.median(run["import"] + run["new_session"] for run in runs)
+    print(f"{args.runs} runs (median)")
+    print(f"import api.index          {median('import') * 1000:8.1f} ms")
+    print(f"first /api/new-session    {median('new_session') * 1000:8.1f} ms")
+    print(f"first /api/chat/json      {median('first_turn') * 1000:8.1f} ms  (loads the graph and models)")
+    print(f"cold start to new-session {cold * 1000:8.1f} ms  (budget {args.budget * 1000:.0f} ms)")
+
+    failed = False
+    loaded = sorted({m for run in runs for m in run["loaded"]})
+    if loaded:
+        print(f"FAIL: imported before the first turn: {', '.join(loaded)}")
+        failed = True
+    if any(status != 200 for run in runs for status in run["status"]):
+        print(f"FAIL: unexpected status codes {[run['status'] for run in runs]}")
+        failed = True
+    if cold > args.budget:
+        print("FAIL: cold start is over budget")
+        failed = True
+    if failed:
+        return 1
+    print("OK")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
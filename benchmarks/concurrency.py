@@ -0,0 +1,82 @@
+"""Check that concurrent tutoring turns overlap instead of queueing.
+
+Runs N sessions through the compiled graph at the same time against a stub
+LLM that sleeps for a fixed latency. With a non-blocking ``process_message``
+the whole batch finishes in roughly one call's latency; a blocking call would
+take N times that.
+
+    python -m benchmarks.concurrency --sessions 20 --latency 0.5
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+os.environ.setdefault("ANTHROPIC_API_KEY", "offline-benchmark")
+
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableLambda
+
+from api.index import initialize_session
+from api.utils import graph as graph_module
+from api.utils.llm import ROUTES
+from api.utils.prompt import unified_tutoring_prompt
+
+
+def build_stub_chain(latency: float):
+    """Prompt -> sleeping stub model, mirroring the real chain."""
+
+    async def stub_model(prompt_value) -> AIMessage:
+        await asyncio.sleep(latency)
+        return AIMessage(content=json.dumps({
+            "message": "What do you think the board should look like?",
+            "milestone_completed": "none",
+            "feedback": "Just getting started",
+        }))
+
+    return unified_tutoring_prompt | RunnableLambda(stub_model)
+
+
+async def run(sessions: int, latency: float) -> float:
+    stub = build_stub_chain(latency)
+    graph_module.tutoring_chains = graph_module.chat_chains = {route: stub for route in ROUTES}
+    graph = graph_module.build_graph()
+
+    states = []
+    for i in range(sessions):
+        state = initialize_session(f"bench-{i}")
+        state["current_input"] = "Hi, where do I start?"
+        states.append(state)
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(graph.ainvoke(state) for state in states))
+    elapsed = time.perf_counter() - start
+
+    assert all(result["messages"][-1]["role"] == "assistant" for result in results)
+    return elapsed
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--tolerance", type=float, default=2.0,
+                        help="fail if the batch takes longer than this many single-call latencies")
+    args = parser.parse_args()
+
+    elapsed = asyncio.run(run(args.sessions, args.latency))
+    serial = args.sessions * args.latency
+    print(f"{args.sessions} concurrent sessions, {args.latency:.2f}s per LLM call")
+    print(f"elapsed: {elapsed:.2f}s (serial would be {serial:.2f}s, speedup {serial / elapsed:.1f}x)")
+
+    if elapsed > args.latency * args.tolerance:
+        print("FAIL: turns did not overlap")
+        return 1
+    print("OK")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
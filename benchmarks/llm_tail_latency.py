@@ -0,0 +1,191 @@
+"""Compare model-call tail latency with and without the pooled hedging client.
+
+Starts a local fake Anthropic Messages API (uvicorn on 127.0.0.1) that
+streams replies after a short delay, but stalls --slow-rate of requests for
+--slow-delay seconds before responding and fails --error-rate of them with
+529/500. The same request sequence is then streamed through:
+
+- ``ChatAnthropic`` as it was configured before (SDK retries, own client)
+- ``PooledChatAnthropic`` (shared keep-alive pool, jittered retries, hedging)
+
+and time to first token, total time, failures and the number of TCP
+connections the server saw are reported for each. Fails if the pooled
+client's p99 time to first token isn't lower or any of its calls failed.
+
+    python -m benchmarks.llm_tail_latency --requests 400 --concurrency 16
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import statistics
+import sys
+import threading
+import time
+
+parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+parser.add_argument("--requests", type=int, default=400)
+parser.add_argument("--concurrency", type=int, default=16)
+parser.add_argument("--latency", type=float, default=0.05, help="typical seconds before the first token")
+parser.add_argument("--slow-rate", type=float, default=0.03)
+parser.add_argument("--slow-delay", type=float, default=3.0)
+parser.add_argument("--error-rate", type=float, default=0.02)
+parser.add_argument("--seed", type=int, default=1)
+args = parser.parse_args()
+
+os.environ.setdefault("ANTHROPIC_API_KEY", "offline-benchmark")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+os.environ.setdefault("LLM_RETRY_BASE_DELAY", "0.05")
+os.environ.setdefault("LLM_HEDGE_INITIAL_DELAY", str(args.latency * 4))
+os.environ.setdefault("LLM_HEDGE_MIN_DELAY", str(args.latency * 2))
+os.environ.setdefault("LLM_HEDGE_MAX_RATIO", str(min(1.0, (args.slow_rate + args.error_rate) * 3)))
+
+import uvicorn
+from langchain_anthropic import ChatAnthropic
+
+from api.utils.anthropic_model import PooledChatAnthropic
+
+TOKENS = "What do you think the board should look like before anyone moves ?".split()
+
+
+def sse(event: str, data: dict) -> bytes:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n".encode()
+
+
+class FakeAnthropic:
+    """ASGI app for POST /v1/messages that injects stalls and errors.
+
+    Each request draws its fate from a fixed sequence, so both clients face
+    the same stragglers and errors in the same order (a hedge or retry is a
+    new request and draws the next fate).
+    """
+
+    def __init__(self, seed: int):
+        self.seed = seed
+        self.reset()
+
+    def reset(self) -> None:
+        self._rng = random.Random(self.seed)
+        self.connections = set()
+        self.requests = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return
+        self.connections.add(scope["client"])
+        self.requests += 1
+        while (await receive()).get("more_body"):
+            pass
+        roll = self._rng.random()
+        delay = self._rng.uniform(0.5, 1.5) * args.latency
+        if roll < args.error_rate:
+            status = self._rng.choice([529, 500])
+            body = json.dumps({"type": "error", "error": {"type": "overloaded_error", "message": "Overloaded"}}).encode()
+            await send({"type": "http.response.start", "status": status,
+                        "headers": [(b"content-type", b"application/json")]})
+            await send({"type": "http.response.body", "body": body})
+            return
+        if roll < args.error_rate + args.slow_rate:
+            delay = args.slow_delay
+        await asyncio.sleep(delay)
+        await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"text/event-stream")]})
+        await send({"type": "http.response.body", "more_body": True, "body": sse("message_start", {
+            "type": "message_start",
+            "message": {"id": "msg_fake", "type": "message", "role": "assistant", "model": "fake", "content": [],
+                        "stop_reason": None, "stop_sequence": None, "usage": {"input_tokens": 100, "output_tokens": 1}},
+        }) + sse("content_block_start", {"type": "content_block_start", "index": 0,
+                                         "content_block": {"type": "text", "text": ""}})})
+        for token in TOKENS:
+            await send({"type": "http.response.body", "more_body": True, "body": sse("content_block_delta", {
+                "type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": token + " "},
+            })})
+            await asyncio.sleep(0.002)
+        await send({"type": "http.response.body", "body": (
+            sse("content_block_stop", {"type": "content_block_stop", "index": 0})
+            + sse("message_delta", {"type": "message_delta", "delta": {"stop_reason": "end_turn", "stop_sequence": None},
+                                    "usage": {"output_tokens": len(TOKENS)}})
+            + sse("message_stop", {"type": "message_stop"})
+        )})
+
+
+def serve(app: FakeAnthropic) -> str:
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    server = uvicorn.Server(uvicorn.Config(app, log_level="warning", timeout_keep_alive=60))
+    threading.Thread(target=server.run, kwargs={"sockets": [sock]}, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return f"http://127.0.0.1:{sock.getsockname()[1]}"
+
+
+async def run(model, requests: int, concurrency: int) -> dict:
+    limit = asyncio.Semaphore(concurrency)
+    ttft, total, failures = [], [], 0
+
+    async def one():
+        nonlocal failures
+        async with limit:
+            started = time.perf_counter()
+            first = None
+            try:
+                async for chunk in model.astream("Hi, where do I start?"):
+                    if first is None and chunk.content:
+                        first = time.perf_counter() - started
+            except Exception:
+                failures += 1
+                return
+            ttft.append(first)
+            total.append(time.perf_counter() - started)
+
+    await asyncio.gather(*(one() for _ in range(requests)))
+    return {"ttft": ttft, "total": total, "failures": failures}
+
+
+def percentile(values, p: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))] if ordered else float("nan")
+
+
+def main() -> int:
+    app = FakeAnthropic(args.seed)
+    base_url = serve(app)
+    common = dict(model="fake", temperature=0, max_tokens=256, api_key="offline-benchmark",
+                  anthropic_api_url=base_url, streaming=True, timeout=60)
+    clients = {
+        "ChatAnthropic": ChatAnthropic(max_retries=2, **common),
+        "PooledChatAnthropic": PooledChatAnthropic(max_retries=0, http_client_name="benchmark", **common),
+    }
+
+    results = {}
+    for name, model in clients.items():
+        app.reset()
+        results[name] = asyncio.run(run(model, args.requests, args.concurrency))
+        results[name]["connections"] = len(app.connections)
+        results[name]["server_requests"] = app.requests
+
+    print(f"{args.requests} calls, concurrency {args.concurrency}, {args.slow_rate:.0%} stalled {args.slow_delay}s, "
+          f"{args.error_rate:.0%} errors")
+    print(f"{'client':<22}{'ttft p50':>10}{'p95':>8}{'p99':>8}{'total p99':>11}{'failed':>8}{'sent':>6}{'conns':>7}")
+    for name, r in results.items():
+        print(f"{name:<22}{statistics.median(r['ttft']) * 1000:>8.0f}ms"
+              f"{percentile(r['ttft'], 95) * 1000:>6.0f}ms{percentile(r['ttft'], 99) * 1000:>6.0f}ms"
+              f"{percentile(r['total'], 99) * 1000:>9.0f}ms{r['failures']:>8}{r['server_requests']:>6}{r['connections']:>7}")
+
+    before, after = results["ChatAnthropic"], results["PooledChatAnthropic"]
+    failed = False
+    if after["failures"]:
+        print(f"FAIL: {after['failures']} calls failed through the pooled client")
+        failed = True
+    if percentile(after["ttft"], 99) >= percentile(before["ttft"], 99):
+        print("FAIL: hedging did not lower p99 time to first token")
+        failed = True
+    if failed:
+        return 1
+    print("OK")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,207 @@
+"""Load-test the chat API with simulated students, no network required.
+
+Starts the app in-process under uvicorn with the offline fake model
+(LLM_PROVIDER=fake) and drives it over real HTTP. Each simulated student
+creates a session, then works through every milestone: one question without
+code, then a message with code, which the fake model accepts. Half of the
+students use the streaming ``/api/chat`` endpoint, half ``/api/chat/json``.
+
+Reports throughput, p50/p95/p99 latency per route, time to first chunk for
+streamed replies and RSS growth of the server process. In-process, client
+and server share one event loop, so absolute latencies include client
+overhead; compare runs against each other rather than against production.
+
+    python -m benchmarks.load_test --students 200 --concurrency 50
+    python -m benchmarks.load_test --url http://localhost:8000   # external server, no RSS
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+import httpx
+
+# Working code for each tic-tac-toe milestone, so the local checks pass
+CODE_REPLIES = [
+    "Here is my board:\n```python\ndef create_board():\n    return [[1, 2, 3], [4, 5, 6], [7, 8, 9]]\n\n"
+    "def display_board(board):\n    for row in board:\n        print(' | '.join(str(cell) for cell in row))\n```",
+    "Now moves:\n```python\ndef make_move(board, player):\n    cell = int(input('Cell: ')) - 1\n"
+    "    board[cell // 3][cell % 3] = player\n```",
+    "And wins:\n```python\ndef check_win(board, player):\n"
+    "    lines = board + [list(col) for col in zip(*board)]\n"
+    "    lines += [[board[i][i] for i in range(3)], [board[i][2 - i] for i in range(3)]]\n"
+    "    return any(all(cell == player for cell in line) for line in lines)\n```",
+    "The full game:\n```python\ndef main():\n    board = create_board()\n    player = 'X'\n    while True:\n"
+    "        display_board(board)\n        make_move(board, player)\n        if check_win(board, player):\n"
+    "            print(player, 'wins!')\n            break\n        player = 'O' if player == 'X' else 'X'\n\n"
+    "if __name__ == '__main__':\n    main()\n```",
+]
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def rss_bytes() -> int:
+    """Current resident set size of this process (Linux), else peak RSS."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class Results:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.first_chunk: List[float] = []
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.finished_students = 0
+
+
+async def timed_post(client: httpx.AsyncClient, results: Results, route: str, payload: Optional[dict]) -> Optional[str]:
+    """POST to `route`; returns the assistant text (or raw JSON body) on success."""
+    started = time.perf_counter()
+    try:
+        if route == "/api/chat":
+            parts = []
+            async with client.stream("POST", route, json=payload) as response:
+                if response.status_code != 200:
+                    results.errors[f"{route} {response.status_code}"] += 1
+                    return None
+                async for line in response.aiter_lines():
+                    if not parts and line.startswith("0:"):
+                        results.first_chunk.append(time.perf_counter() - started)
+                    if line.startswith("0:"):
+                        parts.append(json.loads(line[2:]))
+            text = "".join(part for part in parts if isinstance(part, str))
+        else:
+            response = await client.post(route, json=payload)
+            if response.status_code != 200:
+                results.errors[f"{route} {response.status_code}"] += 1
+                return None
+            body = response.json()
+            text = body.get("content", json.dumps(body))
+    except httpx.HTTPError as e:
+        results.errors[f"{route} {type(e).__name__}"] += 1
+        return None
+    results.latencies[route].append(time.perf_counter() - started)
+    return text
+
+
+async def simulate_student(client: httpx.AsyncClient, results: Results, index: int, milestones: int) -> None:
+    response = await timed_post(client, results, "/api/new-session", None)
+    if response is None:
+        return
+    session_id = json.loads(response)["session_id"]
+    route = "/api/chat" if index % 2 == 0 else "/api/chat/json"
+
+    transcript = []
+    for milestone in range(milestones):
+        for content in ("How should I approach this part?", CODE_REPLIES[milestone % len(CODE_REPLIES)]):
+            transcript.append({"role": "user", "content": content})
+            reply = await timed_post(client, results, route, {"messages": transcript, "session_id": session_id})
+            if reply is None:
+                return
+            transcript.append({"role": "assistant", "content": reply})
+    results.finished_students += 1
+
+
+async def run_load(base_url: str, students: int, concurrency: int, milestones: int) -> tuple[Results, float]:
+    results = Results()
+    gate = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        async def student(i: int) -> None:
+            async with gate:
+                await simulate_student(client, results, i, milestones)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(student(i) for i in range(students)))
+        return results, time.perf_counter() - started
+
+
+async def run_in_process(args) -> tuple[Results, float, int, int]:
+    import uvicorn
+
+    from api.index import app
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", lifespan="off"))
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+
+    try:
+        rss_before = rss_bytes()
+        results, elapsed = await run_load(f"http://127.0.0.1:{port}", args.students, args.concurrency, args.milestones)
+        rss_after = rss_bytes()
+    finally:
+        server.should_exit = True
+        await serving
+    return results, elapsed, rss_before, rss_after
+
+
+def report(results: Results, elapsed: float, students: int, rss: Optional[tuple[int, int]]) -> None:
+    total = sum(len(values) for values in results.latencies.values())
+    print(f"{students} students, {results.finished_students} completed every turn, {elapsed:.2f}s")
+    print(f"throughput: {total / elapsed:.1f} req/s ({total} requests)")
+    print(f"{'route':<18}{'count':>7}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for route, values in sorted(results.latencies.items()):
+        print(f"{route:<18}{len(values):>7}"
+              + "".join(f"{percentile(values, pct) * 1000:>9.1f}" for pct in (50, 95, 99)))
+    if results.first_chunk:
+        print(f"{'first chunk':<18}{len(results.first_chunk):>7}"
+              + "".join(f"{percentile(results.first_chunk, pct) * 1000:>9.1f}" for pct in (50, 95, 99)))
+    if rss:
+        before, after = rss
+        print(f"RSS: {before / 2**20:.1f} MiB -> {after / 2**20:.1f} MiB (+{(after - before) / 2**20:.1f} MiB)")
+    for error, count in sorted(results.errors.items()):
+        print(f"error: {error} x{count}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--students", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=25, help="students active at the same time")
+    parser.add_argument("--milestones", type=int, default=4, help="milestones each student works through")
+    parser.add_argument("--latency", type=float, default=0.2, help="fake model latency before the first token")
+    parser.add_argument("--token-delay", type=float, default=0.005, help="fake model delay between tokens")
+    parser.add_argument("--url", help="drive an already running server instead of starting one")
+    args = parser.parse_args()
+
+    if args.url:
+        results, elapsed = asyncio.run(run_load(args.url, args.students, args.concurrency, args.milestones))
+        report(results, elapsed, args.students, None)
+    else:
+        # Configure the app before it is imported
+        os.environ.setdefault("LLM_PROVIDER", "fake")
+        os.environ.setdefault("FAKE_LLM_LATENCY", str(args.latency))
+        os.environ.setdefault("FAKE_LLM_TOKEN_DELAY", str(args.token_delay))
+        os.environ.setdefault("LOG_LEVEL", "WARNING")
+        os.environ.setdefault("CHECKPOINT_DB_PATH", os.path.join(tempfile.mkdtemp(), "load_test.sqlite"))
+        results, elapsed, rss_before, rss_after = asyncio.run(run_in_process(args))
+        report(results, elapsed, args.students, (rss_before, rss_after))
+
+    return 1 if results.errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,81 @@
+"""Measure per-request logging overhead before and after the queued logger.
+
+"Before" replays the old pattern: ~45 eagerly formatted f-string
+``print(..., flush=True)`` calls per turn, written synchronously to stdout.
+"After" issues what a turn logs now: one INFO summary plus the guard tracing,
+which is skipped entirely unless DEBUG is enabled, through the queue handler.
+
+Output goes to /dev/null so the numbers reflect the logging code path rather
+than the terminal.
+
+    python -m benchmarks.logging_overhead --turns 2000
+"""
+import argparse
+import io
+import logging
+import os
+import sys
+import time
+
+from api.utils import log
+
+# Representative of what process_message used to print per turn
+RESPONSE = {
+    "message": "What do you think the board should look like? " * 8,
+    "milestone_completed": "none",
+    "feedback": "Getting started",
+}
+MILESTONES = ["m1", "m2", "m3", "m4"]
+
+
+def legacy_turn(out) -> None:
+    for i in range(44):
+        print(f"[MILESTONE GUARD] step {i}: completed={MILESTONES} current=m1 response={RESPONSE}", file=out, flush=True)
+    print(f"[LLM RESPONSE] Response: {RESPONSE}", file=out, flush=True)
+
+
+def structured_turn(logger: logging.Logger) -> None:
+    debug = logger.isEnabledFor(logging.DEBUG)
+    if debug:
+        for i in range(8):
+            logger.debug("Milestone guard: step %d completed=%s current=%s", i, MILESTONES, "m1")
+        logger.debug("LLM response: %s", RESPONSE)
+    logger.info("Turn processed: milestone %s -> %s", "m1", "m1",
+                extra={"milestones_completed": [], "llm_verdict": "none", "input_tokens": 1200, "output_tokens": 90})
+
+
+def time_turns(turn, turns: int) -> float:
+    start = time.perf_counter()
+    for _ in range(turns):
+        turn()
+    return (time.perf_counter() - start) / turns * 1e6
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=2000)
+    args = parser.parse_args()
+
+    with open(os.devnull, "w") as devnull:
+        legacy = time_turns(lambda: legacy_turn(devnull), args.turns)
+
+        results = {}
+        for level in ("INFO", "DEBUG"):
+            log.configure_logging(level=level, fmt="json", stream=devnull)
+            logger = log.get_logger("bench")
+            results[level] = time_turns(lambda: structured_turn(logger), args.turns)
+            log.shutdown_logging()
+
+    # Restore the default configuration for anything that runs after us
+    log.configure_logging(stream=io.StringIO())
+
+    print(f"{args.turns} turns, per-turn time on the request path:")
+    print(f"  print(flush=True), eager f-strings: {legacy:8.1f} us")
+    print(f"  queued logger, LOG_LEVEL=INFO:      {results['INFO']:8.1f} us")
+    print(f"  queued logger, LOG_LEVEL=DEBUG:     {results['DEBUG']:8.1f} us")
+    print(f"speedup at INFO: {legacy / results['INFO']:.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,158 @@
+"""Compare the parallel tutor/assessment graph against the single-node graph.
+
+Runs the same scripted sessions through ``build_graph(parallel=False)``
+(one model call writes the reply and grades the milestone) and
+``build_graph(parallel=True)`` (tutor_reply and assess_milestone run at the
+same time) on the offline fake models, whose time to first token grows
+with prompt size (FAKE_LLM_PREFILL_DELAY). Each session alternates
+questions and code for every milestone, on the stock curriculum (local
+checks grade the code) and on a copy without checks (the assessment model
+grades it).
+
+Reports per-turn time to the first streamed reply text, total turn time,
+and tokens per turn (tutor plus assessment calls), and fails if the two
+graphs ever disagree on the milestones completed. The fake tutor models
+simulate Anthropic's prompt cache with each route's minimum cacheable
+prefix, so the share of tutor prompt tokens read from the cache is
+reported per route too; each graph starts with a cold cache.
+
+    python -m benchmarks.parallel_assessment --sessions 5
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+os.environ.setdefault("LLM_PROVIDER", "fake")
+# Only this script's own code reaches the checks, so no sandbox is needed
+os.environ.setdefault("ASSESSMENT_SANDBOX", "unsafe-local")
+os.environ.setdefault("FAKE_LLM_LATENCY", "0.2")
+os.environ.setdefault("FAKE_LLM_TOKEN_DELAY", "0.005")
+os.environ.setdefault("FAKE_LLM_PREFILL_DELAY", "0.1")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+from api.index import initialize_session
+from api.utils.curriculum import curriculum_registry
+from api.utils.graph import STREAMED_NODES, build_graph
+from api.utils.llm import ROUTES, tutor_llm
+from api.utils.output_parser import MessageFieldExtractor
+from api.utils.streaming import message_text
+
+CODE = (
+    "```python\ndef create_board():\n    return [[1, 2, 3], [4, 5, 6], [7, 8, 9]]\n\n"
+    "def display_board(board):\n    for row in board:\n        print(' | '.join(str(c) for c in row))\n```",
+    "```python\ndef make_move(board, player):\n    cell = int(input('cell: '))\n"
+    "    board[(cell - 1) // 3][(cell - 1) % 3] = player\n```",
+    "```python\ndef check_win(board, player):\n"
+    "    lines = board + [list(c) for c in zip(*board)] + [[board[i][i] for i in range(3)], [board[i][2 - i] for i in range(3)]]\n"
+    "    return any(all(c == player for c in line) for line in lines)\n```",
+    "```python\ndef main():\n    board = create_board()\n    player = 'X'\n    while True:\n"
+    "        display_board(board)\n        make_move(board, player)\n        if check_win(board, player):\n"
+    "            print(player, 'wins')\n            break\n        player = 'O' if player == 'X' else 'X'\n\n"
+    "if __name__ == '__main__':\n    main()\n```",
+)
+QUESTIONS = ("How should I start this one?", "Can you give me a hint about the loop?")
+
+
+def script() -> list:
+    turns = []
+    for code in CODE:
+        turns += [QUESTIONS[len(turns) % 2], f"Here is my attempt:\n{code}"]
+    return turns
+
+
+def unchecked_copy(curriculum_id: str) -> str:
+    """Register a copy of a curriculum with its local checks removed."""
+    config = curriculum_registry.get(curriculum_id).config
+    copy = config.model_copy(update={
+        "id": f"{config.id}_unchecked",
+        "milestones": tuple(m.model_copy(update={"checks": ()}) for m in config.milestones),
+    })
+    return curriculum_registry.register(copy).id
+
+
+def turn_tokens(usage: dict) -> int:
+    total = usage.get("input_tokens", 0) + usage.get("output_tokens", 0)
+    assessment = usage.get("assessment") or {}
+    return total + assessment.get("input_tokens", 0) + assessment.get("output_tokens", 0)
+
+
+async def run_session(graph, session_id: str, curriculum_id: str) -> list:
+    state = initialize_session(session_id, curriculum_id)
+    rows = []
+    for message in script():
+        state["current_input"] = message
+        extractor = MessageFieldExtractor()
+        started = time.perf_counter()
+        first_text = None
+        async for mode, payload in graph.astream(state, stream_mode=["messages", "values"]):
+            if mode == "values":
+                state = payload
+            elif first_text is None and payload[1].get("langgraph_node") in STREAMED_NODES:
+                if extractor.feed(message_text(payload[0])):
+                    first_text = time.perf_counter() - started
+        total = time.perf_counter() - started
+        usage = state["usage"]
+        rows.append({"ttft": first_text or total, "total": total, "tokens": turn_tokens(usage),
+                     "completed": list(state["milestones_completed"]), "route": state["route"],
+                     "input": usage.get("input_tokens", 0), "cache_read": usage.get("cache_read_input_tokens", 0)})
+    return rows
+
+
+def percentile(values: list, p: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))]
+
+
+async def main_async(sessions: int) -> int:
+    graphs = {"single node": build_graph(parallel=False), "parallel": build_graph(parallel=True)}
+    failed = False
+    for curriculum_id in ("tictactoe", unchecked_copy("tictactoe")):
+        results = {}
+        for name, graph in graphs.items():
+            for route in ROUTES:
+                tutor_llm(route).clear_prompt_cache()
+            runs = await asyncio.gather(*(run_session(graph, f"{name}-{i}", curriculum_id) for i in range(sessions)))
+            results[name] = [row for run in runs for row in run]
+
+        print(f"\n{curriculum_id}: {sessions} sessions x {len(script())} turns")
+        print(f"{'graph':<14}{'ttft p50':>10}{'p95':>8}{'total p50':>11}{'p95':>8}{'tokens/turn':>13}")
+        for name, rows in results.items():
+            ttft, total = [r["ttft"] for r in rows], [r["total"] for r in rows]
+            print(f"{name:<14}{statistics.median(ttft) * 1000:>8.0f}ms{percentile(ttft, 95) * 1000:>6.0f}ms"
+                  f"{statistics.median(total) * 1000:>9.0f}ms{percentile(total, 95) * 1000:>6.0f}ms"
+                  f"{statistics.mean(r['tokens'] for r in rows):>13.0f}")
+        print(f"{'prompt cache':<14}" + "".join(f"{route + ' turns':>14}{'cached':>8}" for route in ROUTES))
+        for name, rows in results.items():
+            line = f"{name:<14}"
+            for route in ROUTES:
+                routed = [r for r in rows if r["route"] == route]
+                cached = sum(r["cache_read"] for r in routed) / max(1, sum(r["input"] for r in routed))
+                line += f"{len(routed):>14}{cached:>8.0%}"
+            print(line)
+
+        single, parallel = results["single node"], results["parallel"]
+        disagreements = sum(a["completed"] != b["completed"] for a, b in zip(single, parallel))
+        if disagreements:
+            print(f"FAIL: the graphs disagreed on completed milestones in {disagreements} turns")
+            failed = True
+        if not single[-1]["completed"] == parallel[-1]["completed"] == list(curriculum_registry.get(curriculum_id).milestone_ids):
+            print("FAIL: a session didn't complete every milestone")
+            failed = True
+    if failed:
+        return 1
+    print("\nOK: both graphs completed the same milestones on every turn")
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=5)
+    args = parser.parse_args()
+    return asyncio.run(main_async(args.sessions))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
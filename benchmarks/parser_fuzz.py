@@ -0,0 +1,157 @@
+"""Fuzz the tolerant tutoring reply parser with malformed model output.
+
+Generates valid TutoringResponse JSON, applies random corruptions (code
+fences, prose around the object, raw newlines, stray unescaped quotes,
+missing fields, truncation, no JSON at all), streams the result into
+``TutoringOutputParser`` in random-sized chunks and checks that:
+
+- it only ever raises OutputParserException
+- the message is recovered exactly, or as a prefix when truncated
+- milestone_completed is the original value or "none"
+- the streamed message text is a prefix of the final message
+
+The stock LangChain JsonOutputParser is run on the same inputs for
+comparison.
+
+    python -m benchmarks.parser_fuzz --cases 20000 --seed 1
+"""
+import argparse
+import json
+import random
+import sys
+from collections import Counter
+
+from langchain_core.exceptions import OutputParserException
+from langchain_core.output_parsers import JsonOutputParser
+
+from api.utils.output_parser import TutoringOutputParser
+
+WORDS = ("board", "loop", "player", "row", "winner", "list", "index", "print", "input", "cell", "é", "→", "🎉")
+
+
+def random_message(rng: random.Random) -> str:
+    parts = []
+    for _ in range(rng.randint(3, 25)):
+        word = rng.choice(WORDS)
+        roll = rng.random()
+        if roll < 0.1:
+            word = f'"{word}"'
+        elif roll < 0.15:
+            word = f"`{word}()`"
+        elif roll < 0.2:
+            word += "\n"
+        elif roll < 0.22:
+            word += "\\"
+        parts.append(word)
+    message = " ".join(parts).strip()
+    if rng.random() < 0.2:
+        message += "\n```python\nboard = [[' '] * 3 for _ in range(3)]\n```\nWhat next?"
+    return message or "Hi"
+
+
+def corrupt(rng: random.Random, response: dict) -> tuple[str, str]:
+    """A corrupted serialization of `response` and the corruption's name."""
+    text = json.dumps(response, ensure_ascii=rng.random() < 0.5, indent=rng.choice([None, 2]))
+    kind = rng.choice(["clean", "fenced", "prose", "trailing", "raw_newlines", "stray_quotes",
+                       "missing_fields", "truncated", "no_json"])
+    if kind == "fenced":
+        text = f"```json\n{text}\n```"
+    elif kind == "prose":
+        text = f"Here is my response:\n{text}"
+    elif kind == "trailing":
+        text = f"{text}\n\nLet me know if you need anything else!"
+    elif kind == "raw_newlines":
+        text = text.replace("\\n", "\n")
+    elif kind == "stray_quotes":
+        # Unescape quotes that are followed by text, as a sloppy model would
+        text = text.replace('\\" ', '" ').replace(' \\"', ' "')
+    elif kind == "missing_fields":
+        text = json.dumps({"message": response["message"]})
+    elif kind == "truncated":
+        start = text.index('"message"')
+        text = text[:rng.randint(start + 13, len(text) - 1)]
+    elif kind == "no_json":
+        text = response["message"]
+    return text, kind
+
+
+def chunks(rng: random.Random, text: str):
+    i = 0
+    while i < len(text):
+        size = rng.randint(1, 12)
+        yield text[i:i + size]
+        i += size
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cases", type=int, default=20_000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    stock = JsonOutputParser()
+    failures, stock_failures, repairs, totals = Counter(), Counter(), Counter(), Counter()
+    violations = []
+
+    for _ in range(args.cases):
+        response = {
+            "message": random_message(rng),
+            "milestone_completed": rng.choice(["none", "m1", "m2", "m3", "m4"]),
+            "feedback": rng.choice(["Good start", "Missing the win check", ""]),
+        }
+        text, kind = corrupt(rng, response)
+        totals[kind] += 1
+
+        try:
+            stock_result = stock.parse(text)
+            if not isinstance(stock_result, dict) or stock_result.get("message") != response["message"]:
+                stock_failures[kind] += 1
+        except Exception:
+            stock_failures[kind] += 1
+
+        tolerant = TutoringOutputParser()
+        streamed = "".join(tolerant.feed(chunk) for chunk in chunks(rng, text))
+        try:
+            result = tolerant.finish()
+        except OutputParserException:
+            failures[kind] += 1
+            continue
+        except Exception as e:
+            violations.append((kind, f"raised {type(e).__name__}: {e}", text))
+            continue
+        repairs.update(tolerant.repairs)
+
+        message = result["message"]
+        if kind == "truncated":
+            if not response["message"].startswith(message):
+                violations.append((kind, f"message {message!r} is not a prefix", text))
+        elif kind == "no_json":
+            if message != response["message"].strip():
+                violations.append((kind, f"message {message!r} differs", text))
+        elif message != response["message"]:
+            violations.append((kind, f"message {message!r} differs", text))
+        if result["milestone_completed"] not in (response["milestone_completed"], "none"):
+            violations.append((kind, f"milestone {result['milestone_completed']!r}", text))
+        if not message.startswith(streamed):
+            violations.append((kind, f"streamed {streamed!r} is not a prefix of the message", text))
+
+    print(f"{'corruption':<16}{'cases':>7}{'tolerant fail':>15}{'stock fail':>12}")
+    for kind in sorted(totals):
+        print(f"{kind:<16}{totals[kind]:>7}{failures[kind]:>15}{stock_failures[kind]:>12}")
+    total_failures, total_stock = sum(failures.values()), sum(stock_failures.values())
+    print(f"{'all':<16}{args.cases:>7}{total_failures:>15}{total_stock:>12}")
+    print(f"failure rate: tolerant {total_failures / args.cases:.2%}, stock {total_stock / args.cases:.2%}")
+    print("repairs:", ", ".join(f"{kind} {count}" for kind, count in repairs.most_common()))
+
+    for kind, problem, text in violations[:10]:
+        print(f"VIOLATION [{kind}] {problem}\n  input: {text[:200]!r}")
+    if violations:
+        print(f"FAIL: {len(violations)} violations")
+        return 1
+    print("OK")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,140 @@
+"""Measure when /api/chat clients learn about session and milestone progress.
+
+Serves the app with uvicorn on 127.0.0.1 (the in-process ASGI transport
+buffers whole responses) on the offline fake models, streams turns that
+complete each milestone through POST /api/chat, and records for each turn
+the time until the session data part (``2:``), the progress annotation
+(``8:``), the first reply text (``0:``) and the end of the stream. Runs on the stock
+curriculum (local checks grade the code) and on a copy without checks
+(the assessment model grades it).
+
+Fails if a session part doesn't come before any text, if a turn's
+progress annotation is missing or doesn't report the milestone the code
+completed, or if a reply still carries the old congratulation prefix.
+
+    python -m benchmarks.progress_events --sessions 5
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+os.environ.setdefault("LLM_PROVIDER", "fake")
+# Only this script's own code reaches the checks, so no sandbox is needed
+os.environ.setdefault("ASSESSMENT_SANDBOX", "unsafe-local")
+os.environ.setdefault("FAKE_LLM_LATENCY", "0.2")
+os.environ.setdefault("FAKE_LLM_TOKEN_DELAY", "0.005")
+os.environ.setdefault("FAKE_LLM_PREFILL_DELAY", "0.1")
+os.environ.setdefault("STREAM_MAX_CHUNK_DELAY", "0")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+os.environ.setdefault("CHECKPOINT_DB_PATH", os.path.join(tempfile.mkdtemp(), "progress_events.sqlite"))
+
+import httpx
+import uvicorn
+
+from api.index import app
+from api.utils.curriculum import curriculum_registry
+from benchmarks.parallel_assessment import CODE, unchecked_copy
+
+EVENTS = ("session", "progress", "first text", "end")
+
+
+def serve() -> str:
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    server = uvicorn.Server(uvicorn.Config(app, log_level="warning"))
+    threading.Thread(target=server.run, kwargs={"sockets": [sock]}, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return f"http://127.0.0.1:{sock.getsockname()[1]}"
+
+
+async def stream_turn(client: httpx.AsyncClient, body: dict) -> dict:
+    started = time.perf_counter()
+    timings, text, data, progress = {}, [], [], []
+    async with client.stream("POST", "/api/chat", json=body) as response:
+        async for line in response.aiter_lines():
+            elapsed = time.perf_counter() - started
+            if line.startswith("2:"):
+                data.append(json.loads(line[2:])[0])
+                if data[-1].get("type") == "session":
+                    timings.setdefault("session", elapsed)
+            elif line.startswith("8:"):
+                progress.append(json.loads(line[2:])[0])
+                timings.setdefault("progress", elapsed)
+            elif line.startswith("0:"):
+                text.append(json.loads(line[2:]))
+                timings.setdefault("first text", elapsed)
+    timings["end"] = time.perf_counter() - started
+    return {"timings": timings, "text": "".join(text), "data": data, "progress": progress}
+
+
+async def run_session(client: httpx.AsyncClient, curriculum_id: str) -> list:
+    session_id = (await client.post("/api/new-session", json={"curriculum_id": curriculum_id})).json()["session_id"]
+    milestone_ids = curriculum_registry.get(curriculum_id).milestone_ids
+    turns, turn = [], 0
+    for milestone_id, code in zip(milestone_ids, CODE):
+        result = await stream_turn(client, {
+            "messages": [{"role": "user", "content": f"Here is my attempt:\n{code}"}],
+            "session_id": session_id, "delta": True, "turn": turn,
+        })
+        turn = result["data"][-1]["turn"]
+        result["milestone"] = milestone_id
+        turns.append(result)
+    return turns
+
+
+def check(turn: dict) -> list:
+    problems = []
+    timings = turn["timings"]
+    if "session" not in timings or timings["session"] > timings.get("first text", timings["end"]):
+        problems.append("no session part before the text")
+    if not turn["progress"] or turn["progress"][0]["completed"] != [turn["milestone"]]:
+        problems.append(f"progress didn't report {turn['milestone']}: {turn['progress']}")
+    if "Great job! You've completed milestone" in turn["text"]:
+        problems.append("reply carries a congratulation prefix")
+    return problems
+
+
+async def main_async(sessions: int, base_url: str) -> int:
+    failed = False
+    async with httpx.AsyncClient(base_url=base_url, timeout=60) as client:
+        # Warm up the graph and models so the first session doesn't pay for loading them
+        await client.post("/api/chat", json={"messages": [{"role": "user", "content": "Hi"}]})
+        for curriculum_id in ("tictactoe", unchecked_copy("tictactoe")):
+            runs = await asyncio.gather(*(run_session(client, curriculum_id) for _ in range(sessions)))
+            turns = [turn for run in runs for turn in run]
+            print(f"\n{curriculum_id}: {sessions} sessions x {len(turns) // sessions} completing turns")
+            print(f"{'event':<14}{'p50':>9}{'p95':>9}")
+            for event in EVENTS:
+                values = sorted(turn["timings"][event] for turn in turns if event in turn["timings"])
+                print(f"{event:<14}{statistics.median(values) * 1000:>7.0f}ms"
+                      f"{values[int(0.95 * (len(values) - 1))] * 1000:>7.0f}ms")
+            early = sum(turn["timings"].get("progress", float("inf")) < turn["timings"].get("first text", 0)
+                        for turn in turns)
+            print(f"progress arrived before the first text in {early}/{len(turns)} turns")
+            for turn in turns:
+                for problem in check(turn):
+                    print(f"FAIL: {turn['milestone']}: {problem}")
+                    failed = True
+    if failed:
+        return 1
+    print("\nOK")
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=5)
+    args = parser.parse_args()
+    return asyncio.run(main_async(args.sessions, serve()))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,73 @@
+"""Check that prompt size stays flat over a long tutoring session.
+
+Runs one long session through the compiled graph on the offline fake
+models (LLM_PROVIDER=fake), folding the history into the summary after a
+turn whenever the API would, and records the tutor call's input tokens and
+the number of raw messages kept in state after every turn. The fake models
+estimate tokens as characters / 4, which is enough to see growth.
+
+Fails if the prompt over the last quarter of the session grew more than
+--tolerance times the prompt size once the first summary was written.
+Turns alternate between questions and code, which use different prompts,
+so the baseline is the larger of the two turns after that summary.
+
+    python -m benchmarks.prompt_growth --turns 60
+"""
+import argparse
+import asyncio
+import os
+import sys
+
+os.environ.setdefault("LLM_PROVIDER", "fake")
+os.environ.setdefault("FAKE_LLM_LATENCY", "0")
+os.environ.setdefault("FAKE_LLM_TOKEN_DELAY", "0")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+from api.index import initialize_session
+from api.utils import graph as graph_module
+
+
+async def run(turns: int) -> list[tuple[int, int, int]]:
+    graph = graph_module.build_graph()
+    state = initialize_session("prompt-growth")
+    rows = []
+    for turn in range(turns):
+        if turn % 2:
+            state["current_input"] = f"Here is my attempt:\n```python\nstep_{turn} = [[' '] * 3 for _ in range({turn})]\n```"
+        else:
+            state["current_input"] = f"I'm not sure how to approach part {turn}, can you give me a hint about the loop?"
+        state = await graph.ainvoke(state)
+        if graph_module.needs_summary(state):
+            state = {**state, **await graph_module.summarize_history(state)}
+        rows.append((state["usage"]["input_tokens"], len(state["messages"]), state.get("history_offset", 0)))
+    return rows
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=60)
+    parser.add_argument("--tolerance", type=float, default=1.3)
+    args = parser.parse_args()
+
+    rows = asyncio.run(run(args.turns))
+    print(f"{'turn':>5}{'prompt tokens':>15}{'stored msgs':>13}{'folded':>8}")
+    for turn, (tokens, stored, folded) in enumerate(rows, 1):
+        if turn <= 12 or turn % 10 == 0:
+            print(f"{turn:>5}{tokens:>15}{stored:>13}{folded:>8}")
+
+    first_fold = next((i for i, row in enumerate(rows) if row[2]), None)
+    if first_fold is None:
+        print("FAIL: history was never summarized")
+        return 1
+    baseline = max(tokens for tokens, _, _ in rows[first_fold:first_fold + 2])
+    tail = max(tokens for tokens, _, _ in rows[-max(1, len(rows) // 4):])
+    print(f"prompt after first summary: {baseline} tokens, max over last quarter: {tail} tokens")
+    if tail > baseline * args.tolerance:
+        print("FAIL: prompt keeps growing")
+        return 1
+    print("OK")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,110 @@
+"""Measure memory per stored session: plain TutorState dicts vs CompactSession.
+
+Builds N synthetic sessions mid-way through the course (a handful of
+messages with code, a running summary, shared code blocks, a couple of
+completed milestones) and decodes each from JSON, the way states arrive
+from checkpoints and client histories, so no strings are shared by
+accident. Reports traced bytes per session for the dict form and the
+packed form, the cost of pack/unpack, and checks every session
+round-trips unchanged.
+
+    python -m benchmarks.session_memory --sessions 10000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+os.environ.setdefault("ANTHROPIC_API_KEY", "offline-benchmark")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+from api.index import initialize_session
+from api.utils.state import CompactSession
+
+WORDS = (
+    "board list loop player move win row column diagonal function return print input "
+    "index check grid cell empty turn game value string integer while for if else"
+).split()
+CODE = (
+    "def display_board(board):\n    for row in board:\n        print(' | '.join(str(cell) for cell in row))\n\n"
+    "def make_move(board, player):\n    cell = int(input('Cell: ')) - 1\n    board[cell // 3][cell % 3] = player\n"
+)
+
+
+def sentence(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "?"
+
+
+def synthetic_session(index: int, rng: random.Random) -> str:
+    state = initialize_session(f"session-{index}")
+    messages = []
+    for turn in range(rng.randint(3, 6)):
+        student = sentence(rng, 12)
+        if turn % 2:
+            student += f"\n```python\n{CODE}board_{index}_{turn} = [[' '] * 3 for _ in range(3)]\n```"
+        messages.append({"role": "user", "content": student})
+        messages.append({"role": "assistant", "content": " ".join(sentence(rng, 14) for _ in range(4))})
+    state.update(
+        messages=messages,
+        current_input=messages[-2]["content"],
+        milestones_completed=["m1", "m2"][:rng.randint(0, 2)],
+        current_milestone="m3",
+        summary=" ".join(sentence(rng, 15) for _ in range(8)),
+        history_offset=rng.randint(0, 3) * 8,
+        code_blocks=[CODE, f"def check_win_{index}(board, player):\n    return False\n"],
+        usage={"input_tokens": 1650, "output_tokens": 48, "cache_read_input_tokens": 1200,
+               "cache_creation_input_tokens": 0, "latency_ms": 812, "route": "strong", "cost_usd": 0.00183},
+    )
+    return json.dumps(state)
+
+
+def traced(build):
+    """Bytes still allocated after `build()`, and the value it built."""
+    before = tracemalloc.take_snapshot()
+    value = build()
+    after = tracemalloc.take_snapshot()
+    return sum(stat.size_diff for stat in after.compare_to(before, "filename")), value
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=10_000)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    lines = [synthetic_session(i, rng) for i in range(args.sessions)]
+
+    tracemalloc.start()
+    dict_bytes, states = traced(lambda: [json.loads(line) for line in lines])
+    del states
+    compact_bytes, records = traced(lambda: [CompactSession.pack(json.loads(line)) for line in lines])
+    tracemalloc.stop()
+
+    started = time.perf_counter()
+    unpacked = [record.unpack() for record in records]
+    unpack_us = (time.perf_counter() - started) / args.sessions * 1e6
+    originals = [json.loads(line) for line in lines]
+    started = time.perf_counter()
+    for state in originals:
+        CompactSession.pack(state)
+    pack_us = (time.perf_counter() - started) / args.sessions * 1e6
+    mismatches = sum(a != b for a, b in zip(unpacked, originals))
+
+    print(f"{args.sessions} sessions")
+    print(f"dict TutorState      {dict_bytes / args.sessions:>9.0f} bytes/session  ({dict_bytes / 2**20:.1f} MiB)")
+    print(f"CompactSession       {compact_bytes / args.sessions:>9.0f} bytes/session  ({compact_bytes / 2**20:.1f} MiB)")
+    print(f"reduction            {1 - compact_bytes / dict_bytes:>9.0%}")
+    print(f"pack {pack_us:.1f} us, unpack {unpack_us:.1f} us per session")
+    print(f"store estimate (nbytes) {sum(r.nbytes() for r in records) / args.sessions:.0f} bytes/session")
+    if mismatches:
+        print(f"FAIL: {mismatches} sessions did not round-trip")
+        return 1
+    print("OK: every session round-trips unchanged")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,170 @@
+"""Compare per-turn server overhead of /api/ws against POST /api/chat.
+
+Runs the app in-process with the offline fake model at zero latency, so
+what is measured is everything around the model call: request parsing,
+session lookup and history conversion, the graph, streaming and storage.
+Each of --sessions conversations sends --turns messages through:
+
+- POST /api/chat in delta mode (the client only sends the new message)
+- POST /api/chat sending the full history, as the UI does today
+- one /api/ws connection per conversation
+
+and reports the median and p95 time per turn until the final frame. The
+WebSocket client is a minimal ASGI driver, so no network or WebSocket
+library is involved. Also checks that a reconnect with the session id gets
+back the reply to a turn the client disconnected from.
+
+    python -m benchmarks.websocket_overhead --sessions 20 --turns 10
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("LLM_PROVIDER", "fake")
+os.environ.setdefault("FAKE_LLM_LATENCY", "0")
+os.environ.setdefault("FAKE_LLM_TOKEN_DELAY", "0")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+os.environ.setdefault("CHECKPOINT_DB_PATH", os.path.join(tempfile.mkdtemp(), "websocket_overhead.sqlite"))
+
+import httpx
+
+from api.index import app
+
+MESSAGES = ("Hi, where do I start?", "How do I store the board?", "What's a nested list?", "Can you give me a hint?")
+
+
+class WebSocketClient:
+    """Drives one ASGI WebSocket connection to the app in-process."""
+
+    def __init__(self, query: str = ""):
+        self._incoming: asyncio.Queue = asyncio.Queue()
+        self._outgoing: asyncio.Queue = asyncio.Queue()
+        self.closed = False
+        scope = {
+            "type": "websocket", "path": "/api/ws", "raw_path": b"/api/ws", "query_string": query.encode(),
+            "headers": [], "scheme": "ws", "server": ("bench", 80), "client": ("127.0.0.1", 1),
+            "subprotocols": [], "asgi": {"version": "3.0"},
+        }
+        self._incoming.put_nowait({"type": "websocket.connect"})
+        self._task = asyncio.create_task(app(scope, self._incoming.get, self._outgoing.put))
+
+    async def receive(self) -> dict:
+        while True:
+            message = await self._outgoing.get()
+            if message["type"] == "websocket.send":
+                return json.loads(message["text"])
+            if message["type"] == "websocket.close":
+                self.closed = True
+                raise ConnectionError(f"closed: {message.get('code')}")
+
+    async def send(self, frame: dict) -> None:
+        await self._incoming.put({"type": "websocket.receive", "text": json.dumps(frame)})
+
+    async def until(self, kind: str) -> dict:
+        while True:
+            frame = await self.receive()
+            if frame["type"] == kind:
+                return frame
+            if frame["type"] == "error":
+                raise RuntimeError(frame)
+
+    async def close(self) -> None:
+        await self._incoming.put({"type": "websocket.disconnect", "code": 1000})
+        await self._task
+
+
+async def post_turns(client: httpx.AsyncClient, turns: int, delta: bool) -> list:
+    session_id = (await client.post("/api/new-session")).json()["session_id"]
+    history, timings, turn = [], [], 0
+    for i in range(turns):
+        message = {"role": "user", "content": MESSAGES[i % len(MESSAGES)]}
+        body = {"session_id": session_id}
+        body.update({"messages": [message], "delta": True, "turn": turn} if delta else {"messages": history + [message]})
+        started = time.perf_counter()
+        response = await client.post("/api/chat", json=body)
+        timings.append(time.perf_counter() - started)
+        parts = response.text.splitlines()
+        reply = "".join(json.loads(line[2:]) for line in parts if line.startswith("0:"))
+        if delta:
+            # The last data part carries the new turn count
+            turn = json.loads([line for line in parts if line.startswith("2:")][-1][2:])[0]["turn"]
+        history += [message, {"role": "assistant", "content": reply}]
+    return timings
+
+
+async def socket_turns(turns: int) -> list:
+    socket = WebSocketClient()
+    await socket.until("session")
+    timings = []
+    for i in range(turns):
+        started = time.perf_counter()
+        await socket.send({"type": "message", "content": MESSAGES[i % len(MESSAGES)]})
+        await socket.until("done")
+        timings.append(time.perf_counter() - started)
+    await socket.close()
+    return timings
+
+
+async def check_resume() -> bool:
+    socket = WebSocketClient()
+    session = await socket.until("session")
+    await socket.send({"type": "message", "content": MESSAGES[0]})
+    await socket.until("done")
+    # Disconnect right after sending a message, before any of the reply
+    await socket.send({"type": "message", "content": MESSAGES[1]})
+    await socket.close()
+
+    again = WebSocketClient(f"session_id={session['session_id']}&turn=2")
+    resumed = await again.until("session")
+    await again.close()
+    missed = resumed["messages"]
+    return (resumed["resumed"] and resumed["turn"] == 4 and len(missed) == 2
+            and missed[0]["content"] == MESSAGES[1] and missed[1]["role"] == "assistant")
+
+
+def summarize(name: str, timings: list) -> float:
+    ordered = sorted(timings)
+    median = statistics.median(ordered)
+    print(f"{name:<26}{median * 1000:>10.2f} ms{ordered[int(0.95 * (len(ordered) - 1))] * 1000:>10.2f} ms")
+    return median
+
+
+async def main_async(sessions: int, turns: int) -> int:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        # Warm up the graph and models so neither side pays for the first load
+        await post_turns(client, 1, delta=True)
+        results = {
+            "POST /api/chat (full)": [t for _ in range(sessions) for t in await post_turns(client, turns, delta=False)],
+            "POST /api/chat (delta)": [t for _ in range(sessions) for t in await post_turns(client, turns, delta=True)],
+            "/api/ws": [t for _ in range(sessions) for t in await socket_turns(turns)],
+        }
+
+    print(f"{sessions} sessions x {turns} turns, fake model with no latency")
+    print(f"{'path':<26}{'median':>13}{'p95':>13}")
+    medians = {name: summarize(name, timings) for name, timings in results.items()}
+    print(f"/api/ws median vs full POST {medians['/api/ws'] / medians['POST /api/chat (full)'] - 1:+.0%}, "
+          f"vs delta POST {medians['/api/ws'] / medians['POST /api/chat (delta)'] - 1:+.0%}")
+
+    if not await check_resume():
+        print("FAIL: reconnecting did not return the reply to the interrupted turn")
+        return 1
+    print("OK: resume returns the reply to an interrupted turn")
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--turns", type=int, default=10)
+    args = parser.parse_args()
+    return asyncio.run(main_async(args.sessions, args.turns))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
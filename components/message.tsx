@@ -9,6 +9,39 @@ import { PreviewAttachment } from "./preview-attachment";
 import { cn } from "@/lib/utils";
 import { Weather } from "./weather";
 
+// Sent by /api/chat as a message annotation once the turn is assessed
+type ProgressAnnotation = {
+  type: "progress";
+  completed: string[];
+  currentMilestone: string | null;
+  milestonesCompleted: string[];
+};
+
+const milestoneProgress = (message: Message): ProgressAnnotation | undefined =>
+  message.annotations?.find(
+    (annotation) =>
+      typeof annotation === "object" &&
+      annotation !== null &&
+      !Array.isArray(annotation) &&
+      annotation.type === "progress",
+  ) as ProgressAnnotation | undefined;
+
+export const MilestoneProgress = ({
+  progress,
+}: {
+  progress: ProgressAnnotation;
+}) => (
+  <div className="flex flex-row gap-2 items-center rounded-lg border border-border px-3 py-2 text-sm w-fit">
+    <span>🎉</span>
+    <span>
+      Completed {progress.completed.join(", ")}
+      {progress.currentMilestone
+        ? ` · next up: ${progress.currentMilestone}`
+        : " · every milestone done"}
+    </span>
+  </div>
+);
+
 export const PreviewMessage = ({
   message,
 }: {
@@ -16,6 +49,8 @@ export const PreviewMessage = ({
   message: Message;
   isLoading: boolean;
 }) => {
+  const progress = milestoneProgress(message);
+
   return (
     <motion.div
       className="w-full mx-auto max-w-3xl px-4 group/message"
@@ -35,6 +70,10 @@ export const PreviewMessage = ({
         )}
 
         <div className="flex flex-col gap-2 w-full">
+          {progress && progress.completed.length > 0 && (
+            <MilestoneProgress progress={progress} />
+          )}
+
           {message.content && (
             <div className="flex flex-col gap-4">
               <Markdown>{message.content as string}</Markdown>